@@ -110,7 +110,8 @@ class AdaptiveClusterManager:
                 "max_workers": 6,
                 "spark_conf": {
                     "spark.sql.adaptive.enabled": "true",
-                    "spark.sql.execution.arrow.pyspark.enabled": "true"
+                    "spark.sql.execution.arrow.pyspark.enabled": "true",
+                    "spark.scheduler.mode": "FAIR"  # Concurrent monitoring queries
                 }
             },
             "analytics": {
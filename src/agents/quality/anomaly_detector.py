@@ -5,29 +5,63 @@ Multi-method anomaly detection with ML models and statistical analysis
 
 import numpy as np
 import pandas as pd
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession, DataFrame
 from pyspark.sql.functions import col, when, count, sum as spark_sum, avg, stddev, max as spark_max, min as spark_min
-from pyspark.sql.functions import abs as spark_abs, percentile_approx, lag, lead, expr
-from pyspark.sql.window import Window
-from pyspark.sql.types import DoubleType, IntegerType, StringType
-from typing import Dict, Any, List, Optional, Tuple
+from pyspark.sql.functions import abs as spark_abs, percentile_approx, lead, expr
+from pyspark.sql.types import DoubleType, IntegerType, StringType, LongType, FloatType, DecimalType
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 import logging
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+from functools import partial
 from enum import Enum
+from collections import Counter
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import io
+import itertools
 import json
+import re
+import time
+from .spark_config import arrow_enabled
+
+logger = logging.getLogger(__name__)
+
+# Column types analysed by the statistical and ML detectors
+NUMERIC_TYPES = (IntegerType, LongType, FloatType, DoubleType, DecimalType)
+
+# Route supported scikit-learn estimators through oneDAL when Intel's extension is
+# installed; this must run before the estimators below are imported
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn(verbose=False)
+    SKLEARNEX_AVAILABLE = True
+except ImportError:
+    SKLEARNEX_AVAILABLE = False
 
 try:
     from sklearn.ensemble import IsolationForest
     from sklearn.cluster import DBSCAN
     from sklearn.preprocessing import StandardScaler
     from sklearn.decomposition import PCA
+    from joblib import parallel_config
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
     logger.warning("scikit-learn not available, ML-based anomaly detection disabled")
 
-logger = logging.getLogger(__name__)
+try:
+    import hdbscan
+    HDBSCAN_AVAILABLE = True
+except ImportError:
+    HDBSCAN_AVAILABLE = False
+
+try:
+    from cuml.ensemble import IsolationForest as CuMLIsolationForest
+    CUML_AVAILABLE = True
+except ImportError:
+    CUML_AVAILABLE = False
 
 
 class AnomalyType(Enum):
@@ -50,6 +84,74 @@ class AnomalySeverity(Enum):
     CRITICAL = "critical"
 
 
+# Severity levels in ascending order; a value exceeding k thresholds maps to level k
+SEVERITY_LEVELS = (
+    AnomalySeverity.LOW,
+    AnomalySeverity.MEDIUM,
+    AnomalySeverity.HIGH,
+    AnomalySeverity.CRITICAL
+)
+
+# Ascending severity thresholds per detection method (strictly exceeded)
+Z_SCORE_SEVERITY_THRESHOLDS = np.array([1.0, 5.0, 10.0])         # % of records
+IQR_SEVERITY_THRESHOLDS = np.array([3.0, 8.0, 15.0])             # % of records
+VOLUME_CHANGE_SEVERITY_THRESHOLDS = np.array([0.4, 0.6, 0.8])    # relative change
+SEASONAL_DEVIATION_SEVERITY_THRESHOLDS = np.array([3.0, 5.0])    # average z-score
+SEASONAL_PERCENTAGE_SEVERITY_THRESHOLDS = np.array([5.0, 10.0])  # % of records
+ISOLATION_FOREST_SEVERITY_THRESHOLDS = np.array([5.0, 10.0, 15.0])
+DBSCAN_SEVERITY_THRESHOLDS = np.array([5.0])
+
+
+# Substring indicators of healthcare tables and fields, matched in a single regex pass
+HEALTHCARE_TABLE_PATTERN = re.compile("|".join(map(re.escape, [
+    'claim', 'member', 'patient', 'provider'
+])))
+HEALTHCARE_FIELD_PATTERN = re.compile("|".join(map(re.escape, [
+    'member_id', 'patient_id', 'claim_id', 'provider_npi', 'diagnosis_code',
+    'procedure_code', 'icd', 'cpt', 'hcpcs', 'claim_amount'
+])))
+
+
+# Anomaly report layout
+REPORT_HEADER_TEMPLATE = (
+    "{rule}\n"
+    "ANOMALY DETECTION REPORT\n"
+    "{rule}\n"
+    "Table: {table_name}\n"
+    "Timestamp: {timestamp}\n"
+    "Total Records: {total_records:,}\n"
+    "Detection Methods: {methods}\n"
+    "\n"
+    "SUMMARY\n"
+    "--------------------\n"
+    "Total Anomalies Found: {total_anomalies}"
+)
+REPORT_ANOMALY_TEMPLATE = (
+    "\n\n{i}. {description}\n"
+    "   Field: {field_name}\n"
+    "   Severity: {severity_title}\n"
+    "   Score: {score:.2f}\n"
+    "   Affected Records: {affected_records:,}\n"
+    "   Method: {detection_method}"
+)
+
+
+# Anomaly ids are the process start time plus a counter: unique within a run even
+# when detectors finish in the same second, and no clock read per anomaly
+_ANOMALY_ID_EPOCH = int(datetime.now().timestamp())
+_ANOMALY_ID_SEQUENCE = itertools.count(1)
+
+
+def new_anomaly_id(prefix: str) -> str:
+    """Generate a unique anomaly id with the given prefix"""
+    return f"{prefix}_{_ANOMALY_ID_EPOCH}_{next(_ANOMALY_ID_SEQUENCE)}"
+
+
+def bucket_severity(value: float, thresholds: np.ndarray) -> AnomalySeverity:
+    """Map a value to a severity level by counting the thresholds it exceeds"""
+    return SEVERITY_LEVELS[int(np.searchsorted(thresholds, value, side='left'))]
+
+
 @dataclass
 class AnomalyResult:
     """Represents a detected anomaly"""
@@ -84,9 +186,193 @@ class AnomalyResult:
         }
 
 
+class AnomalyDetails(Sequence):
+    """
+    Read-only sequence of anomaly dicts, serialized from AnomalyResult on access
+    
+    Opt-in via the engine's 'lazy_anomaly_details' option for callers that only read a
+    few entries. It is not a list: use to_list() before json.dumps or list operations.
+    """
+    
+    def __init__(self, anomalies: List[AnomalyResult]):
+        self._anomalies = anomalies
+        
+    def __len__(self) -> int:
+        return len(self._anomalies)
+        
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [anomaly.to_dict() for anomaly in self._anomalies[index]]
+        return self._anomalies[index].to_dict()
+        
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (anomaly.to_dict() for anomaly in self._anomalies)
+        
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Materialize every anomaly dict, e.g. for JSON serialization"""
+        return list(self)
+
+
+@dataclass
+class RunningStats:
+    """Mergeable count/mean/M2 statistics, built per batch with from_values and combined with merge"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'RunningStats':
+        """Build statistics for a whole batch of observations in one vectorized step"""
+        count = int(values.size)
+        if count == 0:
+            return cls()
+        mean = float(values.mean())
+        return cls(count=count, mean=mean, m2=float(np.square(values - mean).sum()))
+        
+    def merge(self, other: 'RunningStats') -> None:
+        """Combine with statistics accumulated over another batch (Chan et al.)"""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        
+    @property
+    def variance(self) -> float:
+        """Sample variance (0.0 for fewer than two observations)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation"""
+        return self.variance ** 0.5
+
+
 class StatisticalAnomalyDetector:
     """Statistical methods for anomaly detection"""
     
+    # Minimum non-null values before running outlier scans
+    MIN_SAMPLES = 10
+    
+    @staticmethod
+    def field_statistics(
+        df: DataFrame,
+        field_names: List[str],
+        include_quartiles: bool = True
+    ) -> Dict[str, Dict[str, Any]]:
+        """Compute mean, stddev, count and (optionally) quartiles for several fields in one Spark job"""
+        
+        stride = 5 if include_quartiles else 3
+        aggregations = []
+        for field_name in field_names:
+            aggregations.extend([
+                avg(col(field_name)),
+                stddev(col(field_name)),
+                count(col(field_name))
+            ])
+            if include_quartiles:
+                aggregations.extend([
+                    percentile_approx(col(field_name), 0.25),
+                    percentile_approx(col(field_name), 0.75)
+                ])
+                
+        row = df.agg(*aggregations).collect()[0]
+        
+        # Positional access avoids alias clashes with arbitrary column names
+        field_stats = {}
+        for i, field_name in enumerate(field_names):
+            offset = i * stride
+            field_stats[field_name] = {
+                'mean': row[offset],
+                'stddev': row[offset + 1],
+                'count': row[offset + 2],
+                'q1': row[offset + 3] if include_quartiles else None,
+                'q3': row[offset + 4] if include_quartiles else None
+            }
+            
+        return field_stats
+        
+    @staticmethod
+    def _has_spread(stats: Dict[str, Any]) -> bool:
+        """Whether a field has enough non-constant values to contain outliers"""
+        return (stats['count'] >= StatisticalAnomalyDetector.MIN_SAMPLES
+                and stats['stddev'] is not None and stats['stddev'] != 0)
+        
+    @staticmethod
+    def _iqr_bounds(stats: Dict[str, Any], multiplier: float) -> Tuple[float, float, float]:
+        """IQR and lower/upper fences for a field"""
+        iqr = stats['q3'] - stats['q1']
+        return iqr, stats['q1'] - (multiplier * iqr), stats['q3'] + (multiplier * iqr)
+        
+    @staticmethod
+    def _z_score_condition(field_name: str, stats: Dict[str, Any], threshold: float):
+        """Spark predicate matching Z-score outliers"""
+        return spark_abs((col(field_name) - stats['mean']) / stats['stddev']) > threshold
+        
+    @staticmethod
+    def _iqr_condition(field_name: str, stats: Dict[str, Any], multiplier: float):
+        """Spark predicate matching values outside the IQR fences"""
+        _, lower_bound, upper_bound = StatisticalAnomalyDetector._iqr_bounds(stats, multiplier)
+        return (col(field_name) < lower_bound) | (col(field_name) > upper_bound)
+        
+    @staticmethod
+    def detect_fields(
+        df: DataFrame,
+        field_names: List[str],
+        z_threshold: float = 3.0,
+        iqr_multiplier: float = 1.5
+    ) -> List[AnomalyResult]:
+        """
+        Run Z-score and IQR detection for several fields with two Spark jobs in total
+        
+        One aggregation gathers the statistics for every field and a second counts
+        the outliers for both methods, instead of separate jobs per field and method.
+        """
+        
+        anomalies = []
+        
+        try:
+            df = df.select(*[col(field_name) for field_name in field_names])
+            field_stats = StatisticalAnomalyDetector.field_statistics(df, field_names)
+            
+            # Fields eligible for each method
+            z_fields = [f for f in field_names if StatisticalAnomalyDetector._has_spread(field_stats[f])]
+            iqr_fields = [f for f in z_fields
+                          if field_stats[f]['q1'] is not None and field_stats[f]['q3'] is not None]
+            
+            if not z_fields:
+                return anomalies
+                
+            outlier_counts = df.agg(
+                *[spark_sum(when(StatisticalAnomalyDetector._z_score_condition(
+                      f, field_stats[f], z_threshold), 1).otherwise(0)) for f in z_fields],
+                *[spark_sum(when(StatisticalAnomalyDetector._iqr_condition(
+                      f, field_stats[f], iqr_multiplier), 1).otherwise(0)) for f in iqr_fields]
+            ).collect()[0]
+            
+            for i, field_name in enumerate(z_fields):
+                anomaly = StatisticalAnomalyDetector._z_score_anomaly(
+                    field_name, field_stats[field_name], outlier_counts[i] or 0, z_threshold
+                )
+                if anomaly:
+                    anomalies.append(anomaly)
+                    
+                if field_name in iqr_fields:
+                    anomaly = StatisticalAnomalyDetector._iqr_anomaly(
+                        field_name, field_stats[field_name],
+                        outlier_counts[len(z_fields) + iqr_fields.index(field_name)] or 0,
+                        iqr_multiplier
+                    )
+                    if anomaly:
+                        anomalies.append(anomaly)
+                        
+        except Exception as e:
+            logger.error(f"Error in statistical detection for {field_names}: {str(e)}")
+            
+        return anomalies
+        
     @staticmethod
     def z_score_detection(df: DataFrame, field_name: str, threshold: float = 3.0) -> List[AnomalyResult]:
         """Detect outliers using Z-score method"""
@@ -94,63 +380,23 @@ class StatisticalAnomalyDetector:
         anomalies = []
         
         try:
+            # Only the analysed column is needed downstream
+            df = df.select(col(field_name))
+            
             # Calculate mean and standard deviation
-            stats = df.select(
-                avg(col(field_name)).alias('mean'),
-                stddev(col(field_name)).alias('stddev'),
-                count(col(field_name)).alias('count')
-            ).collect()[0]
+            stats = StatisticalAnomalyDetector.field_statistics(
+                df, [field_name], include_quartiles=False
+            )[field_name]
             
-            if stats['stddev'] is None or stats['stddev'] == 0:
-                return anomalies  # No variance, no outliers
+            if not StatisticalAnomalyDetector._has_spread(stats):
+                return anomalies  # Too few values or no variance, no outliers
                 
-            mean_val = stats['mean']
-            std_val = stats['stddev']
-            total_count = stats['count']
-            
             # Find outliers
-            outlier_condition = (
-                spark_abs((col(field_name) - mean_val) / std_val) > threshold
-            )
-            
+            outlier_condition = StatisticalAnomalyDetector._z_score_condition(field_name, stats, threshold)
             outlier_count = df.filter(outlier_condition).count()
             
-            if outlier_count > 0:
-                outlier_percentage = (outlier_count / total_count) * 100
-                
-                # Determine severity based on percentage of outliers
-                if outlier_percentage > 10:
-                    severity = AnomalySeverity.CRITICAL
-                elif outlier_percentage > 5:
-                    severity = AnomalySeverity.HIGH
-                elif outlier_percentage > 1:
-                    severity = AnomalySeverity.MEDIUM
-                else:
-                    severity = AnomalySeverity.LOW
-                    
-                anomaly = AnomalyResult(
-                    anomaly_id=f"zscore_{field_name}_{int(datetime.now().timestamp())}",
-                    anomaly_type=AnomalyType.STATISTICAL_OUTLIER,
-                    severity=severity,
-                    field_name=field_name,
-                    description=f"Z-score outliers detected in {field_name} ({outlier_count} records, {outlier_percentage:.1f}%)",
-                    score=outlier_percentage / 10.0,  # Normalize to 0-10 scale
-                    affected_records=outlier_count,
-                    threshold=threshold,
-                    detection_method="z_score",
-                    context={
-                        'mean': float(mean_val),
-                        'stddev': float(std_val),
-                        'outlier_percentage': outlier_percentage
-                    },
-                    timestamp=datetime.now().isoformat(),
-                    recommendations=[
-                        "Investigate extreme values in the data",
-                        "Check for data entry errors",
-                        "Consider if outliers represent legitimate edge cases"
-                    ]
-                )
-                
+            anomaly = StatisticalAnomalyDetector._z_score_anomaly(field_name, stats, outlier_count, threshold)
+            if anomaly:
                 anomalies.append(anomaly)
                 
         except Exception as e:
@@ -158,6 +404,48 @@ class StatisticalAnomalyDetector:
             
         return anomalies
         
+    @staticmethod
+    def _z_score_anomaly(
+        field_name: str,
+        stats: Dict[str, Any],
+        outlier_count: int,
+        threshold: float
+    ) -> Optional[AnomalyResult]:
+        """Build the Z-score result for a field, if it has outliers"""
+        
+        if outlier_count <= 0:
+            return None
+            
+        mean_val = stats['mean']
+        std_val = stats['stddev']
+        outlier_percentage = (outlier_count / stats['count']) * 100
+        
+        # Determine severity based on percentage of outliers
+        severity = bucket_severity(outlier_percentage, Z_SCORE_SEVERITY_THRESHOLDS)
+            
+        return AnomalyResult(
+            anomaly_id=new_anomaly_id(f"zscore_{field_name}"),
+            anomaly_type=AnomalyType.STATISTICAL_OUTLIER,
+            severity=severity,
+            field_name=field_name,
+            description=f"Z-score outliers detected in {field_name} ({outlier_count} records, {outlier_percentage:.1f}%)",
+            score=outlier_percentage / 10.0,  # Normalize to 0-10 scale
+            affected_records=outlier_count,
+            threshold=threshold,
+            detection_method="z_score",
+            context={
+                'mean': float(mean_val),
+                'stddev': float(std_val),
+                'outlier_percentage': outlier_percentage
+            },
+            timestamp=datetime.now().isoformat(),
+            recommendations=[
+                "Investigate extreme values in the data",
+                "Check for data entry errors",
+                "Consider if outliers represent legitimate edge cases"
+            ]
+        )
+        
     @staticmethod
     def iqr_detection(df: DataFrame, field_name: str, multiplier: float = 1.5) -> List[AnomalyResult]:
         """Detect outliers using Interquartile Range (IQR) method"""
@@ -165,76 +453,76 @@ class StatisticalAnomalyDetector:
         anomalies = []
         
         try:
-            # Calculate quartiles
-            quartiles = df.select(
-                percentile_approx(col(field_name), 0.25).alias('q1'),
-                percentile_approx(col(field_name), 0.75).alias('q3'),
-                count(col(field_name)).alias('count')
-            ).collect()[0]
+            # Only the analysed column is needed downstream
+            df = df.select(col(field_name))
             
-            q1 = quartiles['q1']
-            q3 = quartiles['q3']
-            total_count = quartiles['count']
+            # Calculate quartiles
+            stats = StatisticalAnomalyDetector.field_statistics(df, [field_name])[field_name]
             
-            if q1 is None or q3 is None:
+            if not StatisticalAnomalyDetector._has_spread(stats):
+                return anomalies  # Too few values or constant column, nothing outside the fences
+                
+            if stats['q1'] is None or stats['q3'] is None:
                 return anomalies
                 
-            iqr = q3 - q1
-            lower_bound = q1 - (multiplier * iqr)
-            upper_bound = q3 + (multiplier * iqr)
-            
             # Find outliers
-            outlier_condition = (
-                (col(field_name) < lower_bound) | (col(field_name) > upper_bound)
-            )
-            
+            outlier_condition = StatisticalAnomalyDetector._iqr_condition(field_name, stats, multiplier)
             outlier_count = df.filter(outlier_condition).count()
             
-            if outlier_count > 0:
-                outlier_percentage = (outlier_count / total_count) * 100
-                
-                # Determine severity
-                if outlier_percentage > 15:
-                    severity = AnomalySeverity.CRITICAL
-                elif outlier_percentage > 8:
-                    severity = AnomalySeverity.HIGH
-                elif outlier_percentage > 3:
-                    severity = AnomalySeverity.MEDIUM
-                else:
-                    severity = AnomalySeverity.LOW
-                    
-                anomaly = AnomalyResult(
-                    anomaly_id=f"iqr_{field_name}_{int(datetime.now().timestamp())}",
-                    anomaly_type=AnomalyType.STATISTICAL_OUTLIER,
-                    severity=severity,
-                    field_name=field_name,
-                    description=f"IQR outliers detected in {field_name} ({outlier_count} records, {outlier_percentage:.1f}%)",
-                    score=min(10.0, outlier_percentage / 2.0),  # Cap at 10
-                    affected_records=outlier_count,
-                    threshold=multiplier,
-                    detection_method="iqr",
-                    context={
-                        'q1': float(q1),
-                        'q3': float(q3),
-                        'iqr': float(iqr),
-                        'lower_bound': float(lower_bound),
-                        'upper_bound': float(upper_bound),
-                        'outlier_percentage': outlier_percentage
-                    },
-                    timestamp=datetime.now().isoformat(),
-                    recommendations=[
-                        "Review data distribution and identify outlier causes",
-                        "Consider data transformation or normalization",
-                        "Validate extreme values with business users"
-                    ]
-                )
-                
+            anomaly = StatisticalAnomalyDetector._iqr_anomaly(field_name, stats, outlier_count, multiplier)
+            if anomaly:
                 anomalies.append(anomaly)
                 
         except Exception as e:
             logger.error(f"Error in IQR detection for {field_name}: {str(e)}")
             
         return anomalies
+        
+    @staticmethod
+    def _iqr_anomaly(
+        field_name: str,
+        stats: Dict[str, Any],
+        outlier_count: int,
+        multiplier: float
+    ) -> Optional[AnomalyResult]:
+        """Build the IQR result for a field, if it has outliers"""
+        
+        if outlier_count <= 0:
+            return None
+            
+        q1 = stats['q1']
+        q3 = stats['q3']
+        iqr, lower_bound, upper_bound = StatisticalAnomalyDetector._iqr_bounds(stats, multiplier)
+        outlier_percentage = (outlier_count / stats['count']) * 100
+        
+        # Determine severity
+        severity = bucket_severity(outlier_percentage, IQR_SEVERITY_THRESHOLDS)
+            
+        return AnomalyResult(
+            anomaly_id=new_anomaly_id(f"iqr_{field_name}"),
+            anomaly_type=AnomalyType.STATISTICAL_OUTLIER,
+            severity=severity,
+            field_name=field_name,
+            description=f"IQR outliers detected in {field_name} ({outlier_count} records, {outlier_percentage:.1f}%)",
+            score=min(10.0, outlier_percentage / 2.0),  # Cap at 10
+            affected_records=outlier_count,
+            threshold=multiplier,
+            detection_method="iqr",
+            context={
+                'q1': float(q1),
+                'q3': float(q3),
+                'iqr': float(iqr),
+                'lower_bound': float(lower_bound),
+                'upper_bound': float(upper_bound),
+                'outlier_percentage': outlier_percentage
+            },
+            timestamp=datetime.now().isoformat(),
+            recommendations=[
+                "Review data distribution and identify outlier causes",
+                "Consider data transformation or normalization",
+                "Validate extreme values with business users"
+            ]
+        )
 
 
 class TemporalAnomalyDetector:
@@ -251,50 +539,43 @@ class TemporalAnomalyDetector:
         anomalies = []
         
         try:
-            # Group by hour/day to detect volume changes
-            window_spec = Window.partitionBy().orderBy(col(timestamp_col))
+            df = df.select(col(timestamp_col))
             
-            # Calculate rolling volume
+            # Hourly volumes are small (one row per hour), so compute changes on the driver
+            # instead of a lag() over an unpartitioned window
             volume_df = (df
                         .groupBy(expr(f"date_trunc('hour', {timestamp_col})").alias("time_window"))
                         .count()
                         .withColumnRenamed("count", "volume")
-                        .orderBy("time_window"))
+                        .orderBy("time_window")
+                        .toPandas())
+            
+            time_windows = volume_df['time_window'].tolist()
+            volumes = volume_df['volume'].to_numpy(dtype=np.float64)
+            prev_volumes = volumes[:-1]
             
-            # Calculate volume changes
-            volume_with_change = (volume_df
-                                .withColumn("prev_volume", 
-                                          lag("volume").over(Window.orderBy("time_window")))
-                                .withColumn("volume_change",
-                                          when(col("prev_volume") > 0,
-                                               spark_abs(col("volume") - col("prev_volume")) / col("prev_volume"))
-                                          .otherwise(0)))
+            # Relative change versus the previous window; 0 where there is no prior volume
+            volume_changes = np.divide(
+                np.abs(volumes[1:] - prev_volumes),
+                prev_volumes,
+                out=np.zeros_like(prev_volumes),
+                where=prev_volumes > 0
+            )
             
             # Find significant volume changes
-            anomalous_periods = (volume_with_change
-                               .filter(col("volume_change") > threshold)
-                               .collect())
-            
-            for period in anomalous_periods:
-                volume_change = period['volume_change']
-                current_volume = period['volume']
-                prev_volume = period['prev_volume']
-                time_window = period['time_window']
+            for idx in np.flatnonzero(volume_changes > threshold):
+                volume_change = float(volume_changes[idx])
+                current_volume = volumes[idx + 1]
+                prev_volume = prev_volumes[idx]
+                time_window = time_windows[idx + 1]
                 
                 # Determine severity based on magnitude of change
-                if volume_change > 0.8:
-                    severity = AnomalySeverity.CRITICAL
-                elif volume_change > 0.6:
-                    severity = AnomalySeverity.HIGH
-                elif volume_change > 0.4:
-                    severity = AnomalySeverity.MEDIUM
-                else:
-                    severity = AnomalySeverity.LOW
+                severity = bucket_severity(volume_change, VOLUME_CHANGE_SEVERITY_THRESHOLDS)
                     
                 change_type = "increase" if current_volume > prev_volume else "decrease"
                 
                 anomaly = AnomalyResult(
-                    anomaly_id=f"volume_{time_window}_{int(datetime.now().timestamp())}",
+                    anomaly_id=new_anomaly_id(f"volume_{time_window}"),
                     anomaly_type=AnomalyType.VOLUME_ANOMALY,
                     severity=severity,
                     field_name="record_volume",
@@ -325,6 +606,41 @@ class TemporalAnomalyDetector:
             
         return anomalies
         
+    @staticmethod
+    def _seasonal_partial_stats(
+        batches: Iterator[pd.DataFrame],
+        avg_matrix: np.ndarray,
+        stddev_matrix: np.ndarray
+    ) -> Iterator[pd.DataFrame]:
+        """Score (hour, day_of_week, value) batches against seasonal baselines
+        
+        Yields one row per batch with the record count and the running statistics
+        of the z-scores that exceed the seasonal threshold.
+        """
+        
+        for batch in batches:
+            valid_data = batch.dropna()
+            
+            hours = valid_data['hour'].to_numpy(dtype=np.intp)
+            days = valid_data['day_of_week'].to_numpy(dtype=np.intp)
+            values = valid_data['value'].to_numpy(dtype=np.float64)
+            
+            expected_avg = avg_matrix[days, hours]
+            expected_stddev = stddev_matrix[days, hours]
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = np.abs(values - expected_avg) / expected_stddev
+                
+            # Seasonal anomaly threshold; NaN baselines compare False
+            stats = RunningStats.from_values(z_scores[(expected_stddev > 0) & (z_scores > 2.5)])
+            
+            yield pd.DataFrame({
+                'records': [len(batch)],
+                'count': [stats.count],
+                'mean': [stats.mean],
+                'm2': [stats.m2]
+            })
+            
     @staticmethod
     def seasonal_anomaly_detection(
         df: DataFrame,
@@ -337,62 +653,69 @@ class TemporalAnomalyDetector:
         anomalies = []
         
         try:
+            df = df.select(col(timestamp_col), col(value_col))
+            
+            # Cheap probe before the per-bucket aggregation and scoring jobs
+            probe = df.select(
+                count(col(value_col)).alias('count'),
+                stddev(col(value_col)).alias('stddev')
+            ).collect()[0]
+            
+            if probe['count'] < StatisticalAnomalyDetector.MIN_SAMPLES or not probe['stddev']:
+                return anomalies
+                
             # Extract hour/day patterns
-            pattern_df = (df
-                         .withColumn("hour", expr(f"hour({timestamp_col})"))
-                         .withColumn("day_of_week", expr(f"dayofweek({timestamp_col})"))
+            bucketed_df = (df
+                          .select(expr(f"hour({timestamp_col})").alias("hour"),
+                                  expr(f"dayofweek({timestamp_col})").alias("day_of_week"),
+                                  col(value_col).cast(DoubleType()).alias("value")))
+            
+            pattern_df = (bucketed_df
                          .groupBy("hour", "day_of_week")
-                         .agg(avg(col(value_col)).alias("avg_value"),
-                              stddev(col(value_col)).alias("stddev_value"),
-                              count(col(value_col)).alias("count_value"))
+                         .agg(avg(col("value")).alias("avg_value"),
+                              stddev(col("value")).alias("stddev_value"),
+                              count(col("value")).alias("count_value"))
                          .collect())
             
-            # Build expected patterns
-            expected_patterns = {}
+            # Build dense (day_of_week, hour) baselines; dayofweek is 1-7, hour is 0-23
+            avg_matrix = np.full((8, 24), np.nan)
+            stddev_matrix = np.full((8, 24), np.nan)
             for row in pattern_df:
-                key = (row['hour'], row['day_of_week'])
-                expected_patterns[key] = {
-                    'avg': row['avg_value'],
-                    'stddev': row['stddev_value'] or 0,
-                    'count': row['count_value']
-                }
+                if row['hour'] is None or row['day_of_week'] is None or row['avg_value'] is None:
+                    continue
+                avg_matrix[row['day_of_week'], row['hour']] = row['avg_value']
+                stddev_matrix[row['day_of_week'], row['hour']] = row['stddev_value'] or 0
                 
-            # Find current anomalies
-            current_data = (df
-                           .withColumn("hour", expr(f"hour({timestamp_col})"))
-                           .withColumn("day_of_week", expr(f"dayofweek({timestamp_col})"))
-                           .select("hour", "day_of_week", value_col)
-                           .collect())
-            
-            anomaly_count = 0
-            total_deviations = 0
-            
-            for row in current_data:
-                key = (row['hour'], row['day_of_week'])
-                actual_value = row[value_col]
+            # Score rows on the executors against the (small) baselines; only one partial
+            # statistics row per Arrow batch comes back to the driver
+            partials = (bucketed_df
+                       .mapInPandas(
+                           partial(TemporalAnomalyDetector._seasonal_partial_stats,
+                                   avg_matrix=avg_matrix, stddev_matrix=stddev_matrix),
+                           schema="records long, count long, mean double, m2 double")
+                       .collect())
+            
+            total_records = 0
+            deviation_stats = RunningStats()
+            for row in partials:
+                total_records += row['records']
+                deviation_stats.merge(RunningStats(count=row['count'], mean=row['mean'], m2=row['m2']))
                 
-                if key in expected_patterns and actual_value is not None:
-                    expected = expected_patterns[key]
-                    if expected['stddev'] > 0:
-                        z_score = abs(actual_value - expected['avg']) / expected['stddev']
-                        if z_score > 2.5:  # Seasonal anomaly threshold
-                            anomaly_count += 1
-                            total_deviations += z_score
-                            
+            anomaly_count = deviation_stats.count
+            
             if anomaly_count > 0:
-                avg_deviation = total_deviations / anomaly_count
-                anomaly_percentage = (anomaly_count / len(current_data)) * 100
+                avg_deviation = deviation_stats.mean
+                anomaly_percentage = (anomaly_count / total_records) * 100
                 
                 # Determine severity
-                if avg_deviation > 5 or anomaly_percentage > 10:
-                    severity = AnomalySeverity.HIGH
-                elif avg_deviation > 3 or anomaly_percentage > 5:
-                    severity = AnomalySeverity.MEDIUM
-                else:
-                    severity = AnomalySeverity.LOW
+                severity = max(
+                    bucket_severity(avg_deviation, SEASONAL_DEVIATION_SEVERITY_THRESHOLDS),
+                    bucket_severity(anomaly_percentage, SEASONAL_PERCENTAGE_SEVERITY_THRESHOLDS),
+                    key=SEVERITY_LEVELS.index
+                )
                     
                 anomaly = AnomalyResult(
-                    anomaly_id=f"seasonal_{value_col}_{int(datetime.now().timestamp())}",
+                    anomaly_id=new_anomaly_id(f"seasonal_{value_col}"),
                     anomaly_type=AnomalyType.TEMPORAL_ANOMALY,
                     severity=severity,
                     field_name=value_col,
@@ -405,6 +728,7 @@ class TemporalAnomalyDetector:
                         'anomaly_count': anomaly_count,
                         'anomaly_percentage': anomaly_percentage,
                         'avg_deviation': avg_deviation,
+                        'deviation_stddev': deviation_stats.stddev,
                         'seasonal_period': seasonal_period
                     },
                     timestamp=datetime.now().isoformat(),
@@ -433,6 +757,8 @@ class HealthcareAnomalyDetector:
         anomalies = []
         
         try:
+            df = df.select("procedure_code", "claim_amount")
+            
             # Analyze by procedure code
             claim_stats = (df
                           .groupBy("procedure_code")
@@ -470,7 +796,7 @@ class HealthcareAnomalyDetector:
                 
                 if zero_percentage > 5:  # > 5% zero claims is unusual
                     anomaly = AnomalyResult(
-                        anomaly_id=f"zero_claims_{int(datetime.now().timestamp())}",
+                        anomaly_id=new_anomaly_id("zero_claims"),
                         anomaly_type=AnomalyType.HEALTHCARE_SPECIFIC,
                         severity=AnomalySeverity.HIGH,
                         field_name="claim_amount",
@@ -500,7 +826,7 @@ class HealthcareAnomalyDetector:
                 
                 if high_percentage > 1:  # > 1% high-value claims is unusual
                     anomaly = AnomalyResult(
-                        anomaly_id=f"high_claims_{int(datetime.now().timestamp())}",
+                        anomaly_id=new_anomaly_id("high_claims"),
                         anomaly_type=AnomalyType.HEALTHCARE_SPECIFIC,
                         severity=AnomalySeverity.MEDIUM,
                         field_name="claim_amount",
@@ -536,6 +862,8 @@ class HealthcareAnomalyDetector:
         anomalies = []
         
         try:
+            df = df.select("member_id", "claim_id", "claim_amount", "provider_npi", "procedure_code")
+            
             # Analyze member utilization patterns
             member_utilization = (df
                                 .groupBy("member_id")
@@ -576,7 +904,7 @@ class HealthcareAnomalyDetector:
                 
                 if utilization_percentage > 2:  # > 2% excessive utilization
                     anomaly = AnomalyResult(
-                        anomaly_id=f"excessive_utilization_{int(datetime.now().timestamp())}",
+                        anomaly_id=new_anomaly_id("excessive_utilization"),
                         anomaly_type=AnomalyType.HEALTHCARE_SPECIFIC,
                         severity=AnomalySeverity.HIGH,
                         field_name="member_utilization",
@@ -606,7 +934,7 @@ class HealthcareAnomalyDetector:
                 
                 if shopping_percentage > 1:  # > 1% provider shopping
                     anomaly = AnomalyResult(
-                        anomaly_id=f"provider_shopping_{int(datetime.now().timestamp())}",
+                        anomaly_id=new_anomaly_id("provider_shopping"),
                         anomaly_type=AnomalyType.HEALTHCARE_SPECIFIC,
                         severity=AnomalySeverity.MEDIUM,
                         field_name="provider_utilization",
@@ -640,17 +968,111 @@ class HealthcareAnomalyDetector:
 class MLAnomalyDetector:
     """Machine Learning based anomaly detection"""
     
-    def __init__(self):
+    # Minimum null-free rows needed to fit a model
+    MIN_SAMPLES = 100
+    
+    # Below this size GPU transfer and launch overhead outweighs faster tree building
+    GPU_MIN_SAMPLES = 50_000
+    
+    def __init__(self, model_ttl_seconds: float = 3600.0, drift_tolerance: float = 0.5):
+        """
+        Args:
+            model_ttl_seconds: Age after which a fitted scaler or model is refit
+            drift_tolerance: Shift of a batch's column mean, in fitted standard deviations,
+                that makes the scaler and its models refit (as does a 2x change in spread)
+        """
         self.models = {}
         self.scalers = {}
+        self.model_ttl_seconds = model_ttl_seconds
+        self.drift_tolerance = drift_tolerance
+        self._fitted_at: Dict[tuple, float] = {}
+        
+    def invalidate(self, dataset: Optional[str] = None):
+        """Drop fitted scalers and models for one dataset, or for all datasets"""
+        for cache in (self.scalers, self.models, self._fitted_at):
+            for key in [key for key in cache if dataset is None or key[0] == dataset]:
+                del cache[key]
+                
+    def _is_expired(self, key: tuple) -> bool:
+        return time.monotonic() - self._fitted_at.get(key, float('-inf')) > self.model_ttl_seconds
+        
+    def _distribution_shifted(self, scaler: "StandardScaler", features: np.ndarray) -> bool:
+        """Whether a batch has moved away from the distribution the scaler was fitted on"""
+        mean_shift = np.abs(features.mean(axis=0, dtype=np.float64) - scaler.mean_) / scaler.scale_
+        spread_ratio = features.std(axis=0, dtype=np.float64) / scaler.scale_
+        return bool(np.any(mean_shift > self.drift_tolerance) or
+                    np.any((spread_ratio > 2.0) | (spread_ratio < 0.5)))
+        
+    def scale_features(
+        self,
+        features_df: pd.DataFrame,
+        numeric_fields: List[str],
+        dataset: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Drop incomplete rows and standardize features in a single pass
+        
+        The scaler is fitted once per dataset and feature set and reused for later batches
+        so cached models keep seeing the same feature space. It is refit, dropping the
+        models built on it, once it is older than model_ttl_seconds or a batch's
+        distribution has shifted. Inputs with fewer than MIN_SAMPLES rows are returned
+        unscaled (detectors skip them).
+        
+        Args:
+            features_df: Driver-side pandas frame containing at least numeric_fields
+            numeric_fields: Feature columns, in the order of the output matrix
+            dataset: Table or dataset the features come from
+            
+        Returns:
+            float32 matrix of standardized features
+        """
+        
+        # float32 halves memory traffic for scaling and tree traversal; drop incomplete
+        # rows with a NaN mask so only the filtered matrix is allocated
+        features = features_df[numeric_fields].to_numpy(dtype=np.float32, na_value=np.nan)
+        features = np.ascontiguousarray(features[~np.isnan(features).any(axis=1)])
+        
+        if len(features) < self.MIN_SAMPLES:
+            return features
+            
+        scaler_key = (dataset, tuple(numeric_fields))
+        scaler = self.scalers.get(scaler_key)
+        
+        if scaler is not None and (self._is_expired(scaler_key) or self._distribution_shifted(scaler, features)):
+            # Models fitted in the old feature space are no longer comparable
+            for key in [key for key in self.models if key[:2] == scaler_key]:
+                del self.models[key]
+                self._fitted_at.pop(key, None)
+            scaler = None
+            
+        if scaler is None:
+            # The matrix is a private copy, so scale it in place
+            scaler = StandardScaler(copy=False)
+            scaled_data = scaler.fit_transform(features)
+            self.scalers[scaler_key] = scaler
+            self._fitted_at[scaler_key] = time.monotonic()
+            return scaled_data
+            
+        return scaler.transform(features, copy=False)
         
     def isolation_forest_detection(
         self, 
-        df: DataFrame, 
+        features: Union[pd.DataFrame, np.ndarray], 
         numeric_fields: List[str],
-        contamination: float = 0.1
+        contamination: float = 0.1,
+        prescaled: bool = False,
+        dataset: Optional[str] = None
     ) -> List[AnomalyResult]:
-        """Use Isolation Forest for multivariate anomaly detection"""
+        """Use Isolation Forest for multivariate anomaly detection
+        
+        Args:
+            features: Driver-side pandas frame containing at least numeric_fields, or
+                the output of scale_features when prescaled is True
+            numeric_fields: Feature columns to use
+            contamination: Expected proportion of anomalies
+            prescaled: Whether features has already been through scale_features
+            dataset: Table or dataset the features come from; models are cached per dataset
+        """
         
         anomalies = []
         
@@ -659,49 +1081,55 @@ class MLAnomalyDetector:
             return anomalies
             
         try:
-            # Convert to pandas for sklearn processing
-            pandas_df = df.select(*numeric_fields).toPandas()
-            
-            # Remove null values
-            pandas_df = pandas_df.dropna()
+            if prescaled:
+                scaled_data = np.ascontiguousarray(features, dtype=np.float32)
+            else:
+                scaled_data = self.scale_features(features, numeric_fields, dataset)
             
-            if len(pandas_df) < 100:  # Need minimum samples
+            if len(scaled_data) < self.MIN_SAMPLES:  # Need minimum samples
                 logger.warning("Insufficient data for Isolation Forest (< 100 samples)")
                 return anomalies
                 
-            # Scale the features
-            scaler = StandardScaler()
-            scaled_data = scaler.fit_transform(pandas_df)
-            
-            # Fit Isolation Forest
-            iso_forest = IsolationForest(
-                contamination=contamination,
-                random_state=42,
-                n_estimators=100
-            )
+            # Models are reused across batches of the same dataset, feature set and
+            # contamination until they expire or scale_features drops them
+            model_key = (dataset, tuple(numeric_fields), round(contamination, 3))
+            iso_forest = self.models.get(model_key)
             
-            # Predict anomalies (-1 for anomalies, 1 for normal)
-            anomaly_labels = iso_forest.fit_predict(scaled_data)
-            anomaly_scores = iso_forest.decision_function(scaled_data)
+            if iso_forest is None or self._is_expired(model_key):
+                if CUML_AVAILABLE and len(scaled_data) > self.GPU_MIN_SAMPLES:
+                    iso_forest = CuMLIsolationForest(
+                        contamination=contamination,
+                        n_estimators=100
+                    )
+                else:
+                    iso_forest = IsolationForest(
+                        contamination=contamination,
+                        random_state=42,
+                        n_estimators=100,
+                        n_jobs=-1
+                    )
+                iso_forest.fit(scaled_data)
+                self.models[model_key] = iso_forest
+                self._fitted_at[model_key] = time.monotonic()
+                
+            # Predict anomalies (-1 for anomalies, 1 for normal); tree walks release the
+            # GIL, so threads spread scoring across cores without copying the matrix
+            with parallel_config(backend="threading", n_jobs=-1):
+                anomaly_labels = iso_forest.predict(scaled_data)
+                anomaly_scores = iso_forest.decision_function(scaled_data)
             
             # Count anomalies
-            anomaly_count = np.sum(anomaly_labels == -1)
-            total_count = len(pandas_df)
+            anomaly_mask = anomaly_labels == -1
+            anomaly_count = int(np.count_nonzero(anomaly_mask))
+            total_count = len(scaled_data)
             anomaly_percentage = (anomaly_count / total_count) * 100
             
             if anomaly_count > 0:
                 # Determine severity
-                if anomaly_percentage > 15:
-                    severity = AnomalySeverity.CRITICAL
-                elif anomaly_percentage > 10:
-                    severity = AnomalySeverity.HIGH
-                elif anomaly_percentage > 5:
-                    severity = AnomalySeverity.MEDIUM
-                else:
-                    severity = AnomalySeverity.LOW
+                severity = bucket_severity(anomaly_percentage, ISOLATION_FOREST_SEVERITY_THRESHOLDS)
                     
                 anomaly = AnomalyResult(
-                    anomaly_id=f"isolation_forest_{int(datetime.now().timestamp())}",
+                    anomaly_id=new_anomaly_id("isolation_forest"),
                     anomaly_type=AnomalyType.MULTIVARIATE_ANOMALY,
                     severity=severity,
                     field_name=",".join(numeric_fields),
@@ -716,7 +1144,7 @@ class MLAnomalyDetector:
                         'anomaly_percentage': anomaly_percentage,
                         'total_records': total_count,
                         'features': numeric_fields,
-                        'avg_anomaly_score': float(np.mean(anomaly_scores[anomaly_labels == -1]))
+                        'avg_anomaly_score': float(anomaly_scores[anomaly_mask].mean())
                     },
                     timestamp=datetime.now().isoformat(),
                     recommendations=[
@@ -735,12 +1163,24 @@ class MLAnomalyDetector:
         
     def dbscan_anomaly_detection(
         self,
-        df: DataFrame,
+        features: Union[pd.DataFrame, np.ndarray],
         numeric_fields: List[str],
         eps: float = 0.5,
-        min_samples: int = 5
+        min_samples: int = 5,
+        prescaled: bool = False,
+        dataset: Optional[str] = None
     ) -> List[AnomalyResult]:
-        """Use DBSCAN for density-based anomaly detection"""
+        """Use DBSCAN for density-based anomaly detection
+        
+        Args:
+            features: Driver-side pandas frame containing at least numeric_fields, or
+                the output of scale_features when prescaled is True
+            numeric_fields: Feature columns to use
+            eps: Neighbourhood radius in scaled feature space
+            min_samples: Minimum neighbours for a core point
+            prescaled: Whether features has already been through scale_features
+            dataset: Table or dataset the features come from
+        """
         
         anomalies = []
         
@@ -748,47 +1188,62 @@ class MLAnomalyDetector:
             return anomalies
             
         try:
-            # Convert to pandas
-            pandas_df = df.select(*numeric_fields).toPandas()
-            pandas_df = pandas_df.dropna()
+            if prescaled:
+                scaled_data = np.ascontiguousarray(features, dtype=np.float32)
+            else:
+                scaled_data = self.scale_features(features, numeric_fields, dataset)
             
-            if len(pandas_df) < 100:
+            if len(scaled_data) < self.MIN_SAMPLES:
                 return anomalies
                 
-            # Scale features
-            scaler = StandardScaler()
-            scaled_data = scaler.fit_transform(pandas_df)
-            
-            # Apply DBSCAN
-            dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-            cluster_labels = dbscan.fit_predict(scaled_data)
+            # Apply density clustering; HDBSCAN needs no eps tuning when installed,
+            # otherwise DBSCAN with a ball tree and parallel neighbour queries
+            if HDBSCAN_AVAILABLE:
+                algorithm = "hdbscan"
+                # HDBSCAN has no eps; min_cluster_size is the only density parameter used
+                params = {'min_cluster_size': min_samples}
+                threshold = float(min_samples)
+                clusterer = hdbscan.HDBSCAN(core_dist_n_jobs=-1, **params)
+            else:
+                algorithm = "dbscan"
+                params = {'eps': eps, 'min_samples': min_samples}
+                threshold = eps
+                clusterer = DBSCAN(
+                    eps=eps,
+                    min_samples=min_samples,
+                    algorithm='ball_tree',
+                    leaf_size=64,
+                    n_jobs=-1
+                )
+            cluster_labels = clusterer.fit_predict(scaled_data)
             
             # Points labeled as -1 are anomalies
-            anomaly_count = np.sum(cluster_labels == -1)
-            total_count = len(pandas_df)
+            noise_mask = cluster_labels == -1
+            anomaly_count = int(np.count_nonzero(noise_mask))
+            total_count = len(scaled_data)
             anomaly_percentage = (anomaly_count / total_count) * 100
             
             if anomaly_count > 0:
-                severity = AnomalySeverity.MEDIUM if anomaly_percentage > 5 else AnomalySeverity.LOW
+                severity = bucket_severity(anomaly_percentage, DBSCAN_SEVERITY_THRESHOLDS)
                 
                 anomaly = AnomalyResult(
-                    anomaly_id=f"dbscan_{int(datetime.now().timestamp())}",
+                    anomaly_id=new_anomaly_id("dbscan"),
                     anomaly_type=AnomalyType.MULTIVARIATE_ANOMALY,
                     severity=severity,
                     field_name=",".join(numeric_fields),
-                    description=f"Density-based anomalies detected using DBSCAN ({anomaly_count} records, {anomaly_percentage:.1f}%)",
+                    description=f"Density-based anomalies detected using {algorithm.upper()} ({anomaly_count} records, {anomaly_percentage:.1f}%)",
                     score=min(10.0, anomaly_percentage / 3),
                     affected_records=anomaly_count,
-                    threshold=eps,
+                    threshold=threshold,
                     detection_method="dbscan",
                     context={
-                        'eps': eps,
-                        'min_samples': min_samples,
+                        'algorithm': algorithm,
+                        **params,
                         'anomaly_count': anomaly_count,
                         'anomaly_percentage': anomaly_percentage,
                         'total_records': total_count,
                         'features': numeric_fields,
-                        'n_clusters': len(set(cluster_labels)) - (1 if -1 in cluster_labels else 0)
+                        'n_clusters': int(np.unique(cluster_labels[~noise_mask]).size)
                     },
                     timestamp=datetime.now().isoformat(),
                     recommendations=[
@@ -815,7 +1270,10 @@ class AnomalyDetectionEngine:
         self.statistical_detector = StatisticalAnomalyDetector()
         self.temporal_detector = TemporalAnomalyDetector()
         self.healthcare_detector = HealthcareAnomalyDetector()
-        self.ml_detector = MLAnomalyDetector() if SKLEARN_AVAILABLE else None
+        self.ml_detector = MLAnomalyDetector(
+            model_ttl_seconds=config.get('ml_model_ttl_seconds', 3600.0),
+            drift_tolerance=config.get('ml_refit_drift_tolerance', 0.5)
+        ) if SKLEARN_AVAILABLE else None
         
     def detect_all_anomalies(
         self, 
@@ -832,7 +1290,9 @@ class AnomalyDetectionEngine:
             timestamp_col: Timestamp column for temporal analysis
             
         Returns:
-            Dictionary containing all detected anomalies
+            Dictionary containing all detected anomalies; 'anomaly_details' is a list of
+            anomaly dicts, or a read-only AnomalyDetails sequence that builds each dict
+            on access when the 'lazy_anomaly_details' config option is set
         """
         
         logger.info(f"Starting comprehensive anomaly detection for {table_name}")
@@ -841,7 +1301,7 @@ class AnomalyDetectionEngine:
         detection_summary = {
             'table_name': table_name,
             'timestamp': datetime.now().isoformat(),
-            'total_records': df.count(),
+            'total_records': 0,
             'detection_methods_used': [],
             'anomalies_by_type': {},
             'anomalies_by_severity': {},
@@ -849,103 +1309,129 @@ class AnomalyDetectionEngine:
             'anomaly_details': []
         }
         
-        # Get numeric and string fields
-        numeric_fields = [field.name for field in df.schema.fields 
-                         if str(field.dataType) in ['int', 'bigint', 'float', 'double', 'decimal']]
-        string_fields = [field.name for field in df.schema.fields 
-                        if str(field.dataType) == 'string']
+        # Probing a single row is far cheaper than caching and counting an empty input
+        if not df.limit(1).take(1):
+            logger.info(f"No records in {table_name}, skipping anomaly detection")
+            return detection_summary
+            
+        # Every detector re-reads the input, so materialize it once for the whole run;
+        # the count fills the cache
+        df = df.persist(StorageLevel.MEMORY_AND_DISK)
+        detection_summary['total_records'] = df.count()
         
-        try:
-            # Statistical anomaly detection
-            for field in numeric_fields:
-                # Z-score detection
-                z_score_anomalies = self.statistical_detector.z_score_detection(df, field)
-                all_anomalies.extend(z_score_anomalies)
-                
-                # IQR detection
-                iqr_anomalies = self.statistical_detector.iqr_detection(df, field)
-                all_anomalies.extend(iqr_anomalies)
-                
-            detection_summary['detection_methods_used'].append('statistical')
+        # Get numeric and string fields in a single schema pass
+        numeric_fields = []
+        string_fields = []
+        field_names = []
+        for field in df.schema.fields:
+            field_names.append(field.name)
+            if isinstance(field.dataType, NUMERIC_TYPES):
+                numeric_fields.append(field.name)
+            elif isinstance(field.dataType, StringType):
+                string_fields.append(field.name)
+        field_name_set = frozenset(field_names)
+        
+        # Detector groups are independent; queue every job up front so Spark and
+        # scikit-learn's native code can run them side by side
+        detection_tasks = []
+        
+        # Statistical anomaly detection for all numeric fields in one pass
+        if numeric_fields:
+            detection_tasks.append((self.statistical_detector.detect_fields, df, numeric_fields))
+        detection_summary['detection_methods_used'].append('statistical')
+        
+        # Temporal anomaly detection
+        if timestamp_col and timestamp_col in field_name_set:
+            detection_tasks.append((self.temporal_detector.volume_change_detection, df, timestamp_col))
             
-            # Temporal anomaly detection
-            if timestamp_col and timestamp_col in [field.name for field in df.schema.fields]:
-                volume_anomalies = self.temporal_detector.volume_change_detection(df, timestamp_col)
-                all_anomalies.extend(volume_anomalies)
-                
-                # Seasonal analysis for numeric fields
-                for field in numeric_fields[:3]:  # Limit to first 3 fields to avoid timeout
-                    seasonal_anomalies = self.temporal_detector.seasonal_anomaly_detection(
-                        df, timestamp_col, field
-                    )
-                    all_anomalies.extend(seasonal_anomalies)
-                    
-                detection_summary['detection_methods_used'].append('temporal')
-                
-            # Healthcare-specific detection
-            if self._is_healthcare_table(table_name, df.schema.fieldNames()):
-                claim_anomalies = self.healthcare_detector.claim_amount_anomalies(df)
-                all_anomalies.extend(claim_anomalies)
-                
-                utilization_anomalies = self.healthcare_detector.utilization_anomalies(df)
-                all_anomalies.extend(utilization_anomalies)
-                
-                detection_summary['detection_methods_used'].append('healthcare_specific')
-                
-            # ML-based detection
-            if self.ml_detector and len(numeric_fields) >= 2:
-                isolation_anomalies = self.ml_detector.isolation_forest_detection(
-                    df, numeric_fields[:5]  # Limit fields for performance
-                )
-                all_anomalies.extend(isolation_anomalies)
-                
-                dbscan_anomalies = self.ml_detector.dbscan_anomaly_detection(
-                    df, numeric_fields[:3]  # Even fewer fields for DBSCAN
+            # Seasonal analysis for numeric fields
+            for field in numeric_fields[:3]:  # Limit to first 3 fields to avoid timeout
+                detection_tasks.append(
+                    (self.temporal_detector.seasonal_anomaly_detection, df, timestamp_col, field)
                 )
-                all_anomalies.extend(dbscan_anomalies)
-                
-                detection_summary['detection_methods_used'].append('machine_learning')
                 
-        except Exception as e:
-            logger.error(f"Error in anomaly detection: {str(e)}")
+            detection_summary['detection_methods_used'].append('temporal')
+            
+        # Healthcare-specific detection
+        if self._is_healthcare_table(table_name, field_names):
+            detection_tasks.append((self.healthcare_detector.claim_amount_anomalies, df))
+            detection_tasks.append((self.healthcare_detector.utilization_anomalies, df))
+            detection_summary['detection_methods_used'].append('healthcare_specific')
+            
+        # ML-based detection
+        if self.ml_detector and len(numeric_fields) >= 2:
+            detection_tasks.append((self._ml_anomalies, df, numeric_fields, table_name))
+            detection_summary['detection_methods_used'].append('machine_learning')
+            
+        try:
+            if detection_tasks:
+                max_workers = min(self.config.get('max_detector_workers', 4), len(detection_tasks))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = [executor.submit(*task) for task in detection_tasks]
+                    
+                    # Collect in submission order to keep results deterministic
+                    for future in futures:
+                        try:
+                            all_anomalies.extend(future.result())
+                        except Exception as e:
+                            logger.error(f"Error in anomaly detection: {str(e)}")
+                            
+        finally:
+            df.unpersist(blocking=False)
             
         # Summarize results
         detection_summary['total_anomalies'] = len(all_anomalies)
-        detection_summary['anomaly_details'] = [anomaly.to_dict() for anomaly in all_anomalies]
+        if self.config.get('lazy_anomaly_details', False):
+            detection_summary['anomaly_details'] = AnomalyDetails(all_anomalies)
+        else:
+            detection_summary['anomaly_details'] = [anomaly.to_dict() for anomaly in all_anomalies]
         
         # Group by type and severity
-        for anomaly in all_anomalies:
-            anomaly_type = anomaly.anomaly_type.value
-            severity = anomaly.severity.value
-            
-            if anomaly_type not in detection_summary['anomalies_by_type']:
-                detection_summary['anomalies_by_type'][anomaly_type] = 0
-            detection_summary['anomalies_by_type'][anomaly_type] += 1
-            
-            if severity not in detection_summary['anomalies_by_severity']:
-                detection_summary['anomalies_by_severity'][severity] = 0
-            detection_summary['anomalies_by_severity'][severity] += 1
-            
+        detection_summary['anomalies_by_type'] = dict(
+            Counter(anomaly.anomaly_type.value for anomaly in all_anomalies)
+        )
+        detection_summary['anomalies_by_severity'] = dict(
+            Counter(anomaly.severity.value for anomaly in all_anomalies)
+        )
+        
         logger.info(f"Anomaly detection completed. Found {len(all_anomalies)} anomalies")
         
         return detection_summary
         
+    def _ml_anomalies(self, df: DataFrame, numeric_fields: List[str], table_name: str) -> List[AnomalyResult]:
+        """Run Isolation Forest and DBSCAN over one shared driver-side feature matrix"""
+        
+        ml_fields = numeric_fields[:5]  # Limit fields for performance
+        dbscan_fields = numeric_fields[:3]  # Even fewer fields for DBSCAN
+        
+        # Single Arrow-backed transfer shared by both ML detectors. Rows missing a
+        # DBSCAN field are useless to both and are dropped on the executors; each
+        # detector's scaling pass then drops rows incomplete for its own fields
+        with arrow_enabled(self.spark):
+            ml_features = df.select(*ml_fields).dropna(subset=dbscan_fields).toPandas()
+        
+        anomalies = self.ml_detector.isolation_forest_detection(
+            self.ml_detector.scale_features(ml_features, ml_fields, dataset=table_name),
+            ml_fields, prescaled=True, dataset=table_name
+        )
+        anomalies.extend(self.ml_detector.dbscan_anomaly_detection(
+            self.ml_detector.scale_features(ml_features, dbscan_fields, dataset=table_name),
+            dbscan_fields, prescaled=True, dataset=table_name
+        ))
+        
+        return anomalies
+        
     def _is_healthcare_table(self, table_name: str, field_names: List[str]) -> bool:
         """Check if table contains healthcare data"""
         
-        healthcare_indicators = [
-            'member_id', 'patient_id', 'claim_id', 'provider_npi', 'diagnosis_code',
-            'procedure_code', 'icd', 'cpt', 'hcpcs', 'claim_amount'
-        ]
-        
         # Check table name
-        if any(indicator in table_name.lower() for indicator in ['claim', 'member', 'patient', 'provider']):
+        if HEALTHCARE_TABLE_PATTERN.search(table_name.lower()):
             return True
             
         # Check field names
         healthcare_field_count = sum(
             1 for field in field_names 
-            if any(indicator in field.lower() for indicator in healthcare_indicators)
+            if HEALTHCARE_FIELD_PATTERN.search(field.lower())
         )
         
         return healthcare_field_count >= 3  # If 3+ healthcare fields, likely healthcare table
@@ -953,54 +1439,43 @@ class AnomalyDetectionEngine:
     def get_anomaly_report(self, detection_results: Dict[str, Any]) -> str:
         """Generate formatted anomaly detection report"""
         
-        report_lines = []
-        report_lines.append("=" * 60)
-        report_lines.append("ANOMALY DETECTION REPORT")
-        report_lines.append("=" * 60)
-        report_lines.append(f"Table: {detection_results['table_name']}")
-        report_lines.append(f"Timestamp: {detection_results['timestamp']}")
-        report_lines.append(f"Total Records: {detection_results['total_records']:,}")
-        report_lines.append(f"Detection Methods: {', '.join(detection_results['detection_methods_used'])}")
-        report_lines.append("")
-        
-        # Summary
-        report_lines.append("SUMMARY")
-        report_lines.append("-" * 20)
-        report_lines.append(f"Total Anomalies Found: {detection_results['total_anomalies']}")
+        report = io.StringIO()
+        report.write(REPORT_HEADER_TEMPLATE.format(
+            rule="=" * 60,
+            table_name=detection_results['table_name'],
+            timestamp=detection_results['timestamp'],
+            total_records=detection_results['total_records'],
+            methods=', '.join(detection_results['detection_methods_used']),
+            total_anomalies=detection_results['total_anomalies']
+        ))
         
         # By severity
         if detection_results['anomalies_by_severity']:
-            report_lines.append("\nBy Severity:")
+            report.write("\n\nBy Severity:")
             for severity, count in detection_results['anomalies_by_severity'].items():
-                report_lines.append(f"  {severity.title()}: {count}")
+                report.write(f"\n  {severity.title()}: {count}")
                 
         # By type
         if detection_results['anomalies_by_type']:
-            report_lines.append("\nBy Type:")
+            report.write("\n\nBy Type:")
             for anomaly_type, count in detection_results['anomalies_by_type'].items():
-                report_lines.append(f"  {anomaly_type.replace('_', ' ').title()}: {count}")
+                report.write(f"\n  {anomaly_type.replace('_', ' ').title()}: {count}")
                 
         # Detailed anomalies
         if detection_results['anomaly_details']:
-            report_lines.append("\n" + "=" * 60)
-            report_lines.append("DETAILED ANOMALIES")
-            report_lines.append("=" * 60)
+            report.write("\n\n" + "=" * 60 + "\nDETAILED ANOMALIES\n" + "=" * 60)
             
             for i, anomaly in enumerate(detection_results['anomaly_details'][:20], 1):  # Show top 20
-                report_lines.append(f"\n{i}. {anomaly['description']}")
-                report_lines.append(f"   Field: {anomaly['field_name']}")
-                report_lines.append(f"   Severity: {anomaly['severity'].title()}")
-                report_lines.append(f"   Score: {anomaly['score']:.2f}")
-                report_lines.append(f"   Affected Records: {anomaly['affected_records']:,}")
-                report_lines.append(f"   Method: {anomaly['detection_method']}")
+                report.write(REPORT_ANOMALY_TEMPLATE.format(
+                    i=i, severity_title=anomaly['severity'].title(), **anomaly
+                ))
                 
                 if anomaly['recommendations']:
-                    report_lines.append("   Recommendations:")
+                    report.write("\n   Recommendations:")
                     for rec in anomaly['recommendations']:
-                        report_lines.append(f"     • {rec}")
+                        report.write(f"\n     • {rec}")
                         
-        return "\n".join(report_lines)
-
+        return report.getvalue()
 
 # Usage example
 if __name__ == "__main__":
@@ -4,16 +4,80 @@ Implements data quality rules and expectations for Medicaid/Medicare feeds
 """
 
 import dlt
-from pyspark.sql import SparkSession, DataFrame
-from pyspark.sql.functions import col, when, count, sum as spark_sum, avg, max as spark_max, min as spark_min
-from pyspark.sql.types import StructType
-from typing import Dict, Any, List, Optional, Callable
+from pyspark.sql import SparkSession, DataFrame, Column
+from pyspark.sql.functions import (
+    col, lit, when, count, sum as spark_sum, avg, max as spark_max, min as spark_min,
+    sha2, concat_ws, expr, current_date, current_timestamp, date_sub, to_date
+)
+from pyspark.sql.types import (
+    StructType, StructField, StringType, LongType, DoubleType, MapType
+)
+from typing import Dict, Any, List, Optional, Callable, Tuple, Union
+from functools import lru_cache
+import copy
 import logging
 from datetime import datetime, timedelta
 import json
+import importlib.metadata as importlib_metadata
+import re
+import time
+import pandas as pd
+from .spark_config import arrow_enabled
 
 logger = logging.getLogger(__name__)
 
+# Format patterns are interpolated into the validators as string literals so
+# Catalyst folds them and compiles each Pattern once per task, not per row.
+# Fixed-width numeric codes (NPI, CPT, HCPCS) skip the regex engine entirely;
+# their patterns are kept for Python-side validation.
+MEMBER_ID_PATTERNS = ('^[0-9]{9,12}$', '^[A-Z]{1,3}[0-9]{6,9}$')
+NPI_PATTERN = '^[0-9]{10}$'
+ICD10_PATTERNS = ('^[A-TV-Z][0-9][A-Z0-9](\\.?[A-Z0-9]{0,4})?$', '^[0-9]{3}(\\.?[0-9]{0,2})?$')
+CPT_PATTERN = '^[0-9]{5}$'
+HCPCS_PATTERN = '^[A-V][0-9]{4}$'
+
+# Claim amount tiers for the silver anomaly score; amounts above the i-th
+# threshold score CLAIM_AMOUNT_ANOMALY_SCORES[i + 1]
+CLAIM_AMOUNT_ANOMALY_THRESHOLDS = (1000, 5000, 10000, 50000)
+CLAIM_AMOUNT_ANOMALY_SCORES = (0.1, 0.3, 0.5, 0.7, 0.9)
+
+# Row layouts of the monitoring tables; declaring them lets createDataFrame
+# skip schema inference on every write
+_METRICS_SCHEMA = StructType([
+    StructField("table_name", StringType()),
+    StructField("timestamp", StringType()),
+    StructField("total_records", LongType()),
+    StructField("quality_metrics", MapType(StringType(), DoubleType())),
+    StructField("anomaly_metrics", MapType(StringType(), DoubleType())),
+    StructField("freshness_metrics", MapType(StringType(), DoubleType()))
+])
+
+ALERT_COLUMNS = ["alert_type", "severity", "message", "table_name", "timestamp"]
+_ALERTS_SCHEMA = StructType([StructField(name, StringType()) for name in ALERT_COLUMNS])
+
+
+def _all_digits(expr: str) -> str:
+    """SQL predicate that is true when expr contains only ASCII digits"""
+    return f"translate({expr}, '0123456789', '') = ''"
+
+
+@lru_cache(maxsize=1)
+def delta_supports_clustering() -> bool:
+    """Whether the installed Delta Lake supports liquid clustering (CLUSTER BY, Delta 3.1+)"""
+    
+    try:
+        version = importlib_metadata.version("delta-spark")
+    except importlib_metadata.PackageNotFoundError:
+        # Databricks runtimes ship Delta without the delta-spark package
+        return True
+    return tuple(int(part) for part in re.findall(r"\d+", version)[:2]) >= (3, 1)
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(pattern: str) -> "re.Pattern":
+    """Compile a regex once per Python worker"""
+    return re.compile(pattern)
+
 
 class DLTQualityAgent:
     """
@@ -25,6 +89,29 @@ class DLTQualityAgent:
         self.spark = spark
         self.config = config
         self.quality_metrics_table = config.get("quality_metrics_table", "monitoring.data_quality_metrics")
+        self.quality_alerts_table = config.get("quality_alerts_table", "monitoring.quality_alerts")
+        self.drop_duplicate_claims = config.get("drop_duplicate_claims", False)
+        self.duplicate_watermark = config.get("duplicate_watermark", "30 days")
+        self.duplicate_lookback_days = config.get("duplicate_lookback_days", 60)
+        self.claims_month_partition_column = config.get("claims_month_partition_column")
+        self.metrics_optimize_interval = config.get("metrics_optimize_interval", 100)
+        self.metrics_buffer_size = config.get("metrics_buffer_size", 50)
+        self._metrics_buffer: List[Dict[str, Any]] = []
+        self._ready_tables = set()
+        self._metrics_writes = 0
+        
+        # Compiled once per agent for Python-side record validation
+        self._patterns = {
+            "member": compiled_pattern("|".join(f"(?:{p})" for p in MEMBER_ID_PATTERNS)),
+            "npi": compiled_pattern(NPI_PATTERN),
+            "icd10": compiled_pattern("|".join(f"(?:{p})" for p in ICD10_PATTERNS)),
+            "cpt": compiled_pattern(CPT_PATTERN),
+            "hcpcs": compiled_pattern(HCPCS_PATTERN)
+        }
+        
+        # Latest successful metrics per table with their minute bucket, so dashboards
+        # re-evaluating alerts reuse this minute's metrics
+        self._minute_metrics: Dict[str, Tuple[int, Dict[str, Any]]] = {}
         
     def create_bronze_quality_pipeline(self, source_table: str, target_table: str) -> DataFrame:
         """
@@ -34,7 +121,8 @@ class DLTQualityAgent:
         
         @dlt.table(
             name=target_table,
-            comment="Bronze layer with basic quality validations for healthcare data"
+            comment="Bronze layer with basic quality validations for healthcare data",
+            partition_cols=["_ingestion_date"]
         )
         @dlt.expect_all_or_drop({
             "valid_record_format": "record_id IS NOT NULL",
@@ -42,10 +130,11 @@ class DLTQualityAgent:
             "non_empty_payload": "size(payload) > 0"
         })
         def bronze_quality():
+            # Freshness is derived where it is filtered (gold, monitoring); bronze only
+            # stores the ingestion date so readers can prune by partition
             return (dlt.read_stream(source_table)
-                   .withColumn("_quality_check_timestamp", col("current_timestamp()"))
-                   .withColumn("_data_freshness_hours", 
-                             (col("current_timestamp()").cast("long") - col("_ingestion_timestamp").cast("long")) / 3600))
+                   .withColumn("_quality_check_timestamp", current_timestamp())
+                   .withColumn("_ingestion_date", to_date(col("_ingestion_timestamp"))))
         
         return bronze_quality()
         
@@ -54,28 +143,26 @@ class DLTQualityAgent:
         Create silver layer with comprehensive healthcare-specific quality checks
         """
         
+        # Per-rule counters are opt-in; one combined check keeps a single projection
+        if self.config.get("granular_expectations", False):
+            format_expectations = self._format_expectations()
+        else:
+            format_expectations = {"all_format_checks": self._combined_validation()}
+        
         @dlt.table(
             name=target_table,
             comment="Silver layer with healthcare-specific data quality validations"
         )
-        @dlt.expect_all({
-            "valid_member_id": self._validate_member_id_format(),
-            "valid_date_of_service": self._validate_service_date(),
-            "valid_provider_npi": self._validate_npi_format(),
-            "valid_diagnosis_code": self._validate_diagnosis_code(),
-            "valid_procedure_code": self._validate_procedure_code(),
-            "reasonable_claim_amount": self._validate_claim_amount(),
-        })
+        @dlt.expect_all(format_expectations)
         @dlt.expect_or_quarantine({
             "member_eligibility_check": self._validate_member_eligibility(),
             "provider_credentialing_check": self._validate_provider_credentials(),
-            "duplicate_claim_check": self._validate_duplicate_claims()
+            "duplicate_claim_check": self._validate_duplicate_claims(target_table)
         })
         def silver_quality():
-            return (dlt.read_stream(source_table)
-                   .select("*")
-                   .withColumn("_quality_score", self._calculate_quality_score())
-                   .withColumn("_anomaly_score", self._calculate_anomaly_score()))
+            return (self._drop_duplicate_claims(dlt.read_stream(source_table).select("*"))
+                   .withColumn("_quality_score", expr(self._calculate_quality_score()))
+                   .withColumn("_anomaly_score", expr(self._calculate_anomaly_score())))
         
         return silver_quality()
         
@@ -96,16 +183,36 @@ class DLTQualityAgent:
         def gold_quality():
             return (dlt.read_stream(source_table)
                    .filter(col("_quality_score") >= 0.7)
-                   .withColumn("_business_rule_score", self._calculate_business_rule_score()))
+                   .withColumn("_data_freshness_hours", self._data_freshness_hours())
+                   .withColumn("_business_rule_score", expr(self._calculate_business_rule_score())))
         
         return gold_quality()
         
+    def _format_expectations(self) -> Dict[str, str]:
+        """Silver format and range rules keyed by expectation name"""
+        return {
+            "valid_member_id": self._validate_member_id_format(),
+            "valid_date_of_service": self._validate_service_date(),
+            "valid_provider_npi": self._validate_npi_format(),
+            "valid_diagnosis_code": self._validate_diagnosis_code(),
+            "valid_procedure_code": self._validate_procedure_code(),
+            "reasonable_claim_amount": self._validate_claim_amount(),
+        }
+        
+    def _combined_validation(self) -> str:
+        """All silver format rules as one AND-combined expectation"""
+        return "(" + ") AND (".join(self._format_expectations().values()) + ")"
+        
+    def _data_freshness_hours(self) -> Column:
+        """Hours since ingestion"""
+        return (current_timestamp().cast("long") - col("_ingestion_timestamp").cast("long")) / 3600
+        
     def _validate_member_id_format(self) -> str:
         """Validate Medicaid/Medicare member ID format"""
-        return """
+        return f"""
         CASE 
-            WHEN member_id RLIKE '^[0-9]{9,12}$' THEN true
-            WHEN member_id RLIKE '^[A-Z]{1,3}[0-9]{6,9}$' THEN true
+            WHEN member_id RLIKE '{MEMBER_ID_PATTERNS[0]}' THEN true
+            WHEN member_id RLIKE '{MEMBER_ID_PATTERNS[1]}' THEN true
             ELSE false
         END
         """
@@ -120,29 +227,34 @@ class DLTQualityAgent:
         
     def _validate_npi_format(self) -> str:
         """Validate NPI (National Provider Identifier) format"""
-        return """
+        return f"""
         provider_npi IS NOT NULL 
-        AND provider_npi RLIKE '^[0-9]{10}$'
+        AND length(provider_npi) = 10
+        AND {_all_digits('provider_npi')}
         AND provider_npi NOT IN ('0000000000', '9999999999')
         """
         
     def _validate_diagnosis_code(self) -> str:
         """Validate ICD-10 diagnosis code format"""
-        return """
+        return f"""
         diagnosis_code IS NOT NULL 
         AND (
-            diagnosis_code RLIKE '^[A-TV-Z][0-9][A-Z0-9](\\.?[A-Z0-9]{0,4})?$'
-            OR diagnosis_code RLIKE '^[0-9]{3}(\\.?[0-9]{0,2})?$'
+            diagnosis_code RLIKE '{ICD10_PATTERNS[0]}'
+            OR diagnosis_code RLIKE '{ICD10_PATTERNS[1]}'
         )
         """
         
     def _validate_procedure_code(self) -> str:
         """Validate CPT/HCPCS procedure code format"""
-        return """
+        return f"""
         procedure_code IS NOT NULL 
+        AND length(procedure_code) = 5
         AND (
-            procedure_code RLIKE '^[0-9]{5}$'  -- CPT
-            OR procedure_code RLIKE '^[A-V][0-9]{4}$'  -- HCPCS Level II
+            {_all_digits('procedure_code')}  -- CPT
+            OR (
+                substring(procedure_code, 1, 1) BETWEEN 'A' AND 'V'
+                AND {_all_digits('substring(procedure_code, 2, 4)')}
+            )  -- HCPCS Level II
         )
         """
         
@@ -169,50 +281,94 @@ class DLTQualityAgent:
         AND provider_status = 'ACTIVE'
         """
         
-    def _validate_duplicate_claims(self) -> str:
-        """Check for duplicate claims (simplified)"""
-        return """
+    def _duplicate_claim_key(self) -> Column:
+        """Hash of the fields that identify a claim line"""
+        return sha2(concat_ws("|",
+                              col("member_id"),
+                              col("provider_npi"),
+                              col("date_of_service").cast("string"),
+                              col("procedure_code")), 256)
+        
+    def _drop_duplicate_claims(self, df: DataFrame) -> DataFrame:
+        """
+        Drop repeated claim lines in-stream when drop_duplicate_claims is enabled
+        
+        State is bounded by duplicate_watermark; repeats arriving later are still
+        quarantined by duplicate_claim_check. Needs dropDuplicatesWithinWatermark
+        (Spark 3.5+); on older versions duplicates are only quarantined.
+        """
+        if not self.drop_duplicate_claims:
+            return df
+            
+        if not hasattr(df, "dropDuplicatesWithinWatermark"):
+            logger.warning("dropDuplicatesWithinWatermark requires Spark 3.5+; "
+                           "duplicate claims are quarantined but not dropped")
+            return df
+            
+        return (df.withColumn("_dup_key", self._duplicate_claim_key())
+                .withWatermark("_ingestion_timestamp", self.duplicate_watermark)
+                .dropDuplicatesWithinWatermark(["_dup_key"])
+                .drop("_dup_key"))
+        
+    def _validate_duplicate_claims(self, table_name: str = "claims_silver") -> str:
+        """
+        Check for duplicate claims (simplified)
+        Only the recent service-date window of table_name is probed; nearly all duplicates land within it
+        """
+        lookback_days = self.duplicate_lookback_days
+        partition_filter = ""
+        if self.claims_month_partition_column:
+            partition_filter = (f"AND c2.{self.claims_month_partition_column} >= "
+                                f"date_format(date_sub(current_date(), {lookback_days}), 'yyyyMM')")
+        return f"""
         NOT EXISTS (
-            SELECT 1 FROM claims_silver c2 
-            WHERE c2.member_id = claims_silver.member_id 
-            AND c2.provider_npi = claims_silver.provider_npi 
-            AND c2.date_of_service = claims_silver.date_of_service 
-            AND c2.procedure_code = claims_silver.procedure_code
-            AND c2._ingestion_timestamp < claims_silver._ingestion_timestamp
+            SELECT 1 FROM {table_name} c2 
+            WHERE c2.member_id = {table_name}.member_id 
+            AND c2.provider_npi = {table_name}.provider_npi 
+            AND c2.date_of_service = {table_name}.date_of_service 
+            AND c2.procedure_code = {table_name}.procedure_code
+            AND c2._ingestion_timestamp < {table_name}._ingestion_timestamp
+            AND c2.date_of_service >= current_date() - interval {lookback_days} days
+            {partition_filter}
         )
         """
         
     def _calculate_quality_score(self) -> str:
         """Calculate overall data quality score"""
+        # Branchless: each populated field contributes 0.2
         return """
-        (
-            CASE WHEN member_id IS NOT NULL THEN 0.2 ELSE 0 END +
-            CASE WHEN provider_npi IS NOT NULL THEN 0.2 ELSE 0 END +
-            CASE WHEN diagnosis_code IS NOT NULL THEN 0.2 ELSE 0 END +
-            CASE WHEN procedure_code IS NOT NULL THEN 0.2 ELSE 0 END +
-            CASE WHEN claim_amount IS NOT NULL AND claim_amount > 0 THEN 0.2 ELSE 0 END
+        0.2 * (
+            cast(member_id IS NOT NULL as double) +
+            cast(provider_npi IS NOT NULL as double) +
+            cast(diagnosis_code IS NOT NULL as double) +
+            cast(procedure_code IS NOT NULL as double) +
+            cast(claim_amount IS NOT NULL AND claim_amount > 0 as double)
         )
         """
         
     def _calculate_anomaly_score(self) -> str:
         """Calculate anomaly score for outlier detection"""
-        return """
-        CASE 
-            WHEN claim_amount > 50000 THEN 0.9
-            WHEN claim_amount > 10000 THEN 0.7
-            WHEN claim_amount > 5000 THEN 0.5
-            WHEN claim_amount > 1000 THEN 0.3
-            ELSE 0.1
-        END
+        # Branchless tier lookup: the number of thresholds exceeded indexes the score array
+        tiers_exceeded = " + ".join(
+            f"cast(coalesce(claim_amount, 0) > {threshold} as int)"
+            for threshold in CLAIM_AMOUNT_ANOMALY_THRESHOLDS
+        )
+        scores = ", ".join(str(score) for score in CLAIM_AMOUNT_ANOMALY_SCORES)
+        return f"""
+        element_at(
+            array({scores}),
+            1 + {tiers_exceeded}
+        )
         """
         
     def _calculate_business_rule_score(self) -> str:
         """Calculate business rule compliance score"""
+        # Branchless; a null score fails its rule as the CASE form did
         return """
         (
-            CASE WHEN _quality_score >= 0.8 THEN 0.4 ELSE 0 END +
-            CASE WHEN _data_freshness_hours <= 24 THEN 0.3 ELSE 0 END +
-            CASE WHEN _anomaly_score <= 0.5 THEN 0.3 ELSE 0 END
+            0.4 * cast(coalesce(_quality_score >= 0.8, false) as double) +
+            0.3 * cast(coalesce(_data_freshness_hours <= 24, false) as double) +
+            0.3 * cast(coalesce(_anomaly_score <= 0.5, false) as double)
         )
         """
         
@@ -224,6 +380,25 @@ class DLTQualityAgent:
         AND provider_specialty IS NOT NULL
         """
         
+    def validate_row(self, row: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Validate one record's identifier and code formats in Python
+        Mirrors the silver format expectations for records checked outside Spark
+        """
+        
+        def matches(pattern_name: str, value: Any) -> bool:
+            return isinstance(value, str) and self._patterns[pattern_name].fullmatch(value) is not None
+            
+        npi = row.get("provider_npi")
+        procedure_code = row.get("procedure_code")
+        
+        return {
+            "valid_member_id": matches("member", row.get("member_id")),
+            "valid_provider_npi": matches("npi", npi) and npi not in ("0000000000", "9999999999"),
+            "valid_diagnosis_code": matches("icd10", row.get("diagnosis_code")),
+            "valid_procedure_code": matches("cpt", procedure_code) or matches("hcpcs", procedure_code)
+        }
+        
     def monitor_quality_metrics(self, table_name: str) -> Dict[str, Any]:
         """
         Monitor data quality metrics for a table
@@ -232,51 +407,48 @@ class DLTQualityAgent:
         
         try:
             df = self.spark.table(table_name)
+            if "_data_freshness_hours" not in df.columns:
+                df = df.withColumn("_data_freshness_hours", self._data_freshness_hours())
+                
+            # Only the score columns are read, so wide claim tables prune to a few column chunks
+            df = df.select("_quality_score", "_anomaly_score", "_data_freshness_hours")
             
-            # Calculate basic metrics
-            total_records = df.count()
-            
-            # Quality score distribution
-            quality_metrics = df.agg(
+            # Count, quality, anomaly and freshness metrics in a single scan
+            summary = df.agg(
+                count(lit(1)).alias("total_records"),
                 avg("_quality_score").alias("avg_quality_score"),
                 spark_min("_quality_score").alias("min_quality_score"),
                 spark_max("_quality_score").alias("max_quality_score"),
                 count(when(col("_quality_score") >= 0.8, 1)).alias("high_quality_records"),
-                count(when(col("_quality_score") < 0.5, 1)).alias("low_quality_records")
-            ).collect()[0]
-            
-            # Anomaly detection
-            anomaly_metrics = df.agg(
+                count(when(col("_quality_score") < 0.5, 1)).alias("low_quality_records"),
                 count(when(col("_anomaly_score") > 0.7, 1)).alias("high_anomaly_records"),
-                avg("_anomaly_score").alias("avg_anomaly_score")
-            ).collect()[0]
-            
-            # Data freshness
-            freshness_metrics = df.agg(
+                avg("_anomaly_score").alias("avg_anomaly_score"),
                 avg("_data_freshness_hours").alias("avg_freshness_hours"),
                 spark_max("_data_freshness_hours").alias("max_freshness_hours"),
                 count(when(col("_data_freshness_hours") > 24, 1)).alias("stale_records")
             ).collect()[0]
             
+            total_records = summary["total_records"]
+            
             metrics = {
                 "table_name": table_name,
                 "timestamp": datetime.now().isoformat(),
                 "total_records": total_records,
                 "quality_metrics": {
-                    "avg_quality_score": float(quality_metrics["avg_quality_score"] or 0),
-                    "min_quality_score": float(quality_metrics["min_quality_score"] or 0),
-                    "max_quality_score": float(quality_metrics["max_quality_score"] or 0),
-                    "high_quality_percentage": (quality_metrics["high_quality_records"] / total_records) * 100 if total_records > 0 else 0,
-                    "low_quality_percentage": (quality_metrics["low_quality_records"] / total_records) * 100 if total_records > 0 else 0
+                    "avg_quality_score": float(summary["avg_quality_score"] or 0),
+                    "min_quality_score": float(summary["min_quality_score"] or 0),
+                    "max_quality_score": float(summary["max_quality_score"] or 0),
+                    "high_quality_percentage": (summary["high_quality_records"] / total_records) * 100 if total_records > 0 else 0.0,
+                    "low_quality_percentage": (summary["low_quality_records"] / total_records) * 100 if total_records > 0 else 0.0
                 },
                 "anomaly_metrics": {
-                    "high_anomaly_percentage": (anomaly_metrics["high_anomaly_records"] / total_records) * 100 if total_records > 0 else 0,
-                    "avg_anomaly_score": float(anomaly_metrics["avg_anomaly_score"] or 0)
+                    "high_anomaly_percentage": (summary["high_anomaly_records"] / total_records) * 100 if total_records > 0 else 0.0,
+                    "avg_anomaly_score": float(summary["avg_anomaly_score"] or 0)
                 },
                 "freshness_metrics": {
-                    "avg_freshness_hours": float(freshness_metrics["avg_freshness_hours"] or 0),
-                    "max_freshness_hours": float(freshness_metrics["max_freshness_hours"] or 0),
-                    "stale_percentage": (freshness_metrics["stale_records"] / total_records) * 100 if total_records > 0 else 0
+                    "avg_freshness_hours": float(summary["avg_freshness_hours"] or 0),
+                    "max_freshness_hours": float(summary["max_freshness_hours"] or 0),
+                    "stale_percentage": (summary["stale_records"] / total_records) * 100 if total_records > 0 else 0.0
                 }
             }
             
@@ -286,66 +458,141 @@ class DLTQualityAgent:
             return metrics
             
         except Exception as e:
-            logger.error(f"Failed to monitor quality metrics: {str(e)}")
+            logger.error("Failed to monitor quality metrics: %s", e)
             return {"error": str(e), "table_name": table_name}
             
+    def _ensure_monitoring_table(self, table: str, columns: str, cluster_by: str, stats_columns: str):
+        """
+        Create a monitoring table once per agent and enable Delta write compaction
+        Monitoring tables receive many tiny appends; optimized writes and auto compaction
+        keep dashboard reads from paying per-file overhead. Tables that already exist,
+        e.g. ones created by earlier versions without these columns, are left as they are.
+        """
+        
+        if table in self._ready_tables:
+            return
+            
+        if self.spark.catalog.tableExists(table):
+            self._ready_tables.add(table)
+            return
+            
+        clustering = f"CLUSTER BY ({cluster_by})" if delta_supports_clustering() else ""
+        self.spark.sql(f"""
+            CREATE TABLE IF NOT EXISTS {table} ({columns})
+            USING DELTA
+            {clustering}
+        """)
+        self.spark.sql(f"""
+            ALTER TABLE {table} SET TBLPROPERTIES (
+                'delta.autoOptimize.optimizeWrite' = 'true',
+                'delta.autoOptimize.autoCompact' = 'true',
+                'delta.dataSkippingStatsColumns' = '{stats_columns}'
+            )
+        """)
+        self._ready_tables.add(table)
+        
+    def _ensure_quality_metrics_table(self):
+        """
+        Create the metrics table clustered on a generated event date
+        Dashboard reads filter on table_name and event_date, so Delta can skip files by stats
+        """
+        
+        self._ensure_monitoring_table(
+            self.quality_metrics_table,
+            """
+                table_name STRING,
+                timestamp STRING,
+                total_records BIGINT,
+                quality_metrics MAP<STRING, DOUBLE>,
+                anomaly_metrics MAP<STRING, DOUBLE>,
+                freshness_metrics MAP<STRING, DOUBLE>,
+                event_date DATE GENERATED ALWAYS AS (CAST(timestamp AS DATE))
+            """,
+            cluster_by="table_name, event_date",
+            stats_columns="table_name,timestamp,event_date"
+        )
+        
+    def _ensure_quality_alerts_table(self):
+        """Create the alerts table clustered for per-table dashboard reads"""
+        
+        self._ensure_monitoring_table(
+            self.quality_alerts_table,
+            """
+                alert_type STRING,
+                severity STRING,
+                message STRING,
+                table_name STRING,
+                timestamp STRING
+            """,
+            cluster_by="table_name, timestamp",
+            stats_columns="table_name,timestamp"
+        )
+        
     def _store_quality_metrics(self, metrics: Dict[str, Any]):
-        """Store quality metrics to monitoring table"""
+        """Buffer quality metrics; they are written once metrics_buffer_size records accumulate"""
+        
+        self._metrics_buffer.append(metrics)
+        if len(self._metrics_buffer) >= self.metrics_buffer_size:
+            self.flush_quality_metrics()
+            
+    def __enter__(self) -> "DLTQualityAgent":
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush_quality_metrics()
+        
+    def flush_quality_metrics(self):
+        """
+        Write buffered quality metrics to the monitoring table in a single commit
+        
+        Callers must flush (or use the agent as a context manager) once their run ends.
+        Metrics stay buffered if the write fails.
+        """
+        
+        if not self._metrics_buffer:
+            return
+            
+        records, self._metrics_buffer = self._metrics_buffer, []
         
         try:
-            metrics_df = self.spark.createDataFrame([metrics])
-            metrics_df.write.format("delta").mode("append").saveAsTable(self.quality_metrics_table)
+            self._ensure_quality_metrics_table()
+            metrics_df = self.spark.createDataFrame(records, schema=_METRICS_SCHEMA)
+            (metrics_df.write.format("delta")
+             .mode("append")
+             .option("mergeSchema", "true")
+             .saveAsTable(self.quality_metrics_table))
             
         except Exception as e:
-            logger.error(f"Failed to store quality metrics: {str(e)}")
+            logger.error("Failed to store quality metrics: %s", e)
+            self._metrics_buffer[:0] = records
+            return
             
-    def create_quality_alerts(self, table_name: str, thresholds: Dict[str, float]) -> List[Dict[str, Any]]:
+        # Periodically recluster the small appends
+        self._metrics_writes += 1
+        if self.metrics_optimize_interval and self._metrics_writes % self.metrics_optimize_interval == 0:
+            try:
+                self.spark.sql(f"OPTIMIZE {self.quality_metrics_table}")
+            except Exception as e:
+                logger.warning("Failed to optimize quality metrics table: %s", e)
+            
+    def create_quality_alerts(self, table_name: str, thresholds: Dict[str, float],
+                              metrics: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Create alerts based on quality thresholds
         
         Args:
             table_name: Table to monitor
             thresholds: Quality thresholds for alerting
+            metrics: Output of monitor_quality_metrics; when omitted, metrics computed
+                for the table within the current minute are reused
         """
         
-        alerts = []
-        
         try:
-            metrics = self.monitor_quality_metrics(table_name)
-            
-            # Check quality score threshold
-            avg_quality = metrics.get("quality_metrics", {}).get("avg_quality_score", 1.0)
-            if avg_quality < thresholds.get("min_quality_score", 0.7):
-                alerts.append({
-                    "alert_type": "low_quality_score",
-                    "severity": "high",
-                    "message": f"Average quality score {avg_quality:.2f} below threshold {thresholds['min_quality_score']}",
-                    "table_name": table_name,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-            # Check anomaly threshold
-            anomaly_pct = metrics.get("anomaly_metrics", {}).get("high_anomaly_percentage", 0)
-            if anomaly_pct > thresholds.get("max_anomaly_percentage", 5.0):
-                alerts.append({
-                    "alert_type": "high_anomaly_rate",
-                    "severity": "medium",
-                    "message": f"High anomaly rate {anomaly_pct:.1f}% above threshold {thresholds['max_anomaly_percentage']}%",
-                    "table_name": table_name,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-            # Check freshness threshold
-            stale_pct = metrics.get("freshness_metrics", {}).get("stale_percentage", 0)
-            if stale_pct > thresholds.get("max_stale_percentage", 10.0):
-                alerts.append({
-                    "alert_type": "stale_data",
-                    "severity": "medium",
-                    "message": f"Stale data percentage {stale_pct:.1f}% above threshold {thresholds['max_stale_percentage']}%",
-                    "table_name": table_name,
-                    "timestamp": datetime.now().isoformat()
-                })
+            if metrics is None:
+                metrics = self._recent_quality_metrics(table_name)
                 
+            alerts = self.evaluate_quality_alerts(metrics, thresholds)
+            
             # Store alerts
             if alerts:
                 self._store_quality_alerts(alerts)
@@ -353,40 +600,185 @@ class DLTQualityAgent:
             return alerts
             
         except Exception as e:
-            logger.error(f"Failed to create quality alerts: {str(e)}")
+            logger.error("Failed to create quality alerts: %s", e)
             return [{"error": str(e), "table_name": table_name}]
             
-    def _store_quality_alerts(self, alerts: List[Dict[str, Any]]):
+    def _recent_quality_metrics(self, table_name: str) -> Dict[str, Any]:
+        """
+        Metrics for a table computed within the current minute
+        Failures are not reused, and callers get their own copy of the cached metrics
+        """
+        
+        minute_bucket = int(time.time() // 60)
+        cached = self._minute_metrics.get(table_name)
+        
+        if cached is None or cached[0] != minute_bucket:
+            # monitor_quality_metrics also stores the fresh metrics for the dashboard
+            metrics = self.monitor_quality_metrics(table_name)
+            if "error" in metrics:
+                return metrics
+            cached = (minute_bucket, metrics)
+            self._minute_metrics[table_name] = cached
+            
+        return copy.deepcopy(cached[1])
+        
+    def evaluate_quality_alerts(self, metrics: Dict[str, Any], thresholds: Dict[str, float]) -> List[Dict[str, Any]]:
+        """
+        Check precomputed quality metrics against alert thresholds
+        Pure Python; runs no Spark actions
+        """
+        
+        alerts = []
+        table_name = metrics.get("table_name")
+        
+        # Check quality score threshold
+        avg_quality = metrics.get("quality_metrics", {}).get("avg_quality_score", 1.0)
+        min_quality = thresholds.get("min_quality_score", 0.7)
+        if avg_quality < min_quality:
+            alerts.append({
+                "alert_type": "low_quality_score",
+                "severity": "high",
+                "message": f"Average quality score {avg_quality:.2f} below threshold {min_quality}",
+                "table_name": table_name,
+                "timestamp": datetime.now().isoformat()
+            })
+            
+        # Check anomaly threshold
+        anomaly_pct = metrics.get("anomaly_metrics", {}).get("high_anomaly_percentage", 0)
+        max_anomaly = thresholds.get("max_anomaly_percentage", 5.0)
+        if anomaly_pct > max_anomaly:
+            alerts.append({
+                "alert_type": "high_anomaly_rate",
+                "severity": "medium",
+                "message": f"High anomaly rate {anomaly_pct:.1f}% above threshold {max_anomaly}%",
+                "table_name": table_name,
+                "timestamp": datetime.now().isoformat()
+            })
+            
+        # Check freshness threshold
+        stale_pct = metrics.get("freshness_metrics", {}).get("stale_percentage", 0)
+        max_stale = thresholds.get("max_stale_percentage", 10.0)
+        if stale_pct > max_stale:
+            alerts.append({
+                "alert_type": "stale_data",
+                "severity": "medium",
+                "message": f"Stale data percentage {stale_pct:.1f}% above threshold {max_stale}%",
+                "table_name": table_name,
+                "timestamp": datetime.now().isoformat()
+            })
+            
+        return alerts
+        
+    def create_quality_alerts_batch(self, metrics_list: List[Dict[str, Any]],
+                                    thresholds: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+        """
+        Create alerts for many tables at once from precomputed metrics
+        
+        Threshold checks run as vectorized comparisons over all tables and the
+        resulting alerts are stored with a single append.
+        
+        Args:
+            metrics_list: monitor_quality_metrics outputs, one per table
+            thresholds: Quality thresholds for alerting
+        """
+        
+        thresholds = thresholds or {}
+        if not metrics_list:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+            
+        try:
+            metrics_frame = pd.DataFrame({
+                "table_name": [m.get("table_name") for m in metrics_list],
+                "avg_quality_score": [m.get("quality_metrics", {}).get("avg_quality_score", 1.0) for m in metrics_list],
+                "high_anomaly_percentage": [m.get("anomaly_metrics", {}).get("high_anomaly_percentage", 0) for m in metrics_list],
+                "stale_percentage": [m.get("freshness_metrics", {}).get("stale_percentage", 0) for m in metrics_list]
+            })
+            
+            # Missing scores become NaN, which never breaches a threshold and is not formatted
+            metric_columns = ["avg_quality_score", "high_anomaly_percentage", "stale_percentage"]
+            metrics_frame[metric_columns] = metrics_frame[metric_columns].apply(pd.to_numeric, errors="coerce")
+            
+            min_quality = thresholds.get("min_quality_score", 0.7)
+            max_anomaly = thresholds.get("max_anomaly_percentage", 5.0)
+            max_stale = thresholds.get("max_stale_percentage", 10.0)
+            
+            checks = [
+                ("low_quality_score", "high", metrics_frame["avg_quality_score"] < min_quality,
+                 "Average quality score " + metrics_frame["avg_quality_score"].map("{:.2f}".format, na_action="ignore")
+                 + f" below threshold {min_quality}"),
+                ("high_anomaly_rate", "medium", metrics_frame["high_anomaly_percentage"] > max_anomaly,
+                 "High anomaly rate " + metrics_frame["high_anomaly_percentage"].map("{:.1f}".format, na_action="ignore")
+                 + f"% above threshold {max_anomaly}%"),
+                ("stale_data", "medium", metrics_frame["stale_percentage"] > max_stale,
+                 "Stale data percentage " + metrics_frame["stale_percentage"].map("{:.1f}".format, na_action="ignore")
+                 + f"% above threshold {max_stale}%")
+            ]
+            
+            timestamp = datetime.now().isoformat()
+            alerts = pd.concat([
+                pd.DataFrame({
+                    "alert_type": alert_type,
+                    "severity": severity,
+                    "message": message[mask],
+                    "table_name": metrics_frame["table_name"][mask],
+                    "timestamp": timestamp
+                }, columns=ALERT_COLUMNS)
+                for alert_type, severity, mask, message in checks
+            ])
+            
+            # Group alerts by table in input order, keeping check order within a table
+            alerts = alerts.sort_index(kind="stable").reset_index(drop=True)
+            
+            if not alerts.empty:
+                self._store_quality_alerts(alerts)
+                
+            return alerts
+            
+        except Exception as e:
+            logger.error("Failed to create batch quality alerts: %s", e)
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+            
+    def _store_quality_alerts(self, alerts: Union[List[Dict[str, Any]], pd.DataFrame]):
         """Store quality alerts to monitoring table"""
         
         try:
-            alerts_table = self.config.get("quality_alerts_table", "monitoring.quality_alerts")
-            alerts_df = self.spark.createDataFrame(alerts)
-            alerts_df.write.format("delta").mode("append").saveAsTable(alerts_table)
+            self._ensure_quality_alerts_table()
+            with arrow_enabled(self.spark):
+                alerts_df = self.spark.createDataFrame(alerts, schema=_ALERTS_SCHEMA)
+            alerts_df.write.format("delta").mode("append").saveAsTable(self.quality_alerts_table)
             
         except Exception as e:
-            logger.error(f"Failed to store quality alerts: {str(e)}")
+            logger.error("Failed to store quality alerts: %s", e)
             
     def get_quality_dashboard_data(self, table_name: str, days: int = 7) -> Dict[str, Any]:
         """Get quality metrics data for dashboard visualization"""
         
         try:
-            # Get historical quality metrics
-            historical_df = (self.spark.table(self.quality_metrics_table)
-                           .filter(f"table_name = '{table_name}'")
-                           .filter(f"timestamp >= current_date() - {days}")
-                           .orderBy("timestamp"))
+            # Make this agent's buffered metrics visible to the query
+            self.flush_quality_metrics()
             
-            historical_data = [row.asDict() for row in historical_df.collect()]
+            # Get historical quality metrics: the most recent points, at most hourly.
+            # Tables created before event_date was added filter on the ISO timestamp
+            metrics_df = self.spark.table(self.quality_metrics_table)
+            if "event_date" in metrics_df.columns:
+                since = col("event_date") >= date_sub(current_date(), days)
+            else:
+                since = col("timestamp") >= date_sub(current_date(), days).cast("string")
+            historical_df = (metrics_df
+                           .filter(since & (col("table_name") == lit(table_name)))
+                           .orderBy(col("timestamp").desc())
+                           .limit(days * 24))
+            
+            historical_data = self._to_records(historical_df)[::-1]
             
             # Get current alerts
-            alerts_table = self.config.get("quality_alerts_table", "monitoring.quality_alerts")
-            current_alerts_df = (self.spark.table(alerts_table)
-                               .filter(f"table_name = '{table_name}'")
-                               .filter("timestamp >= current_date()")
-                               .orderBy("timestamp DESC"))
+            current_alerts_df = (self.spark.table(self.quality_alerts_table)
+                               .filter((col("table_name") == lit(table_name)) &
+                                       (col("timestamp") >= current_date()))
+                               .orderBy(col("timestamp").desc())
+                               .limit(self.config.get("dashboard_alerts_limit", 500)))
             
-            current_alerts = [row.asDict() for row in current_alerts_df.collect()]
+            current_alerts = self._to_records(current_alerts_df)
             
             return {
                 "table_name": table_name,
@@ -400,5 +792,13 @@ class DLTQualityAgent:
             }
             
         except Exception as e:
-            logger.error(f"Failed to get dashboard data: {str(e)}")
-            return {"error": str(e), "table_name": table_name}
\ No newline at end of file
+            logger.error("Failed to get dashboard data: %s", e)
+            return {"error": str(e), "table_name": table_name}
+            
+    @staticmethod
+    def _to_records(df: DataFrame) -> List[Dict[str, Any]]:
+        """Collect a small result through Arrow as a list of row dicts, nulls as None"""
+        
+        with arrow_enabled(df.sparkSession):
+            pdf = df.toPandas()
+        return pdf.astype(object).where(pdf.notna(), None).to_dict(orient="records")
\ No newline at end of file
@@ -3,13 +3,388 @@ Healthcare-specific data expectations and validations
 Specialized rules for Medicaid/Medicare data quality
 """
 
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, Iterable, List, Optional, Callable, Union, Mapping, Tuple
+from functools import lru_cache
+from enum import IntEnum
+from types import MappingProxyType
 import re
 from datetime import datetime, timedelta
 import logging
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Compiled, multi-core checksum kernels for large batches when Numba is installed
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Validation patterns, compiled once at import; unanchored, always applied with fullmatch
+# One alternation for every member ID format; the named group reports the program
+_MEMBER_ID_RE = re.compile(
+    r'(?P<medicaid>'
+    r'\d{9,12}'                      # 9-12 digits
+    r'|[A-Z]{1,3}\d{6,9}'            # State prefix + digits
+    r'|[A-Z]{2}\d{8}[A-Z]'           # State + 8 digits + letter
+    r')'
+    r'|(?P<medicare>'
+    r'\d{9}[A-Z]?\d?[A-Z]?'          # SSN-based format
+    r'|[A-Z]\d{8}[A-Z]'              # New Medicare format
+    r')'
+)
+
+_ICD10_RE = re.compile(r'[A-TV-Z][0-9][A-Z0-9](\.[A-Z0-9]{1,4})?')   # A00-Z99 with optional subcategories
+_ICD9_RE = re.compile(r'[0-9]{3}(\.[0-9]{1,2})?')
+_HCPCS_RE = re.compile(r'[A-HJKLMNP-V][0-9]{4}')
+_TAXONOMY_RE = re.compile(r'[A-Z0-9]{10}')
+
+# Leading characters that can start a code, checked before running the regex
+_ICD10_VALID_FIRST = frozenset("ABCDEFGHIJKLMNOPQRSTVWXYZ")
+_ICD9_VALID_FIRST = frozenset("0123456789")
+_HCPCS_VALID_FIRST = frozenset("ABCDEFGHJKLMNPQRSTUV")
+_LUHN_DOUBLED = bytes((0, 2, 4, 6, 8, 1, 3, 5, 7, 9))   # digit sum of 2 * d
+_LUHN_DOUBLED_NP = np.frombuffer(_LUHN_DOUBLED, dtype=np.uint8)
+# NPI check digits are computed over "80840" + NPI; the prefix always adds 8 + (2*4 -> 8) + 8 = 24
+_NPI_PREFIX_CONTRIB = 24
+
+_NON_DIGIT_RE = re.compile(r'\D')
+_CURRENCY_STRIP_RE = re.compile(r'[$,\s]')
+# str.translate equivalents of the patterns above, exact for ASCII input
+_STRIP_NON_DIGITS = {c: None for c in range(128) if _NON_DIGIT_RE.match(chr(c))}
+_STRIP_CURRENCY = {c: None for c in range(128) if _CURRENCY_STRIP_RE.match(chr(c))}
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+
+_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%Y%m%d')
+MIN_SERVICE_DATE = datetime(2020, 1, 1)   # Reasonable minimum for healthcare data
+
+# Rules whose validator also takes another field of the record
+_CROSS_FIELD_CONTEXT = {
+    "admission_date": "date_of_service",
+    "discharge_date": "admission_date"
+}
+
+class ValidationErrorCode(IntEnum):
+    """Compact failure category reported alongside each validator error message"""
+    OK = 0
+    MISSING = 1
+    INVALID_FORMAT = 2
+    CHECKSUM = 3
+    INVALID_VALUE = 4
+    OUT_OF_RANGE = 5
+    CROSS_FIELD = 6
+    UNKNOWN_RULE = 7
+    VALIDATION_ERROR = 8
+
+
+# (field_name, rule_name, validator, context_field) entries produced by compile_schema
+CompiledSchema = List[Tuple[str, str, Optional[Callable], Optional[str]]]
+
+# Rules whose result depends only on the value; dates are checked against the clock
+_MEMOIZED_RULES = (
+    "member_id", "npi", "icd10_diagnosis", "cpt_procedure", "hcpcs_procedure",
+    "claim_amount", "provider_taxonomy", "place_of_service"
+)
+DEFAULT_VALIDATION_CACHE_SIZE = 65536
+
+_DEFAULT_MEDICAID_SCHEMA = MappingProxyType({
+    "member_id": "member_id",
+    "provider_npi": "npi",
+    "diagnosis_code": "icd10_diagnosis",
+    "procedure_code": "cpt_procedure",
+    "date_of_service": "date_of_service",
+    "claim_amount": "claim_amount",
+    "place_of_service": "place_of_service"
+})
+
+_DEFAULT_MEDICARE_SCHEMA = MappingProxyType({
+    "member_id": "member_id",
+    "provider_npi": "npi",
+    "diagnosis_code": "icd10_diagnosis",
+    "procedure_code": "cpt_procedure",
+    "date_of_service": "date_of_service",
+    "claim_amount": "claim_amount",
+    "provider_taxonomy": "provider_taxonomy",
+    "place_of_service": "place_of_service"
+})
+
+
+def _digits_only(value: str) -> str:
+    """Strip a code down to its digits, skipping the regex for the common already-clean case"""
+    
+    value = value.strip()
+    if not value.isascii():
+        return _NON_DIGIT_RE.sub('', value)
+    if value.isdigit():
+        return value
+    return value.translate(_STRIP_NON_DIGITS)
+
+
+@lru_cache(maxsize=DEFAULT_VALIDATION_CACHE_SIZE)
+def _parse_date(value: str) -> Optional[datetime]:
+    """Parse a date string in any of the accepted formats, or None"""
+    
+    # Zero-padded ASCII dates are dispatched on their shape to a single parse
+    if value.isascii():
+        try:
+            if len(value) == 10 and value[4] == '-' and value[7] == '-':
+                if (value[:4] + value[5:7] + value[8:]).isdigit():
+                    return datetime.fromisoformat(value)
+            elif len(value) == 10 and value[2] == '/' and value[5] == '/':
+                if (value[:2] + value[3:5] + value[6:]).isdigit():
+                    return datetime(int(value[6:]), int(value[:2]), int(value[3:5]))
+            elif len(value) == 8 and value.isdigit():
+                return datetime(int(value[:4]), int(value[4:6]), int(value[6:]))
+        except ValueError:
+            return None
+            
+    # Unpadded or otherwise irregular values go through every format
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _is_plain_decimal(text: str) -> bool:
+    """True for ASCII [-]digits[.digits] strings, which float() always accepts"""
+    
+    if text[:1] == '-':
+        text = text[1:]
+    return text.isascii() and text.replace('.', '', 1).isdigit()
+
+
+def _parse_amount(value: Any) -> Optional[float]:
+    """Claim amount as a float, or None if it is not numeric"""
+    
+    if isinstance(value, (int, float)):
+        return float(value)
+        
+    if isinstance(value, str):
+        text = value.strip()
+        if _is_plain_decimal(text):
+            return float(text)
+            
+        # Remove currency symbols and whitespace
+        if text.isascii():
+            text = text.translate(_STRIP_CURRENCY)
+        else:
+            text = _CURRENCY_STRIP_RE.sub('', text)
+        if _is_plain_decimal(text):
+            return float(text)
+        value = text
+        
+    # Exponents, inf/nan, non-ASCII digits and numeric objects
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _context_date(value: Union[str, datetime]) -> datetime:
+    """Related date for the cross-field checks: a parsed datetime or a YYYY-MM-DD string"""
+    
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def _memoize(validator: Callable, maxsize: int) -> Callable:
+    """
+    Cache a single-argument validator's results by value
+    
+    Results are cached as read-only mappings and every call gets its own dict, so
+    callers may modify what they receive. Unhashable values bypass the cache.
+    """
+    
+    @lru_cache(maxsize=maxsize, typed=True)
+    def cached(value) -> Mapping[str, Any]:
+        return MappingProxyType(validator(value))
+        
+    def memoized(value):
+        try:
+            return dict(cached(value))
+        except TypeError:
+            return validator(value)
+            
+    memoized.cache_info = cached.cache_info
+    memoized.cache_clear = cached.cache_clear
+    return memoized
+
+
+def _is_alnum_code_char(char: str) -> bool:
+    return '0' <= char <= '9' or 'A' <= char <= 'Z'
+
+
+def _is_icd10(code: str) -> bool:
+    """Character-by-character equivalent of _ICD10_RE for a stripped, upper-cased code"""
+    
+    length = len(code)
+    if length != 3 and not 5 <= length <= 8:
+        return False
+    if not ('A' <= code[0] <= 'T' or 'V' <= code[0] <= 'Z'):
+        return False
+    if not ('0' <= code[1] <= '9' and _is_alnum_code_char(code[2])):
+        return False
+    if length == 3:
+        return True
+    if code[3] != '.':
+        return False
+    for char in code[4:]:
+        if not _is_alnum_code_char(char):
+            return False
+    return True
+
+
+def _luhn_valid_rows(digits: np.ndarray, prefix_sum: int = 0,
+                     doubled_digit_sums: np.ndarray = _LUHN_DOUBLED_NP) -> np.ndarray:
+    """
+    Luhn check over an (n, width) array of digit values, one number per row
+    
+    prefix_sum is added for digits implied in front of every number (_NPI_PREFIX_CONTRIB
+    for NPIs); doubled_digit_sums lets callers pass a broadcast copy of _LUHN_DOUBLED_NP
+    """
+    
+    doubled = np.zeros(digits.shape[1], dtype=bool)
+    doubled[-2::-2] = True
+    checksum = (digits[:, ~doubled].sum(axis=1, dtype=np.int64)
+                + doubled_digit_sums[digits[:, doubled]].sum(axis=1, dtype=np.int64))
+    return (checksum + prefix_sum) % 10 == 0
+
+
+def _cpt_in_range_rows(digits: np.ndarray) -> np.ndarray:
+    """CPT 00100-99999 range check over an (n, 5) array of digit values"""
+    
+    return digits[:, :3].any(axis=1)
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _luhn_valid_rows_jit(digits, prefix_sum):
+        n, width = digits.shape
+        valid = np.empty(n, dtype=np.bool_)
+        for row in prange(n):
+            checksum = prefix_sum
+            for position in range(width):
+                digit = digits[row, width - 1 - position]
+                checksum += _LUHN_DOUBLED_NP[digit] if position & 1 else digit
+            valid[row] = checksum % 10 == 0
+        return valid
+        
+    @njit(parallel=True, cache=True)
+    def _cpt_in_range_rows_jit(digits):
+        n = digits.shape[0]
+        valid = np.empty(n, dtype=np.bool_)
+        for row in prange(n):
+            valid[row] = digits[row, 0] != 0 or digits[row, 1] != 0 or digits[row, 2] != 0
+        return valid
+        
+    _luhn_rows = _luhn_valid_rows_jit
+    _cpt_rows = _cpt_in_range_rows_jit
+else:
+    _luhn_rows = _luhn_valid_rows
+    _cpt_rows = _cpt_in_range_rows
+
+
+def _digit_matrix(values: pd.Series, width: int) -> np.ndarray:
+    """Pack fixed-width ASCII digit strings into an (n, width) uint8 array of digit values"""
+    
+    return np.frombuffer(''.join(values).encode('ascii'), dtype=np.uint8).reshape(-1, width) - 0x30
+
+
+def _string_values(values: pd.Series) -> pd.Series:
+    """Object series holding only the str entries; anything else becomes None"""
+    
+    values = values.astype(object)
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        return values
+    return values.where(values.map(lambda value: isinstance(value, str)), None)
+
+
+def _member_id_column(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.upper().str.fullmatch(_MEMBER_ID_RE, na=False)
+
+
+def _npi_column(values: pd.Series) -> pd.Series:
+    digits = values.str.strip().str.translate(_STRIP_NON_DIGITS)
+    valid = digits.str.fullmatch(r'[0-9]{10}', na=False) & ~digits.isin(['0000000000', '9999999999'])
+    
+    candidates = digits[valid]
+    if not candidates.empty:
+        valid[valid] = _luhn_rows(_digit_matrix(candidates, 10), _NPI_PREFIX_CONTRIB)
+    return valid
+
+
+def _diagnosis_column(values: pd.Series) -> pd.Series:
+    clean = values.str.strip().str.upper()
+    return clean.str.fullmatch(_ICD10_RE, na=False) | clean.str.fullmatch(_ICD9_RE, na=False)
+
+
+def _cpt_column(values: pd.Series) -> pd.Series:
+    digits = values.str.strip().str.translate(_STRIP_NON_DIGITS)
+    valid = digits.str.fullmatch(r'[0-9]{5}', na=False)
+    
+    candidates = digits[valid]
+    if not candidates.empty:
+        valid[valid] = _cpt_rows(_digit_matrix(candidates, 5))
+    return valid
+
+
+def _hcpcs_column(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.upper().str.fullmatch(_HCPCS_RE, na=False)
+
+
+def _taxonomy_column(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.upper().str.fullmatch(_TAXONOMY_RE, na=False)
+
+
+def _service_date_column(values: pd.Series) -> pd.Series:
+    clean = values.str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[s]')
+    for fmt in _DATE_FORMATS:
+        pending = parsed.isna() & clean.notna()
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(clean[pending], format=fmt, errors='coerce').astype('datetime64[s]')
+    # One clock read for the whole column
+    return (parsed >= MIN_SERVICE_DATE) & (parsed <= datetime.now())
+
+
+# Vectorized equivalents of the scalar validators, for ASCII values
+_COLUMN_VALIDATORS = {
+    "member_id": _member_id_column,
+    "npi": _npi_column,
+    "icd10_diagnosis": _diagnosis_column,
+    "cpt_procedure": _cpt_column,
+    "hcpcs_procedure": _hcpcs_column,
+    "date_of_service": _service_date_column,
+    "provider_taxonomy": _taxonomy_column
+}
+
+
+class ValidationResult:
+    """Outcome of validating one record, with fixed attributes instead of a per-record dict"""
+    
+    __slots__ = ("valid", "errors", "warnings", "field_results")
+    
+    def __init__(self):
+        self.valid = True
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.field_results: Dict[str, Dict[str, Any]] = {}
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the dictionary layout returned by validate_record"""
+        return {
+            "valid": self.valid,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "field_results": self.field_results
+        }
+
 
 class HealthcareExpectations:
     """
@@ -19,12 +394,13 @@ class HealthcareExpectations:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        self.validation_cache_size = config.get("validation_cache_size", DEFAULT_VALIDATION_CACHE_SIZE)
         self.validation_rules = self._initialize_validation_rules()
         
     def _initialize_validation_rules(self) -> Dict[str, Callable]:
-        """Initialize healthcare validation rules"""
+        """Initialize healthcare validation rules, memoizing the value-only ones"""
         
-        return {
+        rules = {
             "member_id": self.validate_member_id,
             "npi": self.validate_npi,
             "icd10_diagnosis": self.validate_icd10_diagnosis,
@@ -38,6 +414,23 @@ class HealthcareExpectations:
             "discharge_date": self.validate_discharge_date
         }
         
+        if self.validation_cache_size:
+            for rule_name in _MEMOIZED_RULES:
+                rules[rule_name] = _memoize(rules[rule_name], self.validation_cache_size)
+                
+        return rules
+        
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counts for the memoized validators and the shared date parser"""
+        
+        stats = {
+            rule_name: validator.cache_info()._asdict()
+            for rule_name, validator in self.validation_rules.items()
+            if hasattr(validator, "cache_info")
+        }
+        stats["date_parse"] = _parse_date.cache_info()._asdict()
+        return stats
+        
     def validate_member_id(self, value: str) -> Dict[str, Any]:
         """
         Validate Medicaid/Medicare member ID formats
@@ -48,33 +441,21 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "Member ID is required and must be a string"}
+            return {"valid": False, "error": "Member ID is required and must be a string",
+                    "error_code": ValidationErrorCode.MISSING}
             
         # Remove spaces and convert to uppercase
         clean_value = value.strip().upper()
         
-        # Medicaid patterns (varies by state)
-        medicaid_patterns = [
-            r'^\d{9,12}$',                    # 9-12 digits
-            r'^[A-Z]{1,3}\d{6,9}$',          # State prefix + digits
-            r'^[A-Z]{2}\d{8}[A-Z]$',         # State + 8 digits + letter
-        ]
-        
-        # Medicare patterns
-        medicare_patterns = [
-            r'^\d{9}[A-Z]?\d?[A-Z]?$',       # SSN-based format
-            r'^[A-Z]\d{8}[A-Z]$',            # New Medicare format
-        ]
-        
-        all_patterns = medicaid_patterns + medicare_patterns
-        
-        for pattern in all_patterns:
-            if re.match(pattern, clean_value):
-                return {"valid": True, "format": "member_id", "clean_value": clean_value}
+        match = _MEMBER_ID_RE.fullmatch(clean_value)
+        if match:
+            return {"valid": True, "format": "member_id", "clean_value": clean_value,
+                    "program": match.lastgroup}
                 
         return {
-            "valid": False, 
+            "valid": False,
             "error": f"Invalid member ID format: {value}",
+            "error_code": ValidationErrorCode.INVALID_FORMAT,
             "expected_formats": "9-12 digits, state prefix + digits, or Medicare format"
         }
         
@@ -85,40 +466,47 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "NPI is required and must be a string"}
+            return {"valid": False, "error": "NPI is required and must be a string",
+                    "error_code": ValidationErrorCode.MISSING}
             
-        # Remove spaces and non-digits
-        clean_value = re.sub(r'\D', '', value.strip())
+        # Remove spaces and non-digits; already-clean codes skip the regex
+        clean_value = _digits_only(value)
         
         # Must be exactly 10 digits
         if len(clean_value) != 10:
-            return {"valid": False, "error": f"NPI must be exactly 10 digits, got {len(clean_value)}"}
+            return {"valid": False, "error": f"NPI must be exactly 10 digits, got {len(clean_value)}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
             
         # Cannot be all zeros or nines
         if clean_value in ['0000000000', '9999999999']:
-            return {"valid": False, "error": "NPI cannot be all zeros or nines"}
+            return {"valid": False, "error": "NPI cannot be all zeros or nines",
+                    "error_code": ValidationErrorCode.INVALID_VALUE}
             
-        # Validate Luhn algorithm checksum
-        if not self._validate_luhn(clean_value):
-            return {"valid": False, "error": "NPI fails Luhn algorithm checksum"}
+        # Validate Luhn algorithm checksum over the 80840-prefixed number
+        if not self._validate_luhn(clean_value, _NPI_PREFIX_CONTRIB):
+            return {"valid": False, "error": "NPI fails Luhn algorithm checksum",
+                    "error_code": ValidationErrorCode.CHECKSUM}
             
         return {"valid": True, "format": "npi", "clean_value": clean_value}
         
-    def _validate_luhn(self, number: str) -> bool:
-        """Validate Luhn algorithm checksum"""
+    def _validate_luhn(self, number: str, prefix_sum: int = 0) -> bool:
+        """
+        Validate Luhn algorithm checksum
         
-        def luhn_checksum(card_num):
-            def digits_of(n):
-                return [int(d) for d in str(n)]
-            digits = digits_of(card_num)
-            odd_digits = digits[-1::-2]
-            even_digits = digits[-2::-2]
-            checksum = sum(odd_digits)
-            for d in even_digits:
-                checksum += sum(digits_of(d*2))
-            return checksum % 10
+        prefix_sum is the precomputed contribution of a constant leading prefix,
+        e.g. _NPI_PREFIX_CONTRIB for NPIs
+        """
         
-        return luhn_checksum(number) == 0
+        if not (number.isascii() and number.isdigit()):
+            return False
+            
+        # Every second digit from the right is doubled; the table holds its digit sum
+        checksum = prefix_sum
+        for position, char in enumerate(reversed(number.encode())):
+            digit = char - 0x30
+            checksum += _LUHN_DOUBLED[digit] if position & 1 else digit
+            
+        return checksum % 10 == 0
         
     def validate_icd10_diagnosis(self, value: str) -> Dict[str, Any]:
         """
@@ -127,25 +515,26 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "ICD-10 diagnosis code is required"}
+            return {"valid": False, "error": "ICD-10 diagnosis code is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
         clean_value = value.strip().upper()
+        first_char = clean_value[:1]
         
         # ICD-10-CM pattern: A00-Z99 with optional subcategories
-        icd10_pattern = r'^[A-TV-Z][0-9][A-Z0-9](\.[A-Z0-9]{1,4})?$'
-        
-        if re.match(icd10_pattern, clean_value):
-            return {"valid": True, "format": "icd10", "clean_value": clean_value}
-            
+        if first_char in _ICD10_VALID_FIRST:
+            if _is_icd10(clean_value):
+                return {"valid": True, "format": "icd10", "clean_value": clean_value}
+                
         # Also check for ICD-9 format (legacy support)
-        icd9_pattern = r'^[0-9]{3}(\.[0-9]{1,2})?$'
-        if re.match(icd9_pattern, clean_value):
+        elif first_char in _ICD9_VALID_FIRST and _ICD9_RE.fullmatch(clean_value):
             return {"valid": True, "format": "icd9", "clean_value": clean_value, 
                    "warning": "ICD-9 format detected, consider updating to ICD-10"}
             
         return {
             "valid": False,
             "error": f"Invalid diagnosis code format: {value}",
+            "error_code": ValidationErrorCode.INVALID_FORMAT,
             "expected_format": "ICD-10: A00.0 - Z99.9 or ICD-9: 000.0 - 999.99"
         }
         
@@ -156,16 +545,24 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "CPT procedure code is required"}
+            return {"valid": False, "error": "CPT procedure code is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
-        clean_value = re.sub(r'\D', '', value.strip())
+        clean_value = _digits_only(value)
         
         if len(clean_value) != 5:
-            return {"valid": False, "error": f"CPT code must be exactly 5 digits, got {len(clean_value)}"}
+            return {"valid": False, "error": f"CPT code must be exactly 5 digits, got {len(clean_value)}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
+            
+        # Five ASCII digits compare as strings in numeric order; the upper bound always holds
+        if clean_value.isascii():
+            in_range = clean_value >= '00100'
+        else:
+            in_range = int(clean_value) >= 100
             
-        code_num = int(clean_value)
-        if not (100 <= code_num <= 99999):
-            return {"valid": False, "error": f"CPT code must be between 00100-99999, got {clean_value}"}
+        if not in_range:
+            return {"valid": False, "error": f"CPT code must be between 00100-99999, got {clean_value}",
+                    "error_code": ValidationErrorCode.OUT_OF_RANGE}
             
         return {"valid": True, "format": "cpt", "clean_value": clean_value}
         
@@ -176,63 +573,70 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "HCPCS procedure code is required"}
+            return {"valid": False, "error": "HCPCS procedure code is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
         clean_value = value.strip().upper()
         
-        # HCPCS Level II pattern
-        hcpcs_pattern = r'^[A-HJKLMNP-V][0-9]{4}$'
-        
-        if re.match(hcpcs_pattern, clean_value):
+        # HCPCS Level II pattern; an excluded leading letter fails without the regex
+        if clean_value[:1] in _HCPCS_VALID_FIRST and _HCPCS_RE.fullmatch(clean_value):
             return {"valid": True, "format": "hcpcs", "clean_value": clean_value}
             
         return {
             "valid": False,
             "error": f"Invalid HCPCS code format: {value}",
+            "error_code": ValidationErrorCode.INVALID_FORMAT,
             "expected_format": "Letter (A-V, excluding I,O) + 4 digits (e.g., A0100)"
         }
         
-    def validate_service_date(self, value: str) -> Dict[str, Any]:
+    def validate_service_date(self, value: str, today: Optional[datetime] = None) -> Dict[str, Any]:
         """
         Validate date of service
         Must be a valid date, not in the future, not too old
+        
+        Args:
+            value: Date string or datetime
+            today: Reference time for the future-date check; batch callers pass one
+                value instead of reading the clock per row
         """
         
         if not value:
-            return {"valid": False, "error": "Date of service is required"}
+            return {"valid": False, "error": "Date of service is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
         try:
             if isinstance(value, str):
-                # Try different date formats
-                date_formats = ['%Y-%m-%d', '%m/%d/%Y', '%Y%m%d']
-                service_date = None
+                # Try different date formats; parses are cached across calls
+                service_date = _parse_date(value.strip())
                 
-                for fmt in date_formats:
-                    try:
-                        service_date = datetime.strptime(value.strip(), fmt)
-                        break
-                    except ValueError:
-                        continue
-                        
                 if not service_date:
-                    return {"valid": False, "error": f"Invalid date format: {value}"}
+                    return {"valid": False, "error": f"Invalid date format: {value}",
+                            "error_code": ValidationErrorCode.INVALID_FORMAT}
             else:
                 service_date = value
                 
             # Check date range
-            today = datetime.now()
-            min_date = datetime(2020, 1, 1)  # Reasonable minimum for healthcare data
+            if today is None:
+                today = datetime.now()
             
             if service_date > today:
-                return {"valid": False, "error": "Date of service cannot be in the future"}
+                return {"valid": False, "error": "Date of service cannot be in the future",
+                        "error_code": ValidationErrorCode.OUT_OF_RANGE}
+                
+            if service_date < MIN_SERVICE_DATE:
+                return {"valid": False, "error": f"Date of service too old: {service_date.date()}",
+                        "error_code": ValidationErrorCode.OUT_OF_RANGE}
                 
-            if service_date < min_date:
-                return {"valid": False, "error": f"Date of service too old: {service_date.date()}"}
+            # Strings parse to midnight already; datetimes are truncated to the date
+            if not isinstance(value, str):
+                service_date = datetime(service_date.year, service_date.month, service_date.day)
                 
-            return {"valid": True, "format": "date", "clean_value": service_date.strftime('%Y-%m-%d')}
+            return {"valid": True, "format": "date", "clean_value": service_date.strftime('%Y-%m-%d'),
+                    "clean_value_dt": service_date}
             
         except Exception as e:
-            return {"valid": False, "error": f"Invalid date: {str(e)}"}
+            return {"valid": False, "error": f"Invalid date: {str(e)}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
             
     def validate_claim_amount(self, value: Any) -> Dict[str, Any]:
         """
@@ -241,31 +645,28 @@ class HealthcareExpectations:
         """
         
         if value is None:
-            return {"valid": False, "error": "Claim amount is required"}
+            return {"valid": False, "error": "Claim amount is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
-        try:
-            if isinstance(value, str):
-                # Remove currency symbols and whitespace
-                clean_value = re.sub(r'[$,\s]', '', value.strip())
-                amount = float(clean_value)
-            else:
-                amount = float(value)
-                
-            # Validation rules
-            if amount < 0:
-                return {"valid": False, "error": "Claim amount cannot be negative"}
-                
-            if amount == 0:
-                return {"valid": True, "format": "currency", "clean_value": 0.00, 
-                       "warning": "Zero claim amount detected"}
-                
-            if amount > 1000000:  # $1M limit
-                return {"valid": False, "error": f"Claim amount too high: ${amount:,.2f}"}
-                
-            return {"valid": True, "format": "currency", "clean_value": round(amount, 2)}
+        amount = _parse_amount(value)
+        if amount is None:
+            return {"valid": False, "error": f"Invalid claim amount: {value}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
+            
+        # Validation rules
+        if amount < 0:
+            return {"valid": False, "error": "Claim amount cannot be negative",
+                    "error_code": ValidationErrorCode.INVALID_VALUE}
             
-        except (ValueError, TypeError):
-            return {"valid": False, "error": f"Invalid claim amount: {value}"}
+        if amount == 0:
+            return {"valid": True, "format": "currency", "clean_value": 0.00, 
+                   "warning": "Zero claim amount detected"}
+            
+        if amount > 1000000:  # $1M limit
+            return {"valid": False, "error": f"Claim amount too high: ${amount:,.2f}",
+                    "error_code": ValidationErrorCode.OUT_OF_RANGE}
+            
+        return {"valid": True, "format": "currency", "clean_value": round(amount, 2)}
             
     def validate_provider_taxonomy(self, value: str) -> Dict[str, Any]:
         """
@@ -274,16 +675,19 @@ class HealthcareExpectations:
         """
         
         if not value or not isinstance(value, str):
-            return {"valid": False, "error": "Provider taxonomy code is required"}
+            return {"valid": False, "error": "Provider taxonomy code is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
         clean_value = value.strip()
         
         # Taxonomy code pattern: 10 characters, letters and numbers only
         if len(clean_value) != 10:
-            return {"valid": False, "error": f"Taxonomy code must be 10 characters, got {len(clean_value)}"}
+            return {"valid": False, "error": f"Taxonomy code must be 10 characters, got {len(clean_value)}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
             
-        if not re.match(r'^[A-Z0-9]{10}$', clean_value.upper()):
-            return {"valid": False, "error": "Taxonomy code must contain only letters and numbers"}
+        if not _TAXONOMY_RE.fullmatch(clean_value.upper()):
+            return {"valid": False, "error": "Taxonomy code must contain only letters and numbers",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
             
         return {"valid": True, "format": "taxonomy", "clean_value": clean_value.upper()}
         
@@ -294,22 +698,37 @@ class HealthcareExpectations:
         """
         
         if not value:
-            return {"valid": False, "error": "Place of service code is required"}
+            return {"valid": False, "error": "Place of service code is required",
+                    "error_code": ValidationErrorCode.MISSING}
             
         clean_value = str(value).strip().zfill(2)
         
+        # Common case: one or two ASCII digits, checked without parsing
+        if len(clean_value) == 2 and clean_value.isascii() and clean_value.isdigit():
+            if clean_value == '00':
+                return {"valid": False, "error": f"Place of service must be 01-99, got {clean_value}",
+                        "error_code": ValidationErrorCode.OUT_OF_RANGE}
+            return {"valid": True, "format": "pos", "clean_value": clean_value}
+            
         try:
             pos_code = int(clean_value)
             if not (1 <= pos_code <= 99):
-                return {"valid": False, "error": f"Place of service must be 01-99, got {clean_value}"}
+                return {"valid": False, "error": f"Place of service must be 01-99, got {clean_value}",
+                        "error_code": ValidationErrorCode.OUT_OF_RANGE}
                 
             return {"valid": True, "format": "pos", "clean_value": clean_value}
             
         except ValueError:
-            return {"valid": False, "error": f"Invalid place of service code: {value}"}
+            return {"valid": False, "error": f"Invalid place of service code: {value}",
+                    "error_code": ValidationErrorCode.INVALID_FORMAT}
             
-    def validate_admission_date(self, value: str, service_date: Optional[str] = None) -> Dict[str, Any]:
-        """Validate admission date (for inpatient claims)"""
+    def validate_admission_date(self, value: str,
+                                service_date: Optional[Union[str, datetime]] = None) -> Dict[str, Any]:
+        """
+        Validate admission date (for inpatient claims)
+        
+        service_date may be a YYYY-MM-DD string or an already parsed datetime
+        """
         
         date_result = self.validate_service_date(value)
         if not date_result["valid"]:
@@ -318,19 +737,26 @@ class HealthcareExpectations:
         # Additional check: admission should be before or same as service date
         if service_date:
             try:
-                admission_dt = datetime.strptime(date_result["clean_value"], '%Y-%m-%d')
-                service_dt = datetime.strptime(service_date, '%Y-%m-%d')
+                admission_dt = date_result["clean_value_dt"]
+                service_dt = _context_date(service_date)
                 
                 if admission_dt > service_dt:
-                    return {"valid": False, "error": "Admission date cannot be after service date"}
+                    return {"valid": False, "error": "Admission date cannot be after service date",
+                            "error_code": ValidationErrorCode.CROSS_FIELD}
                     
             except ValueError:
                 pass  # If service date is invalid, let it be caught elsewhere
                 
-        return {"valid": True, "format": "date", "clean_value": date_result["clean_value"]}
+        return {"valid": True, "format": "date", "clean_value": date_result["clean_value"],
+                "clean_value_dt": date_result["clean_value_dt"]}
+        
+    def validate_discharge_date(self, value: str,
+                                admission_date: Optional[Union[str, datetime]] = None) -> Dict[str, Any]:
+        """
+        Validate discharge date (for inpatient claims)
         
-    def validate_discharge_date(self, value: str, admission_date: Optional[str] = None) -> Dict[str, Any]:
-        """Validate discharge date (for inpatient claims)"""
+        admission_date may be a YYYY-MM-DD string or an already parsed datetime
+        """
         
         date_result = self.validate_service_date(value)
         if not date_result["valid"]:
@@ -339,94 +765,285 @@ class HealthcareExpectations:
         # Additional check: discharge should be after admission
         if admission_date:
             try:
-                discharge_dt = datetime.strptime(date_result["clean_value"], '%Y-%m-%d')
-                admission_dt = datetime.strptime(admission_date, '%Y-%m-%d')
+                discharge_dt = date_result["clean_value_dt"]
+                admission_dt = _context_date(admission_date)
                 
                 if discharge_dt < admission_dt:
-                    return {"valid": False, "error": "Discharge date cannot be before admission date"}
+                    return {"valid": False, "error": "Discharge date cannot be before admission date",
+                            "error_code": ValidationErrorCode.CROSS_FIELD}
                     
                 # Check for reasonable length of stay (e.g., < 365 days)
                 los_days = (discharge_dt - admission_dt).days
                 if los_days > 365:
                     return {"valid": True, "format": "date", "clean_value": date_result["clean_value"],
-                           "warning": f"Long length of stay: {los_days} days"}
+                           "clean_value_dt": discharge_dt, "warning": f"Long length of stay: {los_days} days"}
                     
             except ValueError:
                 pass
                 
-        return {"valid": True, "format": "date", "clean_value": date_result["clean_value"]}
+        return {"valid": True, "format": "date", "clean_value": date_result["clean_value"],
+                "clean_value_dt": date_result["clean_value_dt"]}
+        
+    def compile_schema(self, validation_schema: Mapping[str, str]) -> CompiledSchema:
+        """
+        Resolve a validation schema once for repeated validate_record calls
+        
+        Returns:
+            (field_name, rule_name, validator, context_field) per schema entry, where
+            validator is None for unknown rules and context_field names the record
+            field passed to cross-field date checks
+        """
+        
+        return [
+            (field_name, rule_name, self.validation_rules.get(rule_name), _CROSS_FIELD_CONTEXT.get(rule_name))
+            for field_name, rule_name in validation_schema.items()
+        ]
+        
+    def _compiled(self, validation_schema: Union[Mapping[str, str], CompiledSchema]) -> CompiledSchema:
+        if isinstance(validation_schema, list):
+            return validation_schema
+        return self.compile_schema(validation_schema)
+        
+    def validate_fast(self, rule_name: str, value: Any, context: Any = None) -> bool:
+        """
+        Pass/fail check for a single value, without building error details
         
-    def validate_record(self, record: Dict[str, Any], validation_schema: Dict[str, str]) -> Dict[str, Any]:
+        Args:
+            rule_name: Validation rule to apply
+            value: Value to validate
+            context: Related field for the admission/discharge cross-checks
+        """
+        
+        validator = self.validation_rules.get(rule_name)
+        if validator is None:
+            return False
+        if rule_name in _CROSS_FIELD_CONTEXT:
+            return self._passes(validator, value, context)
+        return self._passes(validator, value)
+        
+    @staticmethod
+    def _passes(validator: Callable, *args: Any) -> bool:
+        try:
+            return bool(validator(*args)["valid"])
+        except Exception:
+            return False
+            
+    def validate_record(self, record: Dict[str, Any],
+                        validation_schema: Union[Mapping[str, str], CompiledSchema],
+                        collect_details: bool = True) -> Dict[str, Any]:
         """
         Validate a complete healthcare record against a schema
         
         Args:
             record: Data record to validate
-            validation_schema: Maps field names to validation rule names
+            validation_schema: Maps field names to validation rule names, or the result
+                of compile_schema when validating many records against one schema
+            collect_details: When False, only report overall validity and the names of
+                invalid fields, skipping error messages, warnings and per-field results
         """
         
-        validation_results = {
-            "valid": True,
-            "errors": [],
-            "warnings": [],
-            "field_results": {}
-        }
+        compiled_schema = self._compiled(validation_schema)
         
-        for field_name, rule_name in validation_schema.items():
-            if rule_name not in self.validation_rules:
-                validation_results["errors"].append(f"Unknown validation rule: {rule_name}")
+        if not collect_details:
+            invalid_fields = [
+                field_name for field_name, _, validator, context_field in compiled_schema
+                if validator is not None and not (
+                    self._passes(validator, record.get(field_name), record.get(context_field))
+                    if context_field else self._passes(validator, record.get(field_name))
+                )
+            ]
+            return {"valid": not invalid_fields, "invalid_fields": invalid_fields}
+            
+        return self._validate_compiled(record, compiled_schema).to_dict()
+        
+    def validate_record_soa(self, record: Dict[str, Any],
+                            validation_schema: Union[Mapping[str, str], CompiledSchema]
+                            ) -> Tuple[bool, np.ndarray, np.ndarray]:
+        """
+        Validate a record into flat per-field arrays instead of nested dicts
+        
+        Args:
+            record: Data record to validate
+            validation_schema: Schema dict or the result of compile_schema
+            
+        Returns:
+            (valid, field_valid, error_codes): overall validity as in validate_record, a
+            bool array and an int16 ValidationErrorCode array, both in schema order.
+            Rows from many records can be stacked into columns for bulk storage.
+        """
+        
+        compiled_schema = self._compiled(validation_schema)
+        field_valid = np.zeros(len(compiled_schema), dtype=bool)
+        error_codes = np.zeros(len(compiled_schema), dtype=np.int16)
+        field_results = {}
+        valid = True
+        
+        for index, (field_name, _, validator, context_field) in enumerate(compiled_schema):
+            if validator is None:
+                error_codes[index] = ValidationErrorCode.UNKNOWN_RULE
+                continue
+                
+            field_value = record.get(field_name)
+            
+            try:
+                if context_field and context_field in record:
+                    result = validator(field_value, self._related_date(record, context_field, field_results))
+                else:
+                    result = validator(field_value)
+            except Exception:
+                valid = False
+                error_codes[index] = ValidationErrorCode.VALIDATION_ERROR
+                continue
+                
+            field_results[field_name] = result
+            if result["valid"]:
+                field_valid[index] = True
+            else:
+                valid = False
+                error_codes[index] = result.get("error_code", ValidationErrorCode.VALIDATION_ERROR)
+                
+        return valid, field_valid, error_codes
+        
+    def validate_records(self, records: Iterable[Dict[str, Any]],
+                         validation_schema: Union[Mapping[str, str], CompiledSchema]) -> List[ValidationResult]:
+        """
+        Validate many records against one schema
+        
+        The schema is compiled once, and each record's outcome is a slotted
+        ValidationResult rather than a dict.
+        """
+        
+        compiled_schema = self._compiled(validation_schema)
+        return [self._validate_compiled(record, compiled_schema) for record in records]
+        
+    def _validate_compiled(self, record: Dict[str, Any], compiled_schema: CompiledSchema) -> ValidationResult:
+        validation_results = ValidationResult()
+        errors = validation_results.errors
+        # Sized once for every field; entries that never get a result are dropped below
+        field_results = validation_results.field_results = dict.fromkeys([entry[0] for entry in compiled_schema])
+        complete = True
+        
+        for field_name, rule_name, validator, context_field in compiled_schema:
+            if validator is None:
+                errors.append(f"Unknown validation rule: {rule_name}")
+                complete = False
                 continue
                 
             field_value = record.get(field_name)
-            validator = self.validation_rules[rule_name]
             
             try:
                 # Special handling for date cross-validation
-                if rule_name == "admission_date" and "date_of_service" in record:
-                    result = validator(field_value, record["date_of_service"])
-                elif rule_name == "discharge_date" and "admission_date" in record:
-                    result = validator(field_value, record["admission_date"])
+                if context_field and context_field in record:
+                    result = validator(field_value, self._related_date(record, context_field, field_results))
                 else:
                     result = validator(field_value)
                     
-                validation_results["field_results"][field_name] = result
+                field_results[field_name] = result
                 
                 if not result["valid"]:
-                    validation_results["valid"] = False
-                    validation_results["errors"].append(f"{field_name}: {result['error']}")
+                    validation_results.valid = False
+                    errors.append(f"{field_name}: {result['error']}")
                     
                 if "warning" in result:
-                    validation_results["warnings"].append(f"{field_name}: {result['warning']}")
+                    validation_results.warnings.append(f"{field_name}: {result['warning']}")
                     
             except Exception as e:
-                validation_results["valid"] = False
-                validation_results["errors"].append(f"{field_name}: Validation error - {str(e)}")
+                validation_results.valid = False
+                errors.append(f"{field_name}: Validation error - {str(e)}")
+                complete = False
                 
+        if not complete:
+            validation_results.field_results = {
+                field_name: result for field_name, result in field_results.items() if result is not None
+            }
         return validation_results
         
+    def _related_date(self, record: Dict[str, Any], field_name: str,
+                      field_results: Dict[str, Dict[str, Any]]) -> Any:
+        """
+        Context value for a cross-field date check
+        
+        Reuses the datetime parsed when the related field was validated earlier in
+        the record, as long as its raw value was already in YYYY-MM-DD form.
+        """
+        
+        value = record[field_name]
+        result = field_results.get(field_name)
+        if result and result.get("clean_value_dt") is not None and result.get("clean_value") == value:
+            return result["clean_value_dt"]
+        return value
+        
+    def validate_columns(self, df: pd.DataFrame,
+                         validation_schema: Union[Mapping[str, str], CompiledSchema]) -> pd.DataFrame:
+        """
+        Validate a batch of records column by column
+        
+        Format and service date rules run as vectorized operations over each column;
+        other rules, non-string values and values containing non-ASCII characters
+        use the scalar validators.
+        
+        Args:
+            df: Records to validate, one per row
+            validation_schema: Maps field names to validation rule names, or the result
+                of compile_schema
+            
+        Returns:
+            Boolean frame with one column per validated field, matching the per-field
+            validity validate_record would report for each row
+        """
+        
+        field_masks = {}
+        
+        for field_name, rule_name, validator, _ in self._compiled(validation_schema):
+            if validator is None:
+                logger.warning(f"Unknown validation rule: {rule_name}")
+                continue
+                
+            if field_name in df.columns:
+                values = df[field_name]
+            else:
+                values = pd.Series(None, index=df.index, dtype=object)
+                
+            column_validator = _COLUMN_VALIDATORS.get(rule_name)
+            if column_validator is None:
+                field_masks[field_name] = self._validate_values(df, rule_name, values)
+                continue
+                
+            strings = _string_values(values)
+            mask = column_validator(strings).astype(bool)
+            # Non-ASCII strings and non-string values (e.g. datetimes) take the scalar path
+            scalar = strings.str.contains(_NON_ASCII_RE, na=False) | (strings.isna() & values.notna())
+            if scalar.any():
+                mask[scalar] = self._validate_values(df[scalar], rule_name, values[scalar])
+            field_masks[field_name] = mask
+            
+        return pd.DataFrame(field_masks, index=df.index)
+        
+    def _validate_values(self, df: pd.DataFrame, rule_name: str, values: pd.Series) -> pd.Series:
+        """Apply a scalar validator to each value, with cross-field context as in validate_record"""
+        
+        validator = self.validation_rules[rule_name]
+        context_field = _CROSS_FIELD_CONTEXT.get(rule_name)
+        
+        if context_field in df.columns:
+            arguments = zip(values, df[context_field])
+        else:
+            arguments = ((value,) for value in values)
+            
+        def is_valid(args) -> bool:
+            try:
+                return bool(validator(*args)["valid"])
+            except Exception:
+                return False
+                
+        return pd.Series([is_valid(args) for args in arguments], index=values.index, dtype=bool)
+        
     def get_default_medicaid_schema(self) -> Dict[str, str]:
         """Get default validation schema for Medicaid claims"""
         
-        return {
-            "member_id": "member_id",
-            "provider_npi": "npi", 
-            "diagnosis_code": "icd10_diagnosis",
-            "procedure_code": "cpt_procedure",
-            "date_of_service": "date_of_service",
-            "claim_amount": "claim_amount",
-            "place_of_service": "place_of_service"
-        }
+        return dict(_DEFAULT_MEDICAID_SCHEMA)
         
     def get_default_medicare_schema(self) -> Dict[str, str]:
         """Get default validation schema for Medicare claims"""
         
-        return {
-            "member_id": "member_id",
-            "provider_npi": "npi",
-            "diagnosis_code": "icd10_diagnosis", 
-            "procedure_code": "cpt_procedure",
-            "date_of_service": "date_of_service",
-            "claim_amount": "claim_amount",
-            "provider_taxonomy": "provider_taxonomy",
-            "place_of_service": "place_of_service"
-        }
\ No newline at end of file
+        return dict(_DEFAULT_MEDICARE_SCHEMA)
\ No newline at end of file
@@ -5,15 +5,127 @@ Integrates with Databricks Lakehouse Monitoring for advanced analytics
 
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.service.catalog import MonitorInfo, MonitorRefreshInfo
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, current_timestamp, when, count
-from typing import Dict, Any, List, Optional
+from pyspark.sql import SparkSession, DataFrame
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, current_timestamp, when, count, lit, current_date, date_sub
+from pyspark.sql.functions import avg, sum as spark_sum, max as spark_max, pandas_udf, date_format
+from pyspark.sql.types import StructType, StructField, StringType, DoubleType, TimestampType, BooleanType
+from typing import Dict, Any, List, Optional, Mapping, Sequence, Tuple
+from types import MappingProxyType
 import logging
 from datetime import datetime, timedelta
 import json
+import re
+import bisect
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from .spark_config import arrow_enabled
 
 logger = logging.getLogger(__name__)
 
+# Explicit schema for drift alert rows so createDataFrame does not infer it
+DRIFT_ALERT_SCHEMA = StructType([
+    StructField("column_name", StringType(), True),
+    StructField("drift_score", DoubleType(), True),
+    StructField("js_divergence", DoubleType(), True),
+    StructField("severity", StringType(), True),
+    StructField("window_start", TimestampType(), True),
+    StructField("window_end", TimestampType(), True),
+    StructField("monitor_name", StringType(), True),
+    StructField("timestamp", TimestampType(), True)
+])
+
+# Drift metrics columns returned by get_monitor_metrics. Display-only statistics are
+# read as FP32; drift_score stays FP64 because it is compared against thresholds.
+_METRICS_COLUMNS = ("column_name", "data_type", "null_count", "null_percentage", "distinct_count",
+                    "mean", "stddev", "min", "max", "drift_score", "js_divergence")
+_FLOAT32_METRICS_COLUMNS = frozenset({"null_percentage", "mean", "stddev", "min", "max", "js_divergence"})
+
+# Drift severity bands: scores above the i-th threshold get _SEVERITY_LABELS[i + 1]
+_SEVERITY_THRESHOLDS = (0.3, 0.5)
+_SEVERITY_LABELS = ("low", "medium", "high")
+
+# Monitor configuration shared by every create_data_monitor call; read-only so
+# the same objects can be handed out without copying
+_MONITOR_SCHEDULE = MappingProxyType({
+    "quartz_cron_expression": "0 0 */6 * * ?",  # Every 6 hours
+    "timezone_id": "UTC"
+})
+
+_HEALTHCARE_CLASSIFICATION = MappingProxyType({
+    "enabled": True,
+    "run_classifier": True,
+    "classification_tags": (
+        MappingProxyType({
+            "name": "PHI",
+            "description": "Protected Health Information"
+        }),
+        MappingProxyType({
+            "name": "PII",
+            "description": "Personally Identifiable Information"
+        }),
+        MappingProxyType({
+            "name": "FINANCIAL",
+            "description": "Financial Information"
+        }),
+        MappingProxyType({
+            "name": "CLINICAL",
+            "description": "Clinical Data"
+        })
+    )
+})
+
+_HEALTHCARE_CUSTOM_METRICS = (
+    MappingProxyType({
+        "name": "member_id_completeness",
+        "type": "aggregate",
+        "definition": "COUNT(member_id) / COUNT(*)",
+        "output_data_type": "double"
+    }),
+    MappingProxyType({
+        "name": "claim_amount_outliers",
+        "type": "aggregate",
+        "definition": "COUNT(CASE WHEN claim_amount > 50000 THEN 1 END) / COUNT(*)",
+        "output_data_type": "double"
+    }),
+    MappingProxyType({
+        "name": "diagnosis_code_validity",
+        "type": "aggregate",
+        "definition": "COUNT(CASE WHEN diagnosis_code RLIKE '^[A-TV-Z][0-9][A-Z0-9]' THEN 1 END) / COUNT(*)",
+        "output_data_type": "double"
+    }),
+    MappingProxyType({
+        "name": "npi_format_compliance",
+        "type": "aggregate",
+        "definition": "COUNT(CASE WHEN provider_npi RLIKE '^[0-9]{10}$' THEN 1 END) / COUNT(*)",
+        "output_data_type": "double"
+    }),
+    MappingProxyType({
+        "name": "data_freshness_hours",
+        "type": "aggregate",
+        "definition": "AVG((unix_timestamp(current_timestamp()) - unix_timestamp(_ingestion_timestamp)) / 3600)",
+        "output_data_type": "double"
+    })
+)
+
+# Same checks as the diagnosis_code_validity / npi_format_compliance custom metrics
+# (RLIKE '^[A-TV-Z][0-9][A-Z0-9]' and '^[0-9]{10}$'), compiled once per worker.
+# Java's $ also matches before a final line terminator, hence the optional newline.
+_DIAGNOSIS_CODE_RE = re.compile(r"[A-TV-Z][0-9][A-Z0-9]")
+_NPI_RE = re.compile(r"[0-9]{10}\n?")
+
+
+@pandas_udf(StructType([StructField("dx_ok", BooleanType()), StructField("npi_ok", BooleanType())]))
+def validate_healthcare_codes(diagnosis_code: pd.Series, provider_npi: pd.Series) -> pd.DataFrame:
+    """Validate diagnosis codes and NPIs for a whole Arrow batch in one pass; nulls are invalid"""
+    return pd.DataFrame({
+        "dx_ok": diagnosis_code.str.match(_DIAGNOSIS_CODE_RE, na=False).astype(bool),
+        "npi_ok": provider_npi.str.fullmatch(_NPI_RE, na=False).astype(bool)
+    })
+
 
 class LakehouseMonitor:
     """
@@ -25,6 +137,10 @@ class LakehouseMonitor:
         self.workspace_client = workspace_client
         self.spark = spark
         self.config = config
+        self.min_batch_drift_write = config.get("min_batch_drift_write", 1)
+        self._drift_alert_buffer: List[Dict[str, Any]] = []
+        self.monitor_info_ttl = config.get("monitor_info_ttl_seconds", 60)
+        self._monitor_info_cache: Dict[str, Tuple[float, MonitorInfo]] = {}
         
     def create_data_monitor(
         self,
@@ -93,7 +209,7 @@ class LakehouseMonitor:
     ) -> Dict[str, Any]:
         """Build healthcare-specific monitoring configuration"""
         
-        config = {
+        return {
             "data_classification_config": data_classification_config or self._get_default_healthcare_classification(),
             "notifications": {
                 "on_failure": {
@@ -103,92 +219,60 @@ class LakehouseMonitor:
                     "email_addresses": self.config.get("alert_emails", [])
                 }
             },
-            "schedule": {
-                "quartz_cron_expression": "0 0 */6 * * ?",  # Every 6 hours
-                "timezone_id": "UTC"
-            },
+            "schedule": _MONITOR_SCHEDULE,
             "snapshot": {
                 "granularities": granularities
-            }
+            },
+            # Add baseline comparison if provided
+            **({"baseline_table_name": baseline_table} if baseline_table else {}),
+            # Add time series configuration for trend analysis
+            "time_series": {
+                "timestamp_col": "_ingestion_timestamp",
+                "granularities": granularities
+            },
+            # Add custom metrics for healthcare data
+            "custom_metrics": self._build_healthcare_custom_metrics()
         }
         
-        # Add baseline comparison if provided
-        if baseline_table:
-            config["baseline_table_name"] = baseline_table
-            
-        # Add time series configuration for trend analysis
-        config["time_series"] = {
-            "timestamp_col": "_ingestion_timestamp",
-            "granularities": granularities
-        }
+    def _get_default_healthcare_classification(self) -> Mapping[str, Any]:
+        """Default data classification for healthcare data"""
         
-        # Add custom metrics for healthcare data
-        config["custom_metrics"] = self._build_healthcare_custom_metrics()
+        return _HEALTHCARE_CLASSIFICATION
         
-        return config
+    def _build_healthcare_custom_metrics(self) -> Sequence[Mapping[str, Any]]:
+        """Build custom metrics specific to healthcare data"""
         
-    def _get_default_healthcare_classification(self) -> Dict[str, Any]:
-        """Default data classification for healthcare data"""
+        return _HEALTHCARE_CUSTOM_METRICS
         
-        return {
-            "enabled": True,
-            "run_classifier": True,
-            "classification_tags": [
-                {
-                    "name": "PHI",
-                    "description": "Protected Health Information"
-                },
-                {
-                    "name": "PII", 
-                    "description": "Personally Identifiable Information"
-                },
-                {
-                    "name": "FINANCIAL",
-                    "description": "Financial Information"
-                },
-                {
-                    "name": "CLINICAL",
-                    "description": "Clinical Data"
-                }
-            ]
-        }
+    def register_healthcare_validators(self):
+        """Register validate_healthcare(diagnosis_code, provider_npi) for use in SQL"""
         
-    def _build_healthcare_custom_metrics(self) -> List[Dict[str, Any]]:
-        """Build custom metrics specific to healthcare data"""
+        self.spark.udf.register("validate_healthcare", validate_healthcare_codes)
         
-        return [
-            {
-                "name": "member_id_completeness",
-                "type": "aggregate",
-                "definition": "COUNT(member_id) / COUNT(*)",
-                "output_data_type": "double"
-            },
-            {
-                "name": "claim_amount_outliers",
-                "type": "aggregate", 
-                "definition": "COUNT(CASE WHEN claim_amount > 50000 THEN 1 END) / COUNT(*)",
-                "output_data_type": "double"
-            },
-            {
-                "name": "diagnosis_code_validity",
-                "type": "aggregate",
-                "definition": "COUNT(CASE WHEN diagnosis_code RLIKE '^[A-TV-Z][0-9][A-Z0-9]' THEN 1 END) / COUNT(*)",
-                "output_data_type": "double"
-            },
-            {
-                "name": "npi_format_compliance",
-                "type": "aggregate",
-                "definition": "COUNT(CASE WHEN provider_npi RLIKE '^[0-9]{10}$' THEN 1 END) / COUNT(*)",
-                "output_data_type": "double"
-            },
-            {
-                "name": "data_freshness_hours",
-                "type": "aggregate",
-                "definition": "AVG((unix_timestamp(current_timestamp()) - unix_timestamp(_ingestion_timestamp)) / 3600)",
-                "output_data_type": "double"
-            }
-        ]
+    def compute_code_validity(self, table_name: str) -> Dict[str, Any]:
+        """
+        Compute the diagnosis code and NPI validity ratios for a table in a single scan
         
+        Args:
+            table_name: Table with diagnosis_code and provider_npi columns
+        """
+        
+        try:
+            checks = validate_healthcare_codes(col("diagnosis_code").cast("string"),
+                                               col("provider_npi").cast("string"))
+            
+            row = (self.spark.table(table_name)
+                   .select(checks.alias("checks"))
+                   .agg(avg(col("checks.dx_ok").cast("double")).alias("diagnosis_code_validity"),
+                        avg(col("checks.npi_ok").cast("double")).alias("npi_format_compliance"))
+                   .first())
+            
+            return {"table_name": table_name, **row.asDict()}
+            
+        except Exception as e:
+            logger.error(f"Failed to compute code validity: {str(e)}")
+            return {"error": str(e), "table_name": table_name}
+            
     def run_monitor_refresh(self, monitor_name: str, full_refresh: bool = False) -> Dict[str, Any]:
         """
         Trigger a monitor refresh
@@ -207,6 +291,9 @@ class LakehouseMonitor:
             
             logger.info(f"Started monitor refresh: {monitor_name}")
             
+            # The refresh may rewrite the monitor's output tables
+            self._monitor_info_cache.pop(monitor_name, None)
+            
             return {
                 "monitor_name": monitor_name,
                 "refresh_id": refresh_info.refresh_id,
@@ -218,116 +305,168 @@ class LakehouseMonitor:
             logger.error(f"Failed to refresh monitor: {str(e)}")
             return {"error": str(e), "monitor_name": monitor_name}
             
-    def get_monitor_metrics(self, monitor_name: str, start_time: Optional[str] = None) -> Dict[str, Any]:
+    def get_monitor_metrics(
+        self,
+        monitor_name: str,
+        start_time: Optional[str] = None,
+        persist: bool = False
+    ) -> Dict[str, Any]:
         """
         Get metrics from a lakehouse monitor
         
         Args:
             monitor_name: Name of the monitor
             start_time: Start time for metrics (ISO format)
+            persist: Keep the metrics DataFrame cached and return it as "metrics_df";
+                the caller is responsible for unpersisting it
         """
         
+        cached_df = None
+        
         try:
             # Get monitor info
-            monitor_info = self.workspace_client.quality_monitors.get(table_name=monitor_name)
-            
-            # Get metrics table
-            metrics_table = f"{monitor_info.drift_metrics_table_name}"
+            monitor_info = self._get_monitor_info(monitor_name)
             
             # Query metrics
-            metrics_query = f"""
-            SELECT 
-                window.start as window_start,
-                window.end as window_end,
-                column_name,
-                data_type,
-                null_count,
-                null_percentage,
-                distinct_count,
-                mean,
-                stddev,
-                min,
-                max,
-                drift_score,
-                js_divergence
-            FROM {metrics_table}
-            """
-            
+            metrics_df = self.spark.table(monitor_info.drift_metrics_table_name)
             if start_time:
-                metrics_query += f" WHERE window.start >= '{start_time}'"
+                metrics_df = metrics_df.where(col("window.start") >= lit(start_time))
                 
-            metrics_query += " ORDER BY window.start DESC, column_name"
-            
-            metrics_df = self.spark.sql(metrics_query)
-            metrics_data = [row.asDict() for row in metrics_df.collect()]
+            metrics_df = (metrics_df
+                          .select(col("window.start").alias("window_start"),
+                                  col("window.end").alias("window_end"),
+                                  *[col(name).cast("float").alias(name) if name in _FLOAT32_METRICS_COLUMNS else name
+                                    for name in _METRICS_COLUMNS])
+                          .orderBy(col("window_start").desc(), "column_name"))
+            
+            if persist:
+                metrics_df.persist(StorageLevel.MEMORY_AND_DISK)
+                cached_df = metrics_df
+            metrics_data = self._to_records(metrics_df)
             
             # Get profile metrics
-            profile_table = f"{monitor_info.profile_metrics_table_name}"
-            profile_query = f"""
-            SELECT 
-                granularity,
-                window.start as window_start,
-                window.end as window_end,
-                num_records,
-                data_size_bytes
-            FROM {profile_table}
-            """
-            
+            profile_df = self.spark.table(monitor_info.profile_metrics_table_name)
             if start_time:
-                profile_query += f" WHERE window.start >= '{start_time}'"
+                profile_df = profile_df.where(col("window.start") >= lit(start_time))
                 
-            profile_query += " ORDER BY window.start DESC"
-            
-            profile_df = self.spark.sql(profile_query)
-            profile_data = [row.asDict() for row in profile_df.collect()]
-            
-            return {
+            profile_df = (profile_df
+                          .select("granularity",
+                                  col("window.start").alias("window_start"),
+                                  col("window.end").alias("window_end"),
+                                  "num_records", "data_size_bytes")
+                          .orderBy(col("window_start").desc()))
+            profile_data = self._to_records(profile_df)
+            
+            result = {
                 "monitor_name": monitor_name,
                 "metrics": metrics_data,
                 "profile": profile_data,
                 "status": "success"
             }
+            if persist:
+                result["metrics_df"] = metrics_df
+                
+            return result
             
         except Exception as e:
             logger.error(f"Failed to get monitor metrics: {str(e)}")
+            # The caller never receives a cached DataFrame on failure, so release it here
+            if cached_df is not None:
+                cached_df.unpersist()
             return {"error": str(e), "monitor_name": monitor_name}
             
-    def detect_data_drift(self, monitor_name: str, drift_threshold: float = 0.1) -> Dict[str, Any]:
+    def _get_monitor_info(self, monitor_name: str) -> MonitorInfo:
+        """Look up a monitor and its output tables, cached for monitor_info_ttl_seconds"""
+        
+        now = time.monotonic()
+        cached = self._monitor_info_cache.get(monitor_name)
+        if cached is not None and now - cached[0] < self.monitor_info_ttl:
+            return cached[1]
+            
+        monitor_info = self.workspace_client.quality_monitors.get(table_name=monitor_name)
+        self._monitor_info_cache[monitor_name] = (now, monitor_info)
+        return monitor_info
+        
+    def _query_drift_rows(
+        self,
+        monitor_name: str,
+        drift_threshold: float,
+        start_time: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch only the drift metrics rows above the threshold, filtered in Spark"""
+        
+        metrics_table = self._get_monitor_info(monitor_name).drift_metrics_table_name
+        
+        drift_df = self.spark.table(metrics_table).where(col("drift_score") > lit(float(drift_threshold)))
+        if start_time:
+            drift_df = drift_df.where(col("window.start") >= lit(start_time))
+            
+        drift_df = (drift_df
+                    .select(col("window.start").alias("window_start"),
+                            col("window.end").alias("window_end"),
+                            "column_name", "drift_score", "js_divergence")
+                    .orderBy(col("window_start").desc(), "column_name"))
+        
+        return self._to_records(drift_df)
+        
+    def detect_data_drift(
+        self,
+        monitor_name: str,
+        drift_threshold: float = 0.1,
+        metrics: Optional[Dict[str, Any]] = None,
+        start_time: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Detect data drift using monitor results
         
         Args:
             monitor_name: Monitor to analyze
             drift_threshold: Threshold for drift detection
+            metrics: Result of get_monitor_metrics already fetched by the caller
+            start_time: Start time for metrics (ISO format) when they are fetched here
         """
         
         try:
-            monitor_metrics = self.get_monitor_metrics(monitor_name)
-            
-            if "error" in monitor_metrics:
-                return monitor_metrics
+            if metrics is None:
+                # Only rows above the threshold leave Spark
+                drift_rows = self._query_drift_rows(monitor_name, drift_threshold, start_time)
+            elif "error" in metrics:
+                return metrics
+            else:
+                drift_rows = [
+                    metric for metric in metrics.get("metrics", [])
+                    if metric.get("drift_score") and metric["drift_score"] > drift_threshold
+                ]
                 
-            drift_alerts = []
-            metrics = monitor_metrics.get("metrics", [])
-            
-            for metric in metrics:
-                drift_score = metric.get("drift_score")
-                js_divergence = metric.get("js_divergence")
-                column_name = metric.get("column_name")
+            # Nothing drifted: no alerts to build or store
+            if not drift_rows:
+                return {
+                    "monitor_name": monitor_name,
+                    "drift_detected": False,
+                    "total_drift_columns": 0,
+                    "drift_alerts": [],
+                    "threshold": drift_threshold
+                }
                 
-                if drift_score and drift_score > drift_threshold:
-                    drift_alerts.append({
-                        "column_name": column_name,
-                        "drift_score": drift_score,
-                        "js_divergence": js_divergence,
-                        "severity": self._calculate_drift_severity(drift_score),
-                        "window_start": metric.get("window_start"),
-                        "window_end": metric.get("window_end")
-                    })
+            # Severity bands for all drifted columns at once
+            drift_scores = np.fromiter((metric["drift_score"] for metric in drift_rows),
+                                       dtype=np.float64, count=len(drift_rows))
+            severities = np.searchsorted(_SEVERITY_THRESHOLDS, drift_scores, side="left")
+            
+            drift_alerts = [
+                {
+                    "column_name": metric.get("column_name"),
+                    "drift_score": metric.get("drift_score"),
+                    "js_divergence": metric.get("js_divergence"),
+                    "severity": _SEVERITY_LABELS[severity],
+                    "window_start": metric.get("window_start"),
+                    "window_end": metric.get("window_end")
+                }
+                for metric, severity in zip(drift_rows, severities)
+            ]
                     
             # Store drift alerts
-            if drift_alerts:
-                self._store_drift_alerts(monitor_name, drift_alerts)
+            self._store_drift_alerts(monitor_name, drift_alerts)
                 
             return {
                 "monitor_name": monitor_name,
@@ -344,28 +483,47 @@ class LakehouseMonitor:
     def _calculate_drift_severity(self, drift_score: float) -> str:
         """Calculate drift severity based on score"""
         
-        if drift_score > 0.5:
-            return "high"
-        elif drift_score > 0.3:
-            return "medium"
-        else:
-            return "low"
+        # bisect_left keeps the bounds exclusive: exactly 0.5 is still "medium"
+        return _SEVERITY_LABELS[bisect.bisect_left(_SEVERITY_THRESHOLDS, drift_score)]
             
     def _store_drift_alerts(self, monitor_name: str, drift_alerts: List[Dict[str, Any]]):
-        """Store drift alerts for monitoring"""
+        """Buffer drift alerts; they are written once min_batch_drift_write alerts accumulate"""
+        
+        timestamp = datetime.now()
+        self._drift_alert_buffer.extend(
+            {**alert, "monitor_name": monitor_name, "timestamp": timestamp} for alert in drift_alerts
+        )
+        if len(self._drift_alert_buffer) >= self.min_batch_drift_write:
+            self.flush_alerts()
+            
+    def __enter__(self) -> "LakehouseMonitor":
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush_alerts()
+        
+    def flush_alerts(self):
+        """
+        Write buffered drift alerts to the alerts table in a single commit
+        
+        Callers of detect_data_drift outside get_monitor_dashboard_data must flush (or use the
+        monitor as a context manager) once their run ends. Alerts stay buffered if the write fails.
+        """
+        
+        if not self._drift_alert_buffer:
+            return
+            
+        rows, self._drift_alert_buffer = self._drift_alert_buffer, []
         
         try:
             alerts_table = self.config.get("drift_alerts_table", "monitoring.drift_alerts")
             
-            for alert in drift_alerts:
-                alert["monitor_name"] = monitor_name
-                alert["timestamp"] = datetime.now().isoformat()
-                
-            alerts_df = self.spark.createDataFrame(drift_alerts)
-            alerts_df.write.format("delta").mode("append").saveAsTable(alerts_table)
+            alerts_df = self.spark.createDataFrame(rows, schema=DRIFT_ALERT_SCHEMA)
+            self._append_to_table(alerts_df, alerts_table, mergeSchema="false")
             
         except Exception as e:
             logger.error(f"Failed to store drift alerts: {str(e)}")
+            self._drift_alert_buffer[:0] = rows
             
     def _store_monitor_metadata(self, monitor_info: MonitorInfo, config: Dict[str, Any]):
         """Store monitor metadata for tracking"""
@@ -378,38 +536,114 @@ class LakehouseMonitor:
                 "table_name": monitor_info.table_name,
                 "status": monitor_info.status,
                 "assets_dir": monitor_info.assets_dir,
-                "config": json.dumps(config),
+                "config": json.dumps(config, default=dict),
                 "created_at": datetime.now().isoformat()
             }
             
             metadata_df = self.spark.createDataFrame([metadata])
-            metadata_df.write.format("delta").mode("append").saveAsTable(metadata_table)
+            self._append_to_table(metadata_df, metadata_table)
             
         except Exception as e:
             logger.error(f"Failed to store monitor metadata: {str(e)}")
             
+    def _append_to_table(self, df: DataFrame, table_name: str, **options: str):
+        """
+        Append to a monitoring table, partitioning by monitor_name only when the write creates it
+        
+        Tables created before partitioning was introduced keep their layout, since Delta
+        rejects appends whose partitioning differs from the existing table. Columns are cast
+        to the existing table's types so older tables (e.g. string alert timestamps) keep
+        accepting appends.
+        """
+        
+        table_exists = self.spark.catalog.tableExists(table_name)
+        if table_exists:
+            df = self._align_to_table_schema(df, table_name)
+            
+        writer = df.write
+        for key, value in options.items():
+            writer = writer.option(key, value)
+        writer = writer.format("delta").mode("append")
+        if not table_exists:
+            writer = writer.partitionBy("monitor_name")
+        writer.saveAsTable(table_name)
+        
+    def _align_to_table_schema(self, df: DataFrame, table_name: str) -> DataFrame:
+        """Cast df's columns to the types of the same columns in an existing table"""
+        
+        existing_types = {field.name: field.dataType for field in self.spark.table(table_name).schema.fields}
+        mismatched = [field for field in df.schema.fields
+                      if field.name in existing_types and existing_types[field.name] != field.dataType]
+        
+        for field in mismatched:
+            target_type = existing_types[field.name]
+            if isinstance(field.dataType, TimestampType) and isinstance(target_type, StringType):
+                # Same ISO-8601 text that was written before timestamps were typed
+                column = date_format(df[field.name], "yyyy-MM-dd'T'HH:mm:ss.SSSSSS")
+            else:
+                column = df[field.name].cast(target_type)
+            df = df.withColumn(field.name, column)
+            
+        return df
+            
+    def maintain_tables(self) -> Dict[str, Any]:
+        """
+        Compact the monitoring tables; intended to run on a schedule.
+        Drift alerts are Z-ordered by timestamp within each monitor_name partition.
+        """
+        
+        alerts_table = self.config.get("drift_alerts_table", "monitoring.drift_alerts")
+        metadata_table = self.config.get("monitor_metadata_table", "monitoring.monitor_metadata")
+        
+        results = {}
+        for table_name, statement in [
+            (alerts_table, f"OPTIMIZE {alerts_table} ZORDER BY (timestamp)"),
+            (metadata_table, f"OPTIMIZE {metadata_table}")
+        ]:
+            try:
+                self.spark.sql(statement)
+                results[table_name] = "optimized"
+            except Exception as e:
+                logger.error(f"Failed to optimize {table_name}: {str(e)}")
+                results[table_name] = f"error: {str(e)}"
+                
+        return results
+        
     def get_monitor_dashboard_data(self, monitor_name: str, days: int = 30) -> Dict[str, Any]:
         """Get comprehensive monitoring data for dashboard"""
         
+        metrics_df = None
+        
         try:
-            # Get current monitor metrics
-            start_time = (datetime.now() - timedelta(days=days)).isoformat()
-            metrics_data = self.get_monitor_metrics(monitor_name, start_time)
-            
-            # Get drift alerts
-            drift_data = self.detect_data_drift(monitor_name)
-            
-            # Get recent drift alerts from storage
-            drift_alerts_table = self.config.get("drift_alerts_table", "monitoring.drift_alerts")
-            recent_alerts_df = (self.spark.table(drift_alerts_table)
-                              .filter(f"monitor_name = '{monitor_name}'")
-                              .filter(f"timestamp >= current_date() - {days}")
-                              .orderBy("timestamp DESC"))
+            days = int(days)
             
-            recent_alerts = [row.asDict() for row in recent_alerts_df.collect()]
+            start_time = (datetime.now() - timedelta(days=days)).isoformat()
             
-            # Calculate summary statistics
-            summary_stats = self._calculate_monitor_summary(metrics_data.get("metrics", []))
+            # The queries are independent Spark jobs; submitting them from separate threads
+            # lets them run concurrently (with spark.scheduler.mode=FAIR, sharing the cluster)
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                # Get current monitor metrics, cached for the duration of the call
+                metrics_future = executor.submit(self.get_monitor_metrics, monitor_name, start_time, persist=True)
+                recent_alerts_future = executor.submit(self._fetch_recent_alerts, monitor_name, days)
+                
+                metrics_data = metrics_future.result()
+                metrics_df = metrics_data.pop("metrics_df", None)
+                
+                # Calculate summary statistics
+                if metrics_df is not None:
+                    summary_future = executor.submit(self._summary_via_spark, metrics_df)
+                else:
+                    summary_future = None
+                    
+                # Get drift alerts from the same window, without querying the metrics again
+                drift_data = self.detect_data_drift(monitor_name, metrics=metrics_data)
+                
+                if summary_future is not None:
+                    summary_stats = summary_future.result()
+                else:
+                    summary_stats = self._calculate_monitor_summary(metrics_data.get("metrics", []))
+                    
+                recent_alerts = recent_alerts_future.result()
             
             return {
                 "monitor_name": monitor_name,
@@ -426,20 +660,103 @@ class LakehouseMonitor:
             logger.error(f"Failed to get monitor dashboard data: {str(e)}")
             return {"error": str(e), "monitor_name": monitor_name}
             
+        finally:
+            if metrics_df is not None:
+                metrics_df.unpersist()
+            # End of the monitoring run: don't leave drift alerts below min_batch_drift_write unwritten
+            self.flush_alerts()
+            
+    def get_monitor_dashboard_arrow(self, monitor_name: str, days: int = 30) -> bytes:
+        """
+        Get monitoring data for dashboard as an Arrow IPC stream
+        
+        The metrics rows are sent as columnar record batches; the remaining dashboard
+        sections (or the error) are JSON-encoded in the schema metadata under "dashboard".
+        """
+        
+        dashboard = self.get_monitor_dashboard_data(monitor_name, days)
+        metrics_table = pa.Table.from_pylist(dashboard.pop("metrics", []))
+        metrics_table = metrics_table.replace_schema_metadata({"dashboard": json.dumps(dashboard, default=str)})
+        
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, metrics_table.schema) as writer:
+            writer.write_table(metrics_table)
+            
+        return sink.getvalue().to_pybytes()
+        
+    def _fetch_recent_alerts(self, monitor_name: str, days: int) -> List[Dict[str, Any]]:
+        """Get stored drift alerts for a monitor from the last `days` days"""
+        
+        # timestamp is a TIMESTAMP column, compared as one
+        drift_alerts_table = self.config.get("drift_alerts_table", "monitoring.drift_alerts")
+        recent_alerts_df = (self.spark.table(drift_alerts_table)
+                          .where(col("monitor_name") == lit(monitor_name))
+                          .where(col("timestamp") >= date_sub(current_date(), int(days)))
+                          .orderBy(col("timestamp").desc()))
+        
+        return self._to_records(recent_alerts_df)
+        
     def _calculate_monitor_summary(self, metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calculate summary statistics from metrics"""
         
         if not metrics:
             return {"total_columns": 0, "avg_drift_score": 0}
             
-        drift_scores = [m.get("drift_score", 0) for m in metrics if m.get("drift_score")]
-        null_percentages = [m.get("null_percentage", 0) for m in metrics if m.get("null_percentage")]
+        # Missing and zero values are left out of the averages
+        drift_scores = np.fromiter((m.get("drift_score") or 0.0 for m in metrics),
+                                   dtype=np.float64, count=len(metrics))
+        null_percentages = np.fromiter((m.get("null_percentage") or 0.0 for m in metrics),
+                                       dtype=np.float64, count=len(metrics))
+        drift_scores = drift_scores[drift_scores != 0]
+        null_percentages = null_percentages[null_percentages != 0]
         
         return {
             "total_columns": len(metrics),
-            "avg_drift_score": sum(drift_scores) / len(drift_scores) if drift_scores else 0,
-            "max_drift_score": max(drift_scores) if drift_scores else 0,
-            "avg_null_percentage": sum(null_percentages) / len(null_percentages) if null_percentages else 0,
-            "columns_with_drift": len([s for s in drift_scores if s > 0.1]),
-            "high_drift_columns": len([s for s in drift_scores if s > 0.5])
-        }
\ No newline at end of file
+            "avg_drift_score": float(drift_scores.mean()) if drift_scores.size else 0,
+            "max_drift_score": float(drift_scores.max()) if drift_scores.size else 0,
+            "avg_null_percentage": float(null_percentages.mean()) if null_percentages.size else 0,
+            "columns_with_drift": int(np.count_nonzero(drift_scores > 0.1)),
+            "high_drift_columns": int(np.count_nonzero(drift_scores > 0.5))
+        }
+            
+    def _summary_via_spark(self, metrics_df: DataFrame) -> Dict[str, Any]:
+        """Calculate summary statistics as a single Spark aggregate row"""
+        
+        # Missing and zero values are left out of the averages, as in _calculate_monitor_summary
+        drift_score = when(col("drift_score") != 0, col("drift_score"))
+        null_percentage = when(col("null_percentage") != 0, col("null_percentage"))
+        
+        row = metrics_df.agg(
+            count(lit(1)).alias("total_columns"),
+            avg(drift_score).alias("avg_drift_score"),
+            spark_max(drift_score).alias("max_drift_score"),
+            avg(null_percentage).alias("avg_null_percentage"),
+            spark_sum((drift_score > 0.1).cast("int")).alias("columns_with_drift"),
+            spark_sum((drift_score > 0.5).cast("int")).alias("high_drift_columns")
+        ).first().asDict()
+        
+        if not row["total_columns"]:
+            return {"total_columns": 0, "avg_drift_score": 0}
+            
+        return {
+            "total_columns": row["total_columns"],
+            "avg_drift_score": float(row["avg_drift_score"] or 0),
+            "max_drift_score": float(row["max_drift_score"] or 0),
+            "avg_null_percentage": float(row["avg_null_percentage"] or 0),
+            "columns_with_drift": row["columns_with_drift"] or 0,
+            "high_drift_columns": row["high_drift_columns"] or 0
+        }
+        
+    @staticmethod
+    def _to_records(df: DataFrame) -> List[Dict[str, Any]]:
+        """Collect a query result through Arrow as a list of row dicts, nulls as None"""
+        
+        with arrow_enabled(df.sparkSession):
+            pdf = df.toPandas()
+        
+        # Render FP32 columns at their own precision (0.3, not 0.30000001192092896)
+        float32_columns = list(pdf.columns[pdf.dtypes == np.float32])
+        if float32_columns:
+            pdf[float32_columns] = pdf[float32_columns].astype(str).astype(np.float64)
+            
+        return pdf.astype(object).where(pdf.notna(), None).to_dict(orient="records")
\ No newline at end of file
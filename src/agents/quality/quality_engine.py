@@ -3,10 +3,13 @@ Advanced Quality Rule Engine and Validation Framework
 Comprehensive data quality validation system with configurable rules and automated remediation
 """
 
-from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql import SparkSession, DataFrame, Column
+from pyspark.sql.window import Window
+from pyspark import StorageLevel
 from pyspark.sql.functions import col, when, count, sum as spark_sum, avg, stddev, max as spark_max, min as spark_min
+from pyspark.sql.functions import countDistinct, approx_count_distinct, expr, pandas_udf, row_number
 from pyspark.sql.types import StructType, StructField, StringType, DoubleType, IntegerType, BooleanType
-from typing import Dict, Any, List, Optional, Callable, Union
+from typing import Dict, Any, List, Optional, Callable, Union, Set
 import yaml
 import json
 import re
@@ -14,9 +17,149 @@ import logging
 from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict
 from enum import Enum
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+from .healthcare_expectations import (
+    _LUHN_DOUBLED, _LUHN_DOUBLED_NP, _NPI_PREFIX_CONTRIB, _digit_matrix, _luhn_valid_rows
+)
 
 logger = logging.getLogger(__name__)
 
+# bytes.translate tables mapping ASCII digits to their value and to their doubled digit sum
+_LUHN_DIGIT_TABLE = bytes.maketrans(b'0123456789', bytes(range(10)))
+_LUHN_DOUBLED_TABLE = bytes.maketrans(b'0123456789', _LUHN_DOUBLED)
+
+
+# Relative standard deviation of approximate distinct counts for non-critical uniqueness rules
+_UNIQUENESS_RSD = 0.01
+
+# Spark type names that get min/max/mean/stddev in profile_data
+_NUMERIC_PROFILE_TYPES = ('int', 'bigint', 'float', 'double', 'decimal')
+
+# Format patterns for match_patterns in custom rule conditions, keyed by pattern id.
+# The built-in rules use RLIKE; match_patterns is only registered when re2 is installed
+_FORMAT_PATTERNS = {
+    'email': r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
+    'phone': r'\+?1?[0-9]{10}',
+    'npi': r'[0-9]{10}',
+    'icd10': r'[A-TV-Z][0-9][A-Z0-9](\.[A-Z0-9]{0,4})?',
+    'cpt': r'[0-9]{5}',
+}
+
+
+@lru_cache(maxsize=64)
+def _compiled_format_pattern(pattern: str):
+    """Compile a format pattern once per Python worker, with re2 when it is installed"""
+    return (re2 if RE2_AVAILABLE else re).compile(pattern)
+
+
+def _luhn_check_batch(values: pd.Series, doubled_digit_sums: np.ndarray, prefix_contrib: int = 0) -> pd.Series:
+    """
+    Luhn checksum over a batch of digit strings
+    
+    Numbers are left-padded with zeros (which do not change the checksum) to a common
+    width so the digits of the whole batch form one matrix. prefix_contrib is added to
+    every checksum for digits implied in front of the values. Nulls, empty and
+    non-digit values are invalid.
+    """
+    
+    values = values.astype(str)
+    is_digits = values.str.fullmatch(r'[0-9]+', na=False).astype(bool)
+    result = pd.Series(False, index=values.index)
+    if not is_digits.any():
+        return result
+        
+    numbers = values[is_digits]
+    width = int(numbers.str.len().max())
+    digits = _digit_matrix(numbers.str.zfill(width), width)
+    result[is_digits] = _luhn_valid_rows(digits, prefix_contrib, doubled_digit_sums)
+    return result
+
+
+def _npi_check_batch(values: pd.Series, doubled_digit_sums: np.ndarray) -> pd.Series:
+    """NPI check digit over a batch: Luhn over the 80840-prefixed value, 10-digit values only"""
+    is_npi = values.astype(str).str.fullmatch(r'[0-9]{10}', na=False).astype(bool)
+    return _luhn_check_batch(values, doubled_digit_sums, _NPI_PREFIX_CONTRIB) & is_npi
+
+
+def _match_patterns_batch(values: pd.Series, pattern_ids: pd.Series, patterns: Dict[str, Any]) -> pd.Series:
+    """
+    Full-match a batch of values against the named format patterns
+    
+    Values are matched one by one against the compiled pattern of their id (normally a
+    single literal per rule condition). Nulls and unknown pattern ids never match.
+    """
+    
+    values = values.astype(object)
+    result = pd.Series(False, index=values.index)
+    
+    for pattern_id in pattern_ids.dropna().unique():
+        if pattern_id not in patterns:
+            continue
+        pattern = _compiled_format_pattern(patterns[pattern_id])
+        rows = (pattern_ids == pattern_id) & values.notna()
+        result[rows] = [pattern.fullmatch(str(value)) is not None for value in values[rows]]
+        
+    return result
+
+
+@pandas_udf(BooleanType())
+def luhn_check_udf(values: pd.Series) -> pd.Series:
+    """Luhn checksum UDF using the module's lookup table"""
+    return _luhn_check_batch(values, _LUHN_DOUBLED_NP)
+
+
+@pandas_udf(BooleanType())
+def npi_check_udf(values: pd.Series) -> pd.Series:
+    """NPI check digit UDF using the module's lookup table"""
+    return _npi_check_batch(values, _LUHN_DOUBLED_NP)
+
+
+@pandas_udf(BooleanType())
+def match_patterns(values: pd.Series, pattern_ids: pd.Series) -> pd.Series:
+    """Format pattern UDF using the module's patterns"""
+    return _match_patterns_batch(values, pattern_ids, _FORMAT_PATTERNS)
+
+
+def _broadcast_validation_udfs(spark: SparkSession):
+    """
+    luhn_check, npi_check and (with re2) match_patterns UDFs that read their lookup table and
+    patterns from one broadcast variable
+    
+    The UDF closures only hold the broadcast handle, so tasks ship a reference instead of
+    the tables, and each executor deserializes them once.
+    
+    Returns:
+        Tuple of the broadcast variable and a dict of UDFs by SQL function name
+    """
+    
+    tables = spark.sparkContext.broadcast({'luhn_doubled': _LUHN_DOUBLED_NP, 'patterns': _FORMAT_PATTERNS})
+    
+    @pandas_udf(BooleanType())
+    def luhn_check(values: pd.Series) -> pd.Series:
+        return _luhn_check_batch(values, tables.value['luhn_doubled'])
+        
+    @pandas_udf(BooleanType())
+    def npi_check(values: pd.Series) -> pd.Series:
+        return _npi_check_batch(values, tables.value['luhn_doubled'])
+        
+    @pandas_udf(BooleanType())
+    def match_patterns_broadcast(values: pd.Series, pattern_ids: pd.Series) -> pd.Series:
+        return _match_patterns_batch(values, pattern_ids, tables.value['patterns'])
+        
+    udfs = {'luhn_check': luhn_check, 'npi_check': npi_check}
+    if RE2_AVAILABLE:
+        udfs['match_patterns'] = match_patterns_broadcast
+    return tables, udfs
+
 
 class QualityDimension(Enum):
     """Quality dimensions for assessment"""
@@ -97,6 +240,87 @@ class ProfileResult:
             self.pattern_analysis = {}
 
 
+class _FieldPatternIndex:
+    """
+    Index of rule field-name patterns by kind ('*', '*term*', '*suffix', 'prefix*', exact)
+    
+    Patterns are lowercased once at registration, so matching a field costs a dict lookup
+    per prefix/suffix of its name plus one substring test per distinct 'contains' term,
+    independent of the number of rules.
+    """
+    
+    def __init__(self):
+        self._star: Set[str] = set()
+        self._exact: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Set[str]] = {}
+        self._suffixes: Dict[str, Set[str]] = {}
+        self._contains: Dict[str, Set[str]] = {}
+        self._patterns: Dict[str, List[str]] = {}
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+        
+    def _bucket(self, pattern: str):
+        if pattern == "*":
+            return None, None
+        elif pattern.startswith("*") and pattern.endswith("*"):
+            return self._contains, pattern[1:-1].lower()
+        elif pattern.startswith("*"):
+            return self._suffixes, pattern[1:].lower()
+        elif pattern.endswith("*"):
+            return self._prefixes, pattern[:-1].lower()
+        return self._exact, pattern.lower()
+        
+    def add(self, rule_name: str, patterns: List[str]):
+        """Index a rule's patterns, replacing any earlier registration under the same name"""
+        if rule_name in self._patterns:
+            self.remove(rule_name, keep_position=True)
+        else:
+            self._positions[rule_name] = self._next_position
+            self._next_position += 1
+            
+        self._patterns[rule_name] = list(patterns)
+        for pattern in patterns:
+            bucket, key = self._bucket(pattern)
+            if bucket is None:
+                self._star.add(rule_name)
+            else:
+                bucket.setdefault(key, set()).add(rule_name)
+                
+    def remove(self, rule_name: str, keep_position: bool = False):
+        """Drop a rule from the index"""
+        for pattern in self._patterns.pop(rule_name, []):
+            bucket, key = self._bucket(pattern)
+            if bucket is None:
+                self._star.discard(rule_name)
+            else:
+                names = bucket.get(key, set())
+                names.discard(rule_name)
+                if not names:
+                    bucket.pop(key, None)
+        if not keep_position:
+            self._positions.pop(rule_name, None)
+            
+    def match(self, field_name: str) -> Set[str]:
+        """Names of the indexed rules whose patterns match field_name"""
+        name = field_name.lower()
+        matched = set(self._star)
+        matched.update(self._exact.get(name, ()))
+        
+        for end in range(len(name) + 1):
+            matched.update(self._prefixes.get(name[:end], ()))
+            matched.update(self._suffixes.get(name[end:], ()))
+            
+        for term, names in self._contains.items():
+            if term in name:
+                matched.update(names)
+                
+        return matched
+        
+    def position(self, rule_name: str) -> int:
+        """Registration order of a rule, kept across re-registration"""
+        return self._positions[rule_name]
+
+
 class QualityEngine:
     """
     Advanced data quality engine with configurable rules and automated assessment
@@ -107,7 +331,9 @@ class QualityEngine:
         self.config = config
         self.quality_config = self._load_quality_config()
         self.rules_registry = {}
+        self._rule_index = _FieldPatternIndex()
         self.custom_functions = {}
+        self._validation_tables = None
         self._initialize_built_in_rules()
         
     def _load_quality_config(self) -> Dict[str, Any]:
@@ -169,7 +395,7 @@ class QualityEngine:
             description="Validate email address format",
             dimension=QualityDimension.VALIDITY,
             severity=RuleSeverity.WARNING,
-            condition="field_value RLIKE '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$'",
+            condition="field_value RLIKE '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\\\.[a-zA-Z]{2,}$'",
             field_names=["email", "*email*"],
             tags=["format", "email"]
         ))
@@ -179,7 +405,7 @@ class QualityEngine:
             description="Validate phone number format", 
             dimension=QualityDimension.VALIDITY,
             severity=RuleSeverity.WARNING,
-            condition="field_value RLIKE '^\\+?1?[0-9]{10}$'",
+            condition="field_value RLIKE '^\\\\+?1?[0-9]{10}$'",
             field_names=["phone", "*phone*", "telephone"],
             auto_remediate=True,
             remediation_action="standardize_phone",
@@ -202,7 +428,7 @@ class QualityEngine:
             description="Validate NPI format and Luhn checksum",
             dimension=QualityDimension.VALIDITY,
             severity=RuleSeverity.CRITICAL,
-            condition="field_value RLIKE '^[0-9]{10}$' AND luhn_check(field_value)",
+            condition="field_value RLIKE '^[0-9]{10}$' AND npi_check(field_value)",
             field_names=["provider_npi", "npi", "*npi*"],
             tags=["healthcare", "npi", "format"]
         ))
@@ -212,7 +438,7 @@ class QualityEngine:
             description="Validate ICD-10 diagnosis code format",
             dimension=QualityDimension.VALIDITY,
             severity=RuleSeverity.CRITICAL,
-            condition="field_value RLIKE '^[A-TV-Z][0-9][A-Z0-9](\\.[A-Z0-9]{0,4})?$'",
+            condition="field_value RLIKE '^[A-TV-Z][0-9][A-Z0-9](\\\\.[A-Z0-9]{0,4})?$'",
             field_names=["diagnosis_code", "icd10", "*diagnosis*"],
             tags=["healthcare", "icd10", "diagnosis"]
         ))
@@ -246,18 +472,15 @@ class QualityEngine:
         
         def luhn_check(number_str: str) -> bool:
             """Validate using Luhn algorithm (for NPI, credit cards, etc.)"""
-            if not number_str or not number_str.isdigit():
+            if not number_str:
                 return False
                 
-            def digits_of(n):
-                return [int(d) for d in str(n)]
+            digits = number_str.encode()
+            if not digits.isdigit():
+                return False
                 
-            digits = digits_of(number_str)
-            odd_digits = digits[-1::-2]
-            even_digits = digits[-2::-2]
-            checksum = sum(odd_digits)
-            for d in even_digits:
-                checksum += sum(digits_of(d*2))
+            checksum = (sum(digits[-1::-2].translate(_LUHN_DIGIT_TABLE)) +
+                        sum(digits[-2::-2].translate(_LUHN_DOUBLED_TABLE)))
             return checksum % 10 == 0
             
         def standardize_phone(phone: str) -> str:
@@ -288,53 +511,76 @@ class QualityEngine:
         self.custom_functions['standardize_phone'] = standardize_phone
         self.custom_functions['validate_member_id'] = validate_member_id
         
+        # Make luhn_check(...), npi_check(...) and, with re2, match_patterns(...) in rule conditions
+        # resolve to the vectorized UDFs, reading their tables from a broadcast variable when one
+        # can be created. Without re2 a Python matcher would be slower than the built-in RLIKE rules
+        udfs = {'luhn_check': luhn_check_udf, 'npi_check': npi_check_udf}
+        if RE2_AVAILABLE:
+            udfs['match_patterns'] = match_patterns
+        try:
+            self._validation_tables, udfs = _broadcast_validation_udfs(self.spark)
+        except Exception as e:
+            logger.warning(f"Could not broadcast validation tables, UDFs will carry them: {str(e)}")
+            
+        for udf_name, udf in udfs.items():
+            try:
+                self.spark.udf.register(udf_name, udf)
+            except Exception as e:
+                logger.warning(f"Could not register {udf_name} UDF: {str(e)}")
+        
     def register_rule(self, rule: ValidationRule):
         """Register a quality rule"""
         self.rules_registry[rule.name] = rule
+        self._rule_index.add(rule.name, rule.field_names)
         logger.info(f"Registered quality rule: {rule.name}")
         
     def unregister_rule(self, rule_name: str):
         """Remove a quality rule"""
         if rule_name in self.rules_registry:
             del self.rules_registry[rule_name]
+            self._rule_index.remove(rule_name)
             logger.info(f"Unregistered quality rule: {rule_name}")
             
     def get_applicable_rules(self, field_name: str, data_type: str = None) -> List[ValidationRule]:
         """Get rules applicable to a specific field"""
-        applicable_rules = []
-        
-        for rule in self.rules_registry.values():
-            if not rule.enabled:
-                continue
-                
-            # Check if rule applies to this field
-            if self._rule_applies_to_field(rule, field_name, data_type):
-                applicable_rules.append(rule)
-                
-        return applicable_rules
+        matched = sorted(self._rule_index.match(field_name), key=self._rule_index.position)
+        return [self.rules_registry[name] for name in matched if self.rules_registry[name].enabled]
+        
+    def _filter_applicable_rules(
+        self,
+        rules: List[ValidationRule],
+        field_name: str,
+        data_type: str = None
+    ) -> List[ValidationRule]:
+        """Rules from rules that apply to a field; registered rules are looked up in the index"""
+        registered = self._rule_index.match(field_name)
+        return [rule for rule in rules
+                if (rule.name in registered if self.rules_registry.get(rule.name) is rule
+                    else self._rule_applies_to_field(rule, field_name, data_type))]
         
     def _rule_applies_to_field(self, rule: ValidationRule, field_name: str, data_type: str = None) -> bool:
         """Check if a rule applies to a specific field"""
         
+        field_name = field_name.lower()
         for pattern in rule.field_names:
             if pattern == "*":  # Applies to all fields
                 return True
             elif pattern.startswith("*") and pattern.endswith("*"):
                 # Contains pattern
                 search_term = pattern[1:-1].lower()
-                if search_term in field_name.lower():
+                if search_term in field_name:
                     return True
             elif pattern.startswith("*"):
                 # Ends with pattern
                 suffix = pattern[1:].lower()
-                if field_name.lower().endswith(suffix):
+                if field_name.endswith(suffix):
                     return True
             elif pattern.endswith("*"):
                 # Starts with pattern
                 prefix = pattern[:-1].lower()
-                if field_name.lower().startswith(prefix):
+                if field_name.startswith(prefix):
                     return True
-            elif pattern.lower() == field_name.lower():
+            elif pattern.lower() == field_name:
                 # Exact match
                 return True
                 
@@ -368,24 +614,36 @@ class QualityEngine:
         # Get table schema
         schema = df.schema
         
-        # Overall assessment results
-        assessment_results = {
-            'table_name': table_name,
-            'timestamp': datetime.now().isoformat(),
-            'record_count': df.count(),
-            'field_count': len(schema.fields),
-            'overall_score': 0.0,
-            'dimension_scores': {},
-            'field_results': {},
-            'rule_results': {},
-            'issues': [],
-            'recommendations': []
-        }
+        # Every field and rule scans the same data; keep it cached for the assessment
+        df = df.persist(StorageLevel.MEMORY_AND_DISK_DESER)
         
-        # Assess each field
-        for field in schema.fields:
-            field_results = self._assess_field_quality(df, field, all_rules)
-            assessment_results['field_results'][field.name] = field_results
+        try:
+            record_count = df.count()
+            
+            # Overall assessment results
+            assessment_results = {
+                'table_name': table_name,
+                'timestamp': datetime.now().isoformat(),
+                'record_count': record_count,
+                'field_count': len(schema.fields),
+                'overall_score': 0.0,
+                'dimension_scores': {},
+                'field_results': {},
+                'rule_results': {},
+                'issues': [],
+                'recommendations': []
+            }
+            
+            # Every field's null count and rule pass counts in one aggregation
+            field_rows = self._aggregate_fields(df, schema.fields, all_rules)
+            
+            # Assess each field
+            for field, field_row in zip(schema.fields, field_rows):
+                field_results = self._assess_field_quality(df, field, all_rules, record_count, field_row)
+                assessment_results['field_results'][field.name] = field_results
+                
+        finally:
+            df.unpersist()
             
         # Calculate dimension scores
         dimension_scores = self._calculate_dimension_scores(assessment_results['field_results'])
@@ -410,87 +668,110 @@ class QualityEngine:
         self, 
         df: DataFrame, 
         field: StructField, 
-        rules: List[ValidationRule]
+        rules: List[ValidationRule],
+        total_count: Optional[int] = None,
+        aggregates: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Assess quality of a specific field"""
+        """
+        Assess quality of a specific field
+        
+        total_count is the table's row count and aggregates the field's _field_aggregates
+        values, when the caller has already computed them
+        """
         
         field_name = field.name
         data_type = str(field.dataType)
         
         # Get applicable rules
-        applicable_rules = [rule for rule in rules if self._rule_applies_to_field(rule, field_name, data_type)]
+        applicable_rules = self._filter_applicable_rules(rules, field_name, data_type)
         
         # Basic field statistics
-        total_count = df.count()
-        null_count = df.filter(col(field_name).isNull()).count()
-        
+        if total_count is None:
+            total_count = df.count()
+            
         field_results = {
             'field_name': field_name,
             'data_type': data_type,
             'total_count': total_count,
-            'null_count': null_count,
-            'null_percentage': (null_count / total_count) * 100 if total_count > 0 else 0,
+            'null_count': 0,
+            'null_percentage': 0,
             'rule_results': {},
             'dimension_scores': {},
             'overall_field_score': 0.0
         }
         
-        # Apply each rule
-        for rule in applicable_rules:
-            try:
-                rule_result = self._apply_rule(df, field_name, rule)
-                field_results['rule_results'][rule.name] = rule_result
-            except Exception as e:
-                logger.error(f"Error applying rule {rule.name} to field {field_name}: {str(e)}")
+        try:
+            # Null count and every rule's pass count in a single aggregation
+            if aggregates is None:
+                aggregates = df.agg(*self._field_aggregates(field_name, applicable_rules)).collect()[0].asDict()
+            null_count = aggregates['null_count'] or 0
+            
+            for rule in applicable_rules:
+                passed_count = self._passed_count(rule, aggregates[f'rule__{rule.name}'], null_count, total_count)
+                if passed_count is None:
+                    passed_count = self._exact_unique_pass_count(df, field_name, total_count)
+                field_results['rule_results'][rule.name] = self._rule_result(
+                    rule, field_name, self._rule_condition(field_name, rule), passed_count, total_count
+                )
                 
+        except Exception as e:
+            # One failing condition fails the whole aggregation; fall back to evaluating rules
+            # one at a time so the others still get scored
+            logger.warning(f"Single-pass evaluation failed for field {field_name}, applying rules individually: {str(e)}")
+            null_count = df.filter(col(field_name).isNull()).count()
+            
+            for rule in applicable_rules:
+                try:
+                    rule_result = self._apply_rule(df, field_name, rule, total_count)
+                    field_results['rule_results'][rule.name] = rule_result
+                except Exception as e:
+                    logger.error(f"Error applying rule {rule.name} to field {field_name}: {str(e)}")
+                    
+        field_results['null_count'] = null_count
+        field_results['null_percentage'] = (null_count / total_count) * 100 if total_count > 0 else 0
+        
         # Calculate field-level dimension scores
         field_results['dimension_scores'] = self._calculate_field_dimension_scores(field_results['rule_results'])
         field_results['overall_field_score'] = self._calculate_field_overall_score(field_results['dimension_scores'])
         
         return field_results
         
-    def _apply_rule(self, df: DataFrame, field_name: str, rule: ValidationRule) -> QualityResult:
-        """Apply a validation rule to a field"""
-        
-        total_count = df.count()
+    def _apply_rule(
+        self,
+        df: DataFrame,
+        field_name: str,
+        rule: ValidationRule,
+        total_count: Optional[int] = None
+    ) -> QualityResult:
+        """Apply a validation rule to a field; total_count is the table's row count when already known"""
         
-        # Replace field_value placeholder in condition
-        condition = rule.condition.replace('field_value', field_name)
+        if total_count is None:
+            total_count = df.count()
         
-        # Handle custom functions in conditions
-        if 'luhn_check(' in condition:
-            # For now, we'll use a simplified approach
-            # In production, would register UDFs
-            condition = condition.replace('luhn_check(field_value)', 'TRUE')  # Placeholder
+        condition = self._rule_condition(field_name, rule)
             
         try:
             # Count records that pass the condition
-            if rule.dimension == QualityDimension.UNIQUENESS:
+            if rule.dimension == QualityDimension.UNIQUENESS and self._exact_uniqueness(rule):
                 # Special handling for uniqueness rules
                 unique_count = df.select(field_name).distinct().count()
                 passed_count = unique_count if unique_count == total_count else 0
+            elif rule.dimension == QualityDimension.UNIQUENESS:
+                # Streaming HyperLogLog estimate instead of a distinct shuffle
+                field = col(field_name)
+                counts = df.agg(
+                    approx_count_distinct(field, rsd=_UNIQUENESS_RSD).alias('unique_count'),
+                    spark_sum(when(field.isNull(), 1).otherwise(0)).alias('null_count')
+                ).collect()[0]
+                passed_count = self._passed_count(rule, counts['unique_count'], counts['null_count'] or 0,
+                                                  total_count)
+                if passed_count is None:
+                    passed_count = self._exact_unique_pass_count(df, field_name, total_count)
             else:
                 # Standard rule evaluation
                 passed_count = df.filter(condition).count()
                 
-            violation_count = total_count - passed_count
-            score = (passed_count / total_count) * 100 if total_count > 0 else 0
-            passed = violation_count == 0 or (rule.threshold and score >= rule.threshold)
-            
-            return QualityResult(
-                rule_name=rule.name,
-                dimension=rule.dimension,
-                severity=rule.severity,
-                passed=passed,
-                score=score,
-                violation_count=violation_count,
-                total_count=total_count,
-                details={
-                    'condition': condition,
-                    'field_name': field_name,
-                    'threshold': rule.threshold
-                }
-            )
+            return self._rule_result(rule, field_name, condition, passed_count, total_count)
             
         except Exception as e:
             logger.error(f"Error evaluating rule {rule.name}: {str(e)}")
@@ -505,6 +786,130 @@ class QualityEngine:
                 details={'error': str(e)}
             )
             
+    def _rule_condition(self, field_name: str, rule: ValidationRule) -> str:
+        """SQL condition of a rule with the field_value placeholder replaced"""
+        
+        # Replace field_value placeholder in condition; custom functions such as
+        # npi_check are registered as Spark UDFs by _register_custom_functions
+        return rule.condition.replace('field_value', field_name)
+        
+    def _aggregate_fields(
+        self,
+        df: DataFrame,
+        fields: List[StructField],
+        rules: List[ValidationRule]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Compute _field_aggregates for all fields in a single job
+        
+        Returns one aggregates dict per field, or Nones when the combined job fails so
+        each field is evaluated on its own.
+        """
+        
+        if not fields:
+            return []
+            
+        try:
+            aggregates = []
+            for index, field in enumerate(fields):
+                applicable_rules = self._filter_applicable_rules(rules, field.name, str(field.dataType))
+                aggregates.extend(self._field_aggregates(field.name, applicable_rules, prefix=f'f{index}__'))
+                
+            row = df.agg(*aggregates).collect()[0].asDict()
+            
+        except Exception as e:
+            logger.warning(f"Single-pass table evaluation failed, evaluating fields individually: {str(e)}")
+            return [None] * len(fields)
+            
+        field_rows = [{} for _ in fields]
+        for alias, value in row.items():
+            index, name = alias.split('__', 1)
+            field_rows[int(index[1:])][name] = value
+            
+        return field_rows
+        
+    def _field_aggregates(self, field_name: str, rules: List[ValidationRule], prefix: str = '') -> List[Column]:
+        """
+        Aggregate expressions for a field: 'null_count' plus one 'rule__<name>' column per rule
+        holding its pass count (distinct non-null count for uniqueness rules), aliased with prefix
+        """
+        
+        field = col(field_name)
+        aggregates = [spark_sum(when(field.isNull(), 1).otherwise(0)).alias(f'{prefix}null_count')]
+        
+        for rule in rules:
+            if rule.dimension == QualityDimension.UNIQUENESS and self._exact_uniqueness(rule):
+                aggregate = countDistinct(field)
+            elif rule.dimension == QualityDimension.UNIQUENESS:
+                aggregate = approx_count_distinct(field, rsd=_UNIQUENESS_RSD)
+            else:
+                aggregate = spark_sum(when(expr(self._rule_condition(field_name, rule)), 1).otherwise(0))
+            aggregates.append(aggregate.alias(f'{prefix}rule__{rule.name}'))
+            
+        return aggregates
+        
+    @staticmethod
+    def _exact_uniqueness(rule: ValidationRule) -> bool:
+        """Whether a uniqueness rule needs an exact distinct count rather than an estimate"""
+        return rule.severity == RuleSeverity.CRITICAL and rule.threshold is None
+        
+    @staticmethod
+    def _passed_count(rule: ValidationRule, aggregate: Optional[int], null_count: int,
+                      total_count: int) -> Optional[int]:
+        """
+        Pass count of a rule from its _field_aggregates value
+        
+        Uniqueness rules pass every row when the field is unique and none otherwise. An
+        approximate distinct count only decides that when it is more than two standard
+        errors away from the row count; otherwise None is returned and callers count exactly
+        """
+        
+        if rule.dimension == QualityDimension.UNIQUENESS:
+            # countDistinct skips nulls, distinct().count() counts them as one value
+            unique_count = (aggregate or 0) + (1 if null_count else 0)
+            if QualityEngine._exact_uniqueness(rule):
+                return unique_count if unique_count == total_count else 0
+                
+            if abs(unique_count - total_count) <= total_count * 2 * _UNIQUENESS_RSD:
+                return None
+            return 0
+            
+        return aggregate or 0
+        
+    @staticmethod
+    def _exact_unique_pass_count(df: DataFrame, field_name: str, total_count: int) -> int:
+        """Uniqueness pass count from an exact distinct count (nulls count as one value)"""
+        return total_count if df.select(field_name).distinct().count() == total_count else 0
+        
+    def _rule_result(
+        self,
+        rule: ValidationRule,
+        field_name: str,
+        condition: str,
+        passed_count: int,
+        total_count: int
+    ) -> QualityResult:
+        """Build the result of a rule from its pass count"""
+        
+        violation_count = total_count - passed_count
+        score = (passed_count / total_count) * 100 if total_count > 0 else 0
+        passed = violation_count == 0 or (rule.threshold and score >= rule.threshold)
+        
+        return QualityResult(
+            rule_name=rule.name,
+            dimension=rule.dimension,
+            severity=rule.severity,
+            passed=passed,
+            score=score,
+            violation_count=violation_count,
+            total_count=total_count,
+            details={
+                'condition': condition,
+                'field_name': field_name,
+                'threshold': rule.threshold
+            }
+        )
+        
     def _calculate_dimension_scores(self, field_results: Dict[str, Any]) -> Dict[str, float]:
         """Calculate quality scores by dimension across all fields"""
         
@@ -654,13 +1059,19 @@ class QualityEngine:
             
         return recommendations
         
-    def profile_data(self, df: DataFrame, field_names: List[str] = None) -> Dict[str, ProfileResult]:
+    def profile_data(
+        self,
+        df: DataFrame,
+        field_names: List[str] = None,
+        top_values: bool = True
+    ) -> Dict[str, ProfileResult]:
         """
         Generate comprehensive data profiling results
         
         Args:
             df: DataFrame to profile
             field_names: Specific fields to profile (None for all fields)
+            top_values: Whether to compute the 10 most frequent values per field
             
         Returns:
             Dictionary of profiling results by field name
@@ -670,77 +1081,168 @@ class QualityEngine:
             field_names = [field.name for field in df.schema.fields]
             
         profile_results = {}
-        total_count = df.count()
         
-        for field_name in field_names:
-            logger.info(f"Profiling field: {field_name}")
+        # Every field is profiled from the same data; keep it cached for the run
+        df = df.persist(StorageLevel.MEMORY_AND_DISK_DESER)
+        
+        try:
+            total_count = df.count()
+            field_types = dict(df.dtypes)
             
+            # Null, distinct and numeric stats for every field come from one aggregation
+            profiled_fields = [field_name for field_name in field_names if field_name in field_types]
             try:
-                field_type = dict(df.dtypes)[field_name]
-                
-                # Basic statistics
-                null_count = df.filter(col(field_name).isNull()).count()
-                null_percentage = (null_count / total_count) * 100 if total_count > 0 else 0
-                
-                unique_count = df.select(field_name).distinct().count()
-                uniqueness_percentage = (unique_count / total_count) * 100 if total_count > 0 else 0
+                field_stats = dict(zip(profiled_fields,
+                                       self._profile_aggregates(df, profiled_fields, field_types)))
+            except Exception as e:
+                logger.warning(f"Single-pass profiling failed, profiling fields individually: {str(e)}")
+                field_stats = {}
                 
-                profile = ProfileResult(
-                    field_name=field_name,
-                    data_type=field_type,
-                    null_count=null_count,
-                    null_percentage=null_percentage,
-                    unique_count=unique_count,
-                    uniqueness_percentage=uniqueness_percentage
-                )
+            field_top_values = {}
+            if top_values:
+                try:
+                    field_top_values = self._top_values(df, profiled_fields)
+                except Exception as e:
+                    logger.warning(f"Single-pass top values failed, computing fields individually: {str(e)}")
+            
+            for field_name in field_names:
+                logger.info(f"Profiling field: {field_name}")
                 
-                # Type-specific profiling
-                if field_type in ['int', 'bigint', 'float', 'double', 'decimal']:
-                    # Numeric profiling
-                    numeric_stats = df.select(
-                        spark_min(col(field_name)).alias('min_val'),
-                        spark_max(col(field_name)).alias('max_val'),
-                        avg(col(field_name)).alias('mean_val'),
-                        stddev(col(field_name)).alias('stddev_val')
-                    ).collect()[0]
+                try:
+                    field_type = field_types[field_name]
+                    stats = field_stats.get(field_name)
+                    if stats is None:
+                        stats = self._profile_aggregates(df, [field_name], field_types)[0]
                     
-                    profile.min_value = numeric_stats['min_val']
-                    profile.max_value = numeric_stats['max_val']
-                    profile.mean_value = float(numeric_stats['mean_val']) if numeric_stats['mean_val'] else None
-                    profile.stddev_value = float(numeric_stats['stddev_val']) if numeric_stats['stddev_val'] else None
+                    # Basic statistics
+                    null_count = stats['null_count'] or 0
+                    null_percentage = (null_count / total_count) * 100 if total_count > 0 else 0
                     
-                # Top values analysis
-                top_values = (df.groupBy(field_name)
-                            .count()
-                            .orderBy(col('count').desc())
-                            .limit(10)
-                            .collect())
-                
-                profile.top_values = [
-                    {'value': row[field_name], 'count': row['count']}
-                    for row in top_values
-                ]
-                
-                # Pattern analysis for string fields
-                if field_type == 'string':
-                    profile.pattern_analysis = self._analyze_patterns(df, field_name)
+                    # HyperLogLog estimate; unlike distinct().count() it skips nulls
+                    unique_count = (stats['unique_count'] or 0) + (1 if null_count else 0)
+                    uniqueness_percentage = (unique_count / total_count) * 100 if total_count > 0 else 0
                     
-                profile_results[field_name] = profile
-                
-            except Exception as e:
-                logger.error(f"Error profiling field {field_name}: {str(e)}")
-                # Create minimal profile with error
-                profile_results[field_name] = ProfileResult(
-                    field_name=field_name,
-                    data_type='unknown',
-                    null_count=0,
-                    null_percentage=0,
-                    unique_count=0,
-                    uniqueness_percentage=0
-                )
-                
+                    profile = ProfileResult(
+                        field_name=field_name,
+                        data_type=field_type,
+                        null_count=null_count,
+                        null_percentage=null_percentage,
+                        unique_count=unique_count,
+                        uniqueness_percentage=uniqueness_percentage
+                    )
+                    
+                    # Type-specific profiling
+                    if field_type in _NUMERIC_PROFILE_TYPES:
+                        profile.min_value = stats['min_val']
+                        profile.max_value = stats['max_val']
+                        profile.mean_value = float(stats['mean_val']) if stats['mean_val'] else None
+                        profile.stddev_value = float(stats['stddev_val']) if stats['stddev_val'] else None
+                        
+                    # Top values analysis
+                    if field_name in field_top_values:
+                        profile.top_values = field_top_values[field_name]
+                    elif top_values:
+                        top_rows = (df.groupBy(field_name)
+                                    .count()
+                                    .orderBy(col('count').desc())
+                                    .limit(10)
+                                    .collect())
+                        
+                        profile.top_values = [
+                            {'value': row[field_name], 'count': row['count']}
+                            for row in top_rows
+                        ]
+                    
+                    # Pattern analysis for string fields
+                    if field_type == 'string':
+                        profile.pattern_analysis = self._analyze_patterns(df, field_name)
+                        
+                    profile_results[field_name] = profile
+                    
+                except Exception as e:
+                    logger.error(f"Error profiling field {field_name}: {str(e)}")
+                    # Create minimal profile with error
+                    profile_results[field_name] = ProfileResult(
+                        field_name=field_name,
+                        data_type='unknown',
+                        null_count=0,
+                        null_percentage=0,
+                        unique_count=0,
+                        uniqueness_percentage=0
+                    )
+                    
+        finally:
+            df.unpersist()
+            
         return profile_results
         
+    def _profile_aggregates(
+        self,
+        df: DataFrame,
+        field_names: List[str],
+        field_types: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Null count, approximate distinct count and, for numeric fields, min/max/mean/stddev
+        of all fields in a single job, returned as one stats dict per field
+        """
+        
+        if not field_names:
+            return []
+            
+        aggregates = []
+        for index, field_name in enumerate(field_names):
+            prefix = f'f{index}__'
+            field = col(field_name)
+            aggregates.extend([
+                spark_sum(when(field.isNull(), 1).otherwise(0)).alias(f'{prefix}null_count'),
+                approx_count_distinct(field, rsd=0.02).alias(f'{prefix}unique_count')
+            ])
+            if field_types[field_name] in _NUMERIC_PROFILE_TYPES:
+                aggregates.extend([
+                    spark_min(field).alias(f'{prefix}min_val'),
+                    spark_max(field).alias(f'{prefix}max_val'),
+                    avg(field).alias(f'{prefix}mean_val'),
+                    stddev(field).alias(f'{prefix}stddev_val')
+                ])
+                
+        row = df.agg(*aggregates).collect()[0].asDict()
+        
+        field_rows = [{} for _ in field_names]
+        for alias, value in row.items():
+            index, name = alias.split('__', 1)
+            field_rows[int(index[1:])][name] = value
+            
+        return field_rows
+        
+    def _top_values(self, df: DataFrame, field_names: List[str], limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Most frequent values of all fields in a single job
+        
+        The fields are stacked into (field_index, value) pairs so one groupBy and a ranking
+        window replace a shuffle per field. Values are compared and returned as strings.
+        """
+        
+        if not field_names:
+            return {}
+            
+        pairs = ", ".join(f"{index}, CAST(`{field_name}` AS STRING)" for index, field_name in enumerate(field_names))
+        long_df = df.select(expr(f"stack({len(field_names)}, {pairs}) AS (field_index, value)"))
+        
+        rank_window = Window.partitionBy('field_index').orderBy(col('count').desc())
+        top_rows = (long_df.groupBy('field_index', 'value')
+                    .count()
+                    .withColumn('rank', row_number().over(rank_window))
+                    .filter(col('rank') <= limit)
+                    .orderBy('field_index', 'rank')
+                    .collect())
+        
+        field_top_values = {field_name: [] for field_name in field_names}
+        for row in top_rows:
+            field_top_values[field_names[row['field_index']]].append({'value': row['value'], 'count': row['count']})
+            
+        return field_top_values
+        
     def _analyze_patterns(self, df: DataFrame, field_name: str) -> Dict[str, Any]:
         """Analyze patterns in string fields"""
         
@@ -0,0 +1,45 @@
+"""
+Spark session configuration helpers shared by the quality agents
+"""
+
+from pyspark.sql import SparkSession
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+import threading
+
+ARROW_ENABLED_CONF = "spark.sql.execution.arrow.pyspark.enabled"
+
+# Active arrow_enabled blocks per session, with the setting to restore after the last one
+_arrow_lock = threading.Lock()
+_arrow_users: Dict[int, Tuple[int, Optional[str]]] = {}
+
+
+@contextmanager
+def arrow_enabled(spark: SparkSession) -> Iterator[None]:
+    """
+    Enable Arrow for pandas conversions inside the block, then restore the session's setting
+
+    Clusters from AdaptiveClusterManager enable Arrow in their Spark config; this covers
+    other sessions without changing the caller's configuration. Nested and concurrent
+    blocks on the same session restore the original value only when the last one exits.
+    """
+
+    key = id(spark)
+    with _arrow_lock:
+        users, previous = _arrow_users.get(key, (0, None))
+        if users == 0:
+            previous = spark.conf.get(ARROW_ENABLED_CONF, None)
+            spark.conf.set(ARROW_ENABLED_CONF, "true")
+        _arrow_users[key] = (users + 1, previous)
+
+    try:
+        yield
+    finally:
+        with _arrow_lock:
+            users, previous = _arrow_users.pop(key)
+            if users > 1:
+                _arrow_users[key] = (users - 1, previous)
+            elif previous is None:
+                spark.conf.unset(ARROW_ENABLED_CONF)
+            else:
+                spark.conf.set(ARROW_ENABLED_CONF, previous)
@@ -230,10 +230,9 @@ def check(ctx, table_name):
     config = ctx.obj['config']
     spark = get_spark_session()
     
-    quality_agent = DLTQualityAgent(spark, config)
-    
     click.echo(f"🔍 Running quality check on: {table_name}")
-    metrics = quality_agent.monitor_quality_metrics(table_name)
+    with DLTQualityAgent(spark, config) as quality_agent:
+        metrics = quality_agent.monitor_quality_metrics(table_name)
     
     if 'error' not in metrics:
         click.echo("✅ Data Quality Report:")
@@ -260,8 +259,6 @@ def alerts(ctx, table_name, min_quality, max_anomaly, max_stale):
     config = ctx.obj['config']
     spark = get_spark_session()
     
-    quality_agent = DLTQualityAgent(spark, config)
-    
     thresholds = {
         'min_quality_score': min_quality,
         'max_anomaly_percentage': max_anomaly,
@@ -269,7 +266,8 @@ def alerts(ctx, table_name, min_quality, max_anomaly, max_stale):
     }
     
     click.echo(f"🚨 Creating quality alerts for: {table_name}")
-    alerts = quality_agent.create_quality_alerts(table_name, thresholds)
+    with DLTQualityAgent(spark, config) as quality_agent:
+        alerts = quality_agent.create_quality_alerts(table_name, thresholds)
     
     if alerts and isinstance(alerts, list):
         if alerts:
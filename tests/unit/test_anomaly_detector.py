@@ -0,0 +1,274 @@
+"""
+Unit tests for the anomaly detection helpers
+"""
+
+import json
+import pytest
+import statistics
+from unittest.mock import Mock, patch
+import numpy as np
+import pandas as pd
+from pyspark.sql.types import StructType, StructField, DoubleType
+
+from src.agents.quality.anomaly_detector import (
+    RunningStats, MLAnomalyDetector, TemporalAnomalyDetector, AnomalySeverity, AnomalyType, AnomalyResult,
+    AnomalyDetails, AnomalyDetectionEngine, bucket_severity,
+    Z_SCORE_SEVERITY_THRESHOLDS, DBSCAN_SEVERITY_THRESHOLDS
+)
+
+
+class TestRunningStats:
+    """Unit tests for RunningStats class"""
+
+    def test_from_values_matches_two_pass(self):
+        """Test vectorized batch statistics against the statistics module"""
+        values = [1.0, 2.0, 3.5, 8.0, 9.0]
+        stats = RunningStats.from_values(np.array(values))
+
+        assert stats.count == 5
+        assert stats.mean == pytest.approx(statistics.mean(values))
+        assert stats.stddev == pytest.approx(statistics.stdev(values))
+
+    def test_merge_batches(self):
+        """Test combining statistics from several micro-batches"""
+        batches = [[1.0, 2.0, 3.5], [4.0, 5.0, 6.0, 100.0], [], [7.0]]
+        stats = RunningStats()
+        for batch in batches:
+            stats.merge(RunningStats.from_values(np.array(batch)))
+
+        values = [value for batch in batches for value in batch]
+        assert stats.count == 8
+        assert stats.mean == pytest.approx(statistics.mean(values))
+        assert stats.variance == pytest.approx(statistics.variance(values))
+
+    def test_empty_and_single_value(self):
+        """Test degenerate inputs"""
+        assert RunningStats().variance == 0.0
+        assert RunningStats.from_values(np.array([])).count == 0
+
+        stats = RunningStats.from_values(np.array([4.0]))
+        assert stats.mean == 4.0
+        assert stats.stddev == 0.0
+
+
+class TestSeasonalScoring:
+    """Unit tests for executor-side seasonal scoring"""
+
+    def test_partial_stats_per_batch(self):
+        """Test z-score lookup against dense baselines and partial statistics"""
+        avg_matrix = np.full((8, 24), np.nan)
+        stddev_matrix = np.full((8, 24), np.nan)
+        avg_matrix[2, 9], stddev_matrix[2, 9] = 100.0, 10.0
+        avg_matrix[3, 9], stddev_matrix[3, 9] = 50.0, 0.0
+
+        batch = pd.DataFrame({
+            'hour': [9, 9, 9, 9, 9, None],
+            'day_of_week': [2, 2, 2, 3, 4, 2],
+            'value': [130.0, 101.0, 60.0, 500.0, 500.0, 999.0]
+        })
+
+        partials = list(TemporalAnomalyDetector._seasonal_partial_stats(
+            iter([batch]), avg_matrix=avg_matrix, stddev_matrix=stddev_matrix
+        ))
+
+        assert len(partials) == 1
+        row = partials[0].iloc[0]
+        assert row['records'] == 6
+        assert row['count'] == 2      # z = 3.0 and 4.0; zero/unknown baselines ignored
+        assert row['mean'] == pytest.approx(3.5)
+
+
+class TestAnomalyDetails:
+    """Unit tests for the lazy anomaly details sequence"""
+
+    @staticmethod
+    def _anomaly(index):
+        return AnomalyResult(
+            anomaly_id=f"test_{index}",
+            anomaly_type=AnomalyType.STATISTICAL_OUTLIER,
+            severity=AnomalySeverity.LOW,
+            field_name='claim_amount',
+            description='test anomaly',
+            score=1.0,
+            affected_records=index,
+            threshold=3.0,
+            detection_method='z_score',
+            context={},
+            timestamp='2024-01-01T00:00:00',
+            recommendations=[]
+        )
+
+    def test_sequence_behaves_like_list_of_dicts(self):
+        """Test indexing, slicing and iteration"""
+        anomalies = [self._anomaly(i) for i in range(25)]
+        details = AnomalyDetails(anomalies)
+
+        assert len(details) == 25
+        assert details[3] == anomalies[3].to_dict()
+        assert [d['anomaly_id'] for d in details[:2]] == ['test_0', 'test_1']
+        assert sum(d['affected_records'] for d in details) == sum(range(25))
+        assert details.to_list() == [a.to_dict() for a in anomalies]
+        assert not AnomalyDetails([])
+
+    def test_engine_returns_list_unless_lazy(self):
+        """Test that anomaly_details is a plain list by default and lazy only on request"""
+        anomalies = [self._anomaly(i) for i in range(3)]
+        df = Mock()
+        df.persist.return_value.schema = StructType([StructField('amount', DoubleType())])
+
+        for config, expected_type in (({}, list), ({'lazy_anomaly_details': True}, AnomalyDetails)):
+            engine = AnomalyDetectionEngine(Mock(), config)
+            with patch.object(engine.statistical_detector, 'detect_fields', return_value=anomalies):
+                details = engine.detect_all_anomalies(df, 'metrics')['anomaly_details']
+
+            assert type(details) is expected_type
+            assert list(details) == [a.to_dict() for a in anomalies]
+            assert json.loads(json.dumps(list(details))) == list(details)
+
+
+class TestSeverityBucketing:
+    """Unit tests for threshold-based severity lookup"""
+
+    def test_thresholds_are_strict(self):
+        """Test that a value equal to a threshold stays in the lower level"""
+        assert bucket_severity(0.5, Z_SCORE_SEVERITY_THRESHOLDS) == AnomalySeverity.LOW
+        assert bucket_severity(1.0, Z_SCORE_SEVERITY_THRESHOLDS) == AnomalySeverity.LOW
+        assert bucket_severity(1.5, Z_SCORE_SEVERITY_THRESHOLDS) == AnomalySeverity.MEDIUM
+        assert bucket_severity(10.0, Z_SCORE_SEVERITY_THRESHOLDS) == AnomalySeverity.HIGH
+        assert bucket_severity(10.5, Z_SCORE_SEVERITY_THRESHOLDS) == AnomalySeverity.CRITICAL
+
+    def test_short_threshold_list(self):
+        """Test two-level methods"""
+        assert bucket_severity(5.0, DBSCAN_SEVERITY_THRESHOLDS) == AnomalySeverity.LOW
+        assert bucket_severity(6.0, DBSCAN_SEVERITY_THRESHOLDS) == AnomalySeverity.MEDIUM
+
+
+class TestMLAnomalyDetector:
+    """Unit tests for MLAnomalyDetector class"""
+
+    @pytest.fixture
+    def feature_df(self):
+        rng = np.random.default_rng(7)
+        return pd.DataFrame({
+            'claim_amount': rng.normal(200.0, 25.0, 300),
+            'units': rng.normal(3.0, 1.0, 300)
+        })
+
+    def test_isolation_forest_model_is_reused(self, feature_df):
+        """Test that a fitted model is cached per feature set"""
+        detector = MLAnomalyDetector()
+        fields = ['claim_amount', 'units']
+
+        detector.isolation_forest_detection(feature_df, fields)
+        model_key = (None, ('claim_amount', 'units'), 0.1)
+        assert model_key in detector.models
+        cached_model = detector.models[model_key]
+
+        with patch('src.agents.quality.anomaly_detector.IsolationForest') as forest_cls:
+            results = detector.isolation_forest_detection(feature_df, fields)
+            forest_cls.assert_not_called()
+
+        assert detector.models[model_key] is cached_model
+        assert len(results) == 1
+
+    def test_scale_features_shared_by_detectors(self, feature_df):
+        """Test that one scaled matrix can feed both detectors"""
+        detector = MLAnomalyDetector()
+        fields = ['claim_amount', 'units']
+
+        scaled = detector.scale_features(feature_df, fields)
+
+        assert scaled.shape == (300, 2)
+        assert scaled.dtype == np.float32
+        assert abs(float(scaled[:, 0].mean())) < 1e-3
+        assert list(detector.scalers) == [(None, ('claim_amount', 'units'))]
+
+        iso_results = detector.isolation_forest_detection(scaled, fields, prescaled=True)
+        dbscan_results = detector.dbscan_anomaly_detection(scaled[:, :1], fields[:1], prescaled=True)
+
+        assert iso_results[0].detection_method == 'isolation_forest'
+        assert all(r.detection_method == 'dbscan' for r in dbscan_results)
+
+    def test_insufficient_rows_skipped(self):
+        """Test that small inputs are not scored"""
+        detector = MLAnomalyDetector()
+        small_df = pd.DataFrame({'a': np.arange(50.0), 'b': np.arange(50.0)})
+
+        assert detector.isolation_forest_detection(small_df, ['a', 'b']) == []
+        assert detector.scalers == {}
+
+    def test_density_results_record_parameters_used(self, feature_df):
+        """Test that DBSCAN and HDBSCAN results report their own clustering parameters"""
+        detector = MLAnomalyDetector()
+        scaled = detector.scale_features(feature_df, ['claim_amount', 'units'])
+        scaled[:5] = 50.0  # A few far-away points are noise for either algorithm
+
+        with patch('src.agents.quality.anomaly_detector.HDBSCAN_AVAILABLE', False):
+            dbscan_result = detector.dbscan_anomaly_detection(scaled, ['claim_amount', 'units'], prescaled=True)[0]
+        assert dbscan_result.threshold == 0.5
+        assert dbscan_result.context['eps'] == 0.5
+
+        hdbscan_module = Mock()
+        hdbscan_module.HDBSCAN.return_value.fit_predict.return_value = np.where(np.arange(300) < 5, -1, 0)
+        with patch('src.agents.quality.anomaly_detector.HDBSCAN_AVAILABLE', True), \
+             patch('src.agents.quality.anomaly_detector.hdbscan', hdbscan_module, create=True):
+            hdbscan_result = detector.dbscan_anomaly_detection(scaled, ['claim_amount', 'units'], prescaled=True)[0]
+
+        hdbscan_module.HDBSCAN.assert_called_once_with(core_dist_n_jobs=-1, min_cluster_size=5)
+        assert hdbscan_result.threshold == 5.0
+        assert hdbscan_result.context['algorithm'] == 'hdbscan'
+        assert hdbscan_result.context['min_cluster_size'] == 5
+        assert 'eps' not in hdbscan_result.context
+
+    def test_ml_rows_dropped_per_detector(self, feature_df):
+        """Test that DBSCAN keeps rows that are only missing fields it does not cluster on"""
+        fields = ['claim_amount', 'units', 'days', 'paid', 'allowed']
+        features = feature_df.assign(days=1.0, paid=1.0, allowed=1.0)
+        features.loc[:99, 'allowed'] = np.nan
+
+        spark_df = Mock()
+        spark_df.select.return_value.dropna.return_value.toPandas.return_value = features
+        engine = AnomalyDetectionEngine(Mock(), {})
+
+        with patch.object(engine.ml_detector, 'isolation_forest_detection', return_value=[]) as forest, \
+             patch.object(engine.ml_detector, 'dbscan_anomaly_detection', return_value=[]) as dbscan:
+            engine._ml_anomalies(spark_df, fields, 'claims')
+
+        spark_df.select.return_value.dropna.assert_called_once_with(subset=fields[:3])
+        assert forest.call_args[0][0].shape == (200, 5)
+        assert dbscan.call_args[0][0].shape == (300, 3)
+        assert dbscan.call_args[0][1] == fields[:3]
+
+    def test_models_refit_on_drift_expiry_and_per_dataset(self, feature_df):
+        """Test that cached scalers and models are refit when they no longer fit the data"""
+        detector = MLAnomalyDetector(model_ttl_seconds=3600.0)
+        fields = ['claim_amount', 'units']
+        model_key = ('claims', ('claim_amount', 'units'), 0.1)
+
+        detector.isolation_forest_detection(feature_df, fields, dataset='claims')
+        first_scaler = detector.scalers[('claims', ('claim_amount', 'units'))]
+        first_model = detector.models[model_key]
+
+        # A different table gets its own scaler and model
+        detector.isolation_forest_detection(feature_df, fields, dataset='members')
+        assert detector.models[model_key] is first_model
+        assert ('members', ('claim_amount', 'units'), 0.1) in detector.models
+
+        # A shifted distribution refits both the scaler and the model
+        shifted_df = feature_df.assign(claim_amount=feature_df['claim_amount'] + 100.0)
+        detector.isolation_forest_detection(shifted_df, fields, dataset='claims')
+        assert detector.scalers[('claims', ('claim_amount', 'units'))] is not first_scaler
+        assert detector.models[model_key] is not first_model
+        assert abs(detector.scalers[('claims', ('claim_amount', 'units'))].mean_[0] - 300.0) < 10.0
+
+        # An unchanged distribution within the TTL reuses the model; an expired one refits
+        refit_model = detector.models[model_key]
+        detector.isolation_forest_detection(shifted_df, fields, dataset='claims')
+        assert detector.models[model_key] is refit_model
+
+        detector.model_ttl_seconds = 0.0
+        detector.isolation_forest_detection(shifted_df, fields, dataset='claims')
+        assert detector.models[model_key] is not refit_model
+
+        detector.invalidate('claims')
+        assert all(key[0] == 'members' for key in list(detector.models) + list(detector.scalers))
@@ -0,0 +1,236 @@
+"""
+Unit tests for the DLT Quality Agent
+"""
+
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from src.agents.quality.dlt_quality_agent import DLTQualityAgent
+
+
+class TestDLTQualityAgent:
+    """Unit tests for DLTQualityAgent class"""
+
+    @pytest.fixture
+    def agent(self):
+        return DLTQualityAgent(Mock(), {})
+
+    @pytest.fixture
+    def thresholds(self):
+        return {
+            'min_quality_score': 0.8,
+            'max_anomaly_percentage': 5.0,
+            'max_stale_percentage': 10.0
+        }
+
+    @staticmethod
+    def _metrics(avg_quality=0.9, anomaly_pct=1.0, stale_pct=2.0):
+        return {
+            'table_name': 'claims_silver',
+            'quality_metrics': {'avg_quality_score': avg_quality},
+            'anomaly_metrics': {'high_anomaly_percentage': anomaly_pct},
+            'freshness_metrics': {'stale_percentage': stale_pct}
+        }
+
+    def test_evaluate_alerts_from_metrics(self, agent, thresholds):
+        """Test threshold checks against precomputed metrics"""
+        assert agent.evaluate_quality_alerts(self._metrics(), thresholds) == []
+
+        alerts = agent.evaluate_quality_alerts(
+            self._metrics(avg_quality=0.5, anomaly_pct=12.0, stale_pct=40.0), thresholds
+        )
+
+        assert [a['alert_type'] for a in alerts] == ['low_quality_score', 'high_anomaly_rate', 'stale_data']
+        assert all(a['table_name'] == 'claims_silver' for a in alerts)
+        assert agent.spark.table.call_count == 0
+
+    def test_precomputed_metrics_skip_monitoring(self, agent, thresholds):
+        """Test that passing metrics avoids recomputing them"""
+        with patch.object(agent, 'monitor_quality_metrics') as monitor, \
+             patch.object(agent, '_store_quality_alerts') as store:
+            alerts = agent.create_quality_alerts('claims_silver', thresholds,
+                                                 metrics=self._metrics(avg_quality=0.5))
+
+            monitor.assert_not_called()
+            store.assert_called_once_with(alerts)
+            assert len(alerts) == 1
+
+    def test_metrics_reused_within_minute(self, agent, thresholds):
+        """Test that repeated alert checks reuse the same minute's metrics"""
+        with patch.object(agent, 'monitor_quality_metrics', return_value=self._metrics()) as monitor, \
+             patch('src.agents.quality.dlt_quality_agent.time.time', return_value=600.0):
+            agent.create_quality_alerts('claims_silver', thresholds)
+            agent.create_quality_alerts('claims_silver', thresholds)
+
+            assert monitor.call_count == 1
+
+    def test_recent_metrics_skip_failures_and_return_copies(self, agent):
+        """Test that failed lookups are retried and cached metrics cannot be mutated by callers"""
+        failure = {'error': 'table not found', 'table_name': 'claims_silver'}
+        with patch.object(agent, 'monitor_quality_metrics', side_effect=[failure, self._metrics()]) as monitor, \
+             patch('src.agents.quality.dlt_quality_agent.time.time', return_value=600.0):
+            assert agent._recent_quality_metrics('claims_silver') == failure
+
+            first = agent._recent_quality_metrics('claims_silver')
+            first['quality_metrics']['avg_quality_score'] = 0.0
+            second = agent._recent_quality_metrics('claims_silver')
+
+            assert monitor.call_count == 2
+            assert second['quality_metrics']['avg_quality_score'] == 0.9
+
+        # A new minute recomputes, which stores the metrics again
+        with patch.object(agent, 'monitor_quality_metrics', return_value=self._metrics()) as monitor, \
+             patch('src.agents.quality.dlt_quality_agent.time.time', return_value=660.0):
+            agent._recent_quality_metrics('claims_silver')
+            monitor.assert_called_once_with('claims_silver')
+
+    def test_metrics_writes_are_buffered(self):
+        """Test that metrics are appended in batches of metrics_buffer_size"""
+        agent = DLTQualityAgent(Mock(), {'metrics_buffer_size': 3})
+
+        for _ in range(2):
+            agent._store_quality_metrics(self._metrics())
+        agent.spark.createDataFrame.assert_not_called()
+
+        agent._store_quality_metrics(self._metrics())
+        assert agent.spark.createDataFrame.call_count == 1
+        assert len(agent.spark.createDataFrame.call_args[0][0]) == 3
+        assert agent._metrics_buffer == []
+
+        agent._store_quality_metrics(self._metrics())
+        agent.flush_quality_metrics()
+        assert agent.spark.createDataFrame.call_count == 2
+
+    def test_monitoring_tables_created_only_when_missing(self, agent):
+        """Test that existing metrics tables are not altered and clustering is gated on Delta"""
+        agent.spark.catalog.tableExists.return_value = True
+        agent._ensure_quality_metrics_table()
+        agent.spark.sql.assert_not_called()
+
+        agent = DLTQualityAgent(Mock(), {})
+        agent.spark.catalog.tableExists.return_value = False
+        with patch('src.agents.quality.dlt_quality_agent.delta_supports_clustering', return_value=False):
+            agent._ensure_quality_metrics_table()
+
+        create, properties = [c[0][0] for c in agent.spark.sql.call_args_list]
+        assert 'CREATE TABLE IF NOT EXISTS' in create and 'CLUSTER BY' not in create
+        assert "'delta.dataSkippingStatsColumns' = 'table_name,timestamp,event_date'" in properties
+
+    def test_dashboard_filters_legacy_metrics_on_timestamp(self, agent):
+        """Test that metrics tables without event_date are filtered on the timestamp"""
+        agent.spark.table.return_value.columns = ['table_name', 'timestamp', 'quality_metrics']
+        with patch('src.agents.quality.dlt_quality_agent.col') as col_fn, \
+             patch('src.agents.quality.dlt_quality_agent.lit'), \
+             patch('src.agents.quality.dlt_quality_agent.date_sub'), \
+             patch('src.agents.quality.dlt_quality_agent.current_date'), \
+             patch.object(agent, '_to_records', return_value=[]):
+            col_fn.return_value.__ge__.return_value = MagicMock()
+            result = agent.get_quality_dashboard_data('claims_silver')
+
+        assert 'error' not in result
+        assert 'event_date' not in [c[0][0] for c in col_fn.call_args_list]
+
+    def test_failed_metrics_write_keeps_buffer(self):
+        """Test that metrics survive a failed write and are flushed when the agent exits"""
+        with DLTQualityAgent(Mock(), {'metrics_buffer_size': 10}) as agent:
+            agent.spark.createDataFrame.side_effect = [RuntimeError('table locked'), Mock()]
+            agent._store_quality_metrics(self._metrics())
+            agent.flush_quality_metrics()
+            assert len(agent._metrics_buffer) == 1
+
+            agent._store_quality_metrics(dict(self._metrics(), table_name='members'))
+
+        assert agent._metrics_buffer == []
+        records = agent.spark.createDataFrame.call_args[0][0]
+        assert [r['table_name'] for r in records] == ['claims_silver', 'members']
+
+    def test_batch_alerts_match_per_table_alerts(self, agent, thresholds):
+        """Test vectorized alerting against the per-table evaluation"""
+        metrics_list = [
+            dict(self._metrics(avg_quality=0.5, stale_pct=40.0), table_name='claims'),
+            dict(self._metrics(), table_name='members'),
+            dict(self._metrics(anomaly_pct=12.0), table_name='providers')
+        ]
+
+        with patch.object(agent, '_store_quality_alerts') as store:
+            batch = agent.create_quality_alerts_batch(metrics_list, thresholds)
+            store.assert_called_once()
+
+        expected = [
+            {k: v for k, v in alert.items() if k != 'timestamp'}
+            for metrics in metrics_list
+            for alert in agent.evaluate_quality_alerts(metrics, thresholds)
+        ]
+        assert batch.drop(columns='timestamp').to_dict(orient='records') == expected
+
+    def test_batch_alerts_skip_missing_scores(self, agent, thresholds):
+        """Test that tables without a quality score neither raise nor alert"""
+        metrics_list = [
+            dict(self._metrics(avg_quality=None), table_name='claims'),
+            dict(self._metrics(avg_quality=float('nan'), stale_pct=None), table_name='members'),
+            dict(self._metrics(avg_quality=0.5), table_name='providers')
+        ]
+
+        with patch.object(agent, '_store_quality_alerts'):
+            batch = agent.create_quality_alerts_batch(metrics_list, thresholds)
+            all_missing = agent.create_quality_alerts_batch(metrics_list[:1], thresholds)
+
+        assert batch[['alert_type', 'table_name']].values.tolist() == [['low_quality_score', 'providers']]
+        assert batch['message'].tolist() == ['Average quality score 0.50 below threshold 0.8']
+        assert all_missing.empty
+
+    def test_validate_row(self, agent):
+        """Test Python-side format validation with the precompiled patterns"""
+        valid = agent.validate_row({
+            'member_id': 'CA123456789',
+            'provider_npi': '1234567893',
+            'diagnosis_code': 'E11.9',
+            'procedure_code': 'J1234'
+        })
+        assert all(valid.values())
+
+        invalid = agent.validate_row({
+            'member_id': '12345',
+            'provider_npi': '0000000000',
+            'diagnosis_code': None,
+            'procedure_code': 'Z1234'
+        })
+        assert not any(invalid.values())
+
+    def test_combined_validation_includes_every_rule(self, agent):
+        """Test that the single silver expectation ANDs all format rules"""
+        combined = agent._combined_validation()
+        rules = agent._format_expectations()
+
+        assert len(rules) == 6
+        assert combined.count(') AND (') == len(rules) - 1
+        assert all(rule in combined for rule in rules.values())
+
+    def test_duplicate_claims_dropped_only_when_enabled(self, agent):
+        """Test opt-in in-stream deduplication and its Spark 3.4 fallback"""
+        df = Mock()
+        assert agent._drop_duplicate_claims(df) is df
+
+        agent.drop_duplicate_claims = True
+        with patch.object(agent, '_duplicate_claim_key'):
+            deduped = agent._drop_duplicate_claims(df)
+
+            legacy_df = Mock(spec=['withColumn', 'withWatermark', 'dropDuplicates'])
+            assert agent._drop_duplicate_claims(legacy_df) is legacy_df
+
+        watermarked = df.withColumn.return_value.withWatermark.return_value
+        watermarked.dropDuplicatesWithinWatermark.assert_called_once_with(['_dup_key'])
+        watermarked.dropDuplicatesWithinWatermark.return_value.drop.assert_called_once_with('_dup_key')
+        assert deduped is watermarked.dropDuplicatesWithinWatermark.return_value.drop.return_value
+
+    def test_duplicate_claim_check_is_bounded(self):
+        """Test that the silver duplicate probe only scans the lookback window of the target table"""
+        agent = DLTQualityAgent(Mock(), {'duplicate_lookback_days': 45,
+                                         'claims_month_partition_column': 'service_month'})
+
+        check = agent._validate_duplicate_claims('healthcare.claims_silver')
+
+        assert 'FROM healthcare.claims_silver c2' in check
+        assert 'c2.member_id = healthcare.claims_silver.member_id' in check
+        assert 'current_date() - interval 45 days' in check
+        assert "c2.service_month >= date_format(date_sub(current_date(), 45), 'yyyyMM')" in check
@@ -0,0 +1,216 @@
+"""
+Unit tests for healthcare-specific validation rules
+"""
+
+import pytest
+from datetime import datetime
+import pandas as pd
+
+from src.agents.quality.healthcare_expectations import HealthcareExpectations, ValidationResult, ValidationErrorCode
+
+
+class TestHealthcareExpectations:
+    """Unit tests for HealthcareExpectations class"""
+
+    @pytest.fixture
+    def expectations(self):
+        return HealthcareExpectations({})
+
+    def test_member_id_formats(self, expectations):
+        """Test Medicaid and Medicare member ID patterns"""
+        for member_id in ['123456789', '123456789012', 'CA123456789', 'AB12345678C', '123456789A', ' a12345678b ']:
+            assert expectations.validate_member_id(member_id)['valid'], member_id
+
+        for member_id in ['12345', 'INVALID', '', None]:
+            assert not expectations.validate_member_id(member_id)['valid'], member_id
+
+    def test_member_id_program(self, expectations):
+        """Test that the matched ID family is reported"""
+        assert expectations.validate_member_id('CA123456789')['program'] == 'medicaid'
+        assert expectations.validate_member_id('A12345678B')['program'] == 'medicare'
+
+    def test_diagnosis_codes(self, expectations):
+        """Test ICD-10 and legacy ICD-9 diagnosis codes"""
+        assert expectations.validate_icd10_diagnosis('E11.9')['format'] == 'icd10'
+        assert expectations.validate_icd10_diagnosis('z99.89')['clean_value'] == 'Z99.89'
+
+        icd9 = expectations.validate_icd10_diagnosis('250.00')
+        assert icd9['format'] == 'icd9' and 'warning' in icd9
+
+        for code in ['U07.1', 'E1', 'E11.', 'E11.12345', 'FOO']:
+            assert not expectations.validate_icd10_diagnosis(code)['valid'], code
+
+    def test_hcpcs_and_taxonomy_codes(self, expectations):
+        """Test HCPCS letter exclusions and taxonomy format"""
+        assert expectations.validate_hcpcs_procedure('j1234')['valid']
+        for code in ['I1234', 'O1234', 'W1234', 'A123']:
+            assert not expectations.validate_hcpcs_procedure(code)['valid'], code
+
+        assert expectations.validate_provider_taxonomy('207q00000x')['clean_value'] == '207Q00000X'
+        assert not expectations.validate_provider_taxonomy('207Q0000-X')['valid']
+
+    def test_validate_columns_matches_validate_record(self, expectations):
+        """Test vectorized batch validation against per-record validation"""
+        records = pd.DataFrame({
+            'member_id': ['123456789', 'bad', None, 'CA123456789'],
+            'provider_npi': ['1234567893', '123-456-7893', '0000000000', 1234567893],
+            'diagnosis_code': ['E11.9', '250.00', 'U07.1', 'i10'],
+            'procedure_code': ['99213', '00099', '9921', '00100'],
+            'date_of_service': ['2024-01-15', '01/15/2024', 'bad', None],
+            'claim_amount': ['$1,234.50', -5, 0, None],
+            'place_of_service': ['11', '0', 'ab', 1]
+        })
+        schema = expectations.get_default_medicaid_schema()
+
+        masks = expectations.validate_columns(records, schema)
+
+        assert list(masks.columns) == list(schema)
+        for index, record in enumerate(records.to_dict(orient='records')):
+            record = {k: (None if pd.isna(v) else v) for k, v in record.items()}
+            field_results = expectations.validate_record(record, schema)['field_results']
+            for field_name in schema:
+                assert masks[field_name].iloc[index] == field_results[field_name]['valid'], (index, field_name)
+
+    def test_validator_results_are_memoized(self, expectations):
+        """Test that repeated values are served from the validator caches"""
+        for _ in range(3):
+            expectations.validate_record({'provider_npi': '1234567893', 'place_of_service': '11'},
+                                         {'provider_npi': 'npi', 'place_of_service': 'place_of_service'})
+
+        stats = expectations.get_cache_stats()
+        assert stats['npi']['hits'] == 2 and stats['npi']['misses'] == 1
+        assert 'date_of_service' not in stats and 'date_parse' in stats
+
+        # Equal values of different types are cached separately; unhashable ones bypass the cache
+        assert expectations.validation_rules['place_of_service'](1)['valid']
+        assert not expectations.validation_rules['place_of_service'](True)['valid']
+        assert not expectations.validation_rules['member_id'](['123456789'])['valid']
+
+    def test_memoized_results_are_not_shared(self, expectations):
+        """Test that modifying a returned result does not change later cached results"""
+        schema = {'provider_npi': 'npi'}
+        result = expectations.validate_record({'provider_npi': '1234567893'}, schema)
+        result['field_results']['provider_npi']['valid'] = False
+
+        again = expectations.validate_record({'provider_npi': '1234567893'}, schema)
+        assert again['field_results']['provider_npi']['valid']
+        assert expectations.get_cache_stats()['npi']['hits'] == 1
+
+    def test_service_date_formats_and_reference_time(self, expectations):
+        """Test the accepted date shapes and a caller-supplied reference time"""
+        for value in ['2024-01-15', '01/15/2024', '20240115', '2024-1-5', '1/5/2024']:
+            assert expectations.validate_service_date(value)['valid'], value
+
+        for value in ['2024-02-30', '13/01/2024', '2024/01/15', '2019-12-31']:
+            assert not expectations.validate_service_date(value)['valid'], value
+
+        today = datetime(2024, 1, 10)
+        assert expectations.validate_service_date('2024-01-10', today=today)['valid']
+        assert not expectations.validate_service_date('2024-01-15', today=today)['valid']
+
+    def test_fast_validation_matches_detailed(self, expectations):
+        """Test the pass/fail mode against the detailed record results"""
+        schema = dict(expectations.get_default_medicaid_schema(), admission_date='admission_date',
+                      discharge_date='discharge_date')
+        records = [
+            {'member_id': '123456789', 'provider_npi': '1234567893', 'diagnosis_code': 'E11.9',
+             'procedure_code': '99213', 'date_of_service': '2024-01-15', 'claim_amount': 150.0,
+             'place_of_service': '11', 'admission_date': '2024-01-10', 'discharge_date': '2024-01-20'},
+            {'member_id': 'bad', 'provider_npi': '123', 'admission_date': '2024-01-20',
+             'discharge_date': '2024-01-10', 'date_of_service': '2024-01-15'}
+        ]
+
+        for record in records:
+            detailed = expectations.validate_record(record, schema)
+            fast = expectations.validate_record(record, schema, collect_details=False)
+
+            assert fast['valid'] == detailed['valid']
+            assert fast['invalid_fields'] == [
+                field for field, result in detailed['field_results'].items() if not result['valid']
+            ]
+
+        assert expectations.validate_fast('member_id', 'CA123456789')
+        assert not expectations.validate_fast('unknown_rule', 'x')
+
+    def test_npi_luhn_uses_80840_prefix(self, expectations):
+        """Test NPI check digits computed over the 80840-prefixed number"""
+        for npi in ['1234567893', '1679576722', '123-456-7893']:
+            assert expectations.validate_npi(npi)['valid'], npi
+
+        for npi in ['1234567890', '1234567897', '0000000000', '123456789']:
+            assert not expectations.validate_npi(npi)['valid'], npi
+
+    def test_cross_field_dates_use_parsed_values(self, expectations):
+        """Test admission/discharge checks against parsed related dates"""
+        service = expectations.validate_service_date('01/15/2024')
+        assert service['clean_value_dt'] == datetime(2024, 1, 15)
+
+        assert not expectations.validate_admission_date('2024-01-20', service['clean_value_dt'])['valid']
+        assert expectations.validate_discharge_date('2024-01-20', datetime(2024, 1, 10))['valid']
+
+        result = expectations.validate_record(
+            {'date_of_service': '2024-01-15', 'admission_date': '2024-01-10', 'discharge_date': '2024-01-05'},
+            {'date_of_service': 'date_of_service', 'admission_date': 'admission_date',
+             'discharge_date': 'discharge_date'}
+        )
+        assert result['field_results']['admission_date']['valid']
+        assert result['errors'] == ['discharge_date: Discharge date cannot be before admission date']
+
+    def test_default_schemas_are_independent_copies(self, expectations):
+        """Test that extending a returned default schema does not change later ones"""
+        schema = expectations.get_default_medicare_schema()
+        schema['member_id'] = 'npi'
+
+        assert HealthcareExpectations({}).get_default_medicare_schema()['member_id'] == 'member_id'
+        assert expectations.get_default_medicare_schema()['member_id'] == 'member_id'
+
+        extended = dict(expectations.get_default_medicaid_schema(), foo='unknown_rule')
+        result = expectations.validate_record({'member_id': '123456789'}, extended)
+        assert 'Unknown validation rule: unknown_rule' in result['errors']
+
+    def test_compiled_schema_matches_dict_schema(self, expectations):
+        """Test validating against a compiled schema"""
+        schema = dict(expectations.get_default_medicaid_schema(), admission_date='admission_date',
+                      discharge_date='discharge_date', foo='unknown_rule')
+        compiled = expectations.compile_schema(schema)
+
+        assert [entry[0] for entry in compiled] == list(schema)
+        assert compiled[-1][2] is None
+        assert dict((entry[0], entry[3]) for entry in compiled)['discharge_date'] == 'admission_date'
+
+        record = {'member_id': 'bad', 'date_of_service': '2024-01-15', 'admission_date': '2024-01-20',
+                  'discharge_date': '2024-01-25'}
+        assert expectations.validate_record(record, compiled) == expectations.validate_record(record, schema)
+        assert expectations.validate_record(record, compiled, collect_details=False) == \
+            expectations.validate_record(record, schema, collect_details=False)
+
+    def test_validate_records_returns_slotted_results(self, expectations):
+        """Test batch validation results against validate_record"""
+        schema = dict(expectations.get_default_medicaid_schema(), foo='unknown_rule')
+        records = [
+            {'member_id': '123456789', 'provider_npi': '1234567893', 'claim_amount': 0},
+            {'member_id': 'bad', 'provider_npi': ['1234567893']}
+        ]
+
+        results = expectations.validate_records(records, schema)
+
+        assert all(isinstance(result, ValidationResult) for result in results)
+        assert not hasattr(results[0], '__dict__')
+        assert [r.to_dict() for r in results] == [expectations.validate_record(r, schema) for r in records]
+        assert 'foo' not in results[0].field_results
+
+    def test_record_soa_error_codes(self, expectations):
+        """Test per-field validity and error code arrays"""
+        schema = {'member_id': 'member_id', 'provider_npi': 'npi', 'claim_amount': 'claim_amount',
+                  'place_of_service': 'place_of_service', 'foo': 'unknown_rule'}
+        record = {'member_id': '123456789', 'provider_npi': '1234567890', 'claim_amount': -5}
+
+        valid, field_valid, error_codes = expectations.validate_record_soa(record, schema)
+
+        assert not valid and not expectations.validate_record(record, schema)['valid']
+        assert field_valid.tolist() == [True, False, False, False, False]
+        assert error_codes.dtype == 'int16'
+        assert error_codes.tolist() == [
+            ValidationErrorCode.OK, ValidationErrorCode.CHECKSUM, ValidationErrorCode.INVALID_VALUE,
+            ValidationErrorCode.MISSING, ValidationErrorCode.UNKNOWN_RULE
+        ]
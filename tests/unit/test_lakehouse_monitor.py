@@ -0,0 +1,376 @@
+"""
+Unit tests for the Lakehouse Monitor
+"""
+
+import pytest
+import threading
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyspark.sql.types import StructType, StructField, StringType, TimestampType
+
+from src.agents.quality.lakehouse_monitor import LakehouseMonitor, DRIFT_ALERT_SCHEMA, validate_healthcare_codes
+
+
+class TestLakehouseMonitor:
+    """Unit tests for LakehouseMonitor class"""
+
+    @pytest.fixture
+    def monitor(self):
+        return LakehouseMonitor(Mock(), Mock(), {})
+
+    @staticmethod
+    def _metrics(*drift_scores):
+        return {
+            'monitor_name': 'claims_monitor',
+            'metrics': [
+                {'column_name': f'col_{i}', 'drift_score': score, 'js_divergence': 0.01,
+                 'null_percentage': 1.0, 'window_start': None, 'window_end': None}
+                for i, score in enumerate(drift_scores)
+            ],
+            'profile': [],
+            'status': 'success'
+        }
+
+    def test_drift_uses_prefetched_metrics(self, monitor):
+        """Test that passing metrics skips the metrics query"""
+        with patch.object(monitor, 'get_monitor_metrics') as get_metrics, \
+             patch.object(monitor, '_store_drift_alerts'):
+            drift = monitor.detect_data_drift('claims_monitor', metrics=self._metrics(0.05, 0.4, 0.7))
+
+            get_metrics.assert_not_called()
+
+        assert drift['total_drift_columns'] == 2
+        assert [a['severity'] for a in drift['drift_alerts']] == ['medium', 'high']
+
+    @pytest.fixture
+    def spark_functions(self):
+        column = MagicMock()
+        column.return_value.__ge__.return_value = 'window_condition'
+        condition = MagicMock()
+        condition.return_value.__gt__.return_value = MagicMock()
+        with patch('src.agents.quality.lakehouse_monitor.col', column), \
+             patch('src.agents.quality.lakehouse_monitor.lit') as lit, \
+             patch('src.agents.quality.lakehouse_monitor.when', condition), \
+             patch('src.agents.quality.lakehouse_monitor.current_date'), \
+             patch('src.agents.quality.lakehouse_monitor.date_sub') as date_sub, \
+             patch('src.agents.quality.lakehouse_monitor.count'), \
+             patch('src.agents.quality.lakehouse_monitor.avg'), \
+             patch('src.agents.quality.lakehouse_monitor.spark_sum'), \
+             patch('src.agents.quality.lakehouse_monitor.spark_max'):
+            yield {'col': column, 'lit': lit, 'date_sub': date_sub}
+
+    def test_dashboard_fetches_metrics_once(self, monitor, spark_functions):
+        """Test that the dashboard reuses its metrics for drift detection"""
+        alerts_df = monitor.spark.table.return_value.where.return_value.where.return_value.orderBy.return_value
+        alerts_df.toPandas.return_value = pd.DataFrame()
+
+        with patch.object(monitor, 'get_monitor_metrics', return_value=self._metrics(0.2)) as get_metrics, \
+             patch.object(monitor, '_store_drift_alerts'):
+            dashboard = monitor.get_monitor_dashboard_data('claims_monitor', days=7)
+
+        assert get_metrics.call_count == 1
+        assert dashboard['current_drift']['total_drift_columns'] == 1
+
+    def test_queries_bind_values_as_literals(self, monitor, spark_functions):
+        """Test that monitor names and periods are passed as literals, not SQL text"""
+        metrics_df = monitor.spark.table.return_value.where.return_value.select.return_value.orderBy.return_value
+        metrics_df.toPandas.return_value = pd.DataFrame()
+        metrics_df.agg.return_value.first.return_value.asDict.return_value = {'total_columns': 0}
+        alerts_df = monitor.spark.table.return_value.where.return_value.where.return_value.orderBy.return_value
+        alerts_df.toPandas.return_value = pd.DataFrame()
+        monitor_name = "claims' OR '1'='1"
+
+        dashboard = monitor.get_monitor_dashboard_data(monitor_name, days='7')
+
+        assert dashboard['status'] == 'success'
+        monitor.spark.sql.assert_not_called()
+        spark_functions['lit'].assert_any_call(monitor_name)
+        assert spark_functions['date_sub'].call_args[0][1] == 7
+
+    def test_drift_threshold_applied_in_spark(self, monitor):
+        """Test that without prefetched metrics only rows above the threshold are collected"""
+        drift_df = monitor.spark.table.return_value.where.return_value
+        drift_df.select.return_value.orderBy.return_value.toPandas.return_value = pd.DataFrame([
+            {'window_start': None, 'window_end': None, 'column_name': 'claim_amount',
+             'drift_score': 0.6, 'js_divergence': np.nan}
+        ])
+
+        column = MagicMock()
+        column.return_value.__gt__.return_value = 'drift_condition'
+
+        with patch('src.agents.quality.lakehouse_monitor.col', column), \
+             patch('src.agents.quality.lakehouse_monitor.lit') as lit, \
+             patch.object(monitor, '_store_drift_alerts'):
+            drift = monitor.detect_data_drift('claims_monitor', drift_threshold=0.25)
+
+        lit.assert_called_once_with(0.25)
+        monitor.spark.table.return_value.where.assert_called_once_with('drift_condition')
+        assert drift['drift_alerts'][0]['column_name'] == 'claim_amount'
+        assert drift['drift_alerts'][0]['severity'] == 'high'
+        assert drift['drift_alerts'][0]['js_divergence'] is None
+
+    def test_monitor_summary(self, monitor):
+        """Test summary statistics, ignoring missing and zero values"""
+        metrics = self._metrics(0.05, 0.4, 0.7, None, 0.0)['metrics']
+        metrics[0]['null_percentage'] = None
+
+        summary = monitor._calculate_monitor_summary(metrics)
+
+        assert summary['total_columns'] == 5
+        assert summary['avg_drift_score'] == pytest.approx((0.05 + 0.4 + 0.7) / 3)
+        assert summary['max_drift_score'] == 0.7
+        assert summary['avg_null_percentage'] == 1.0
+        assert (summary['columns_with_drift'], summary['high_drift_columns']) == (2, 1)
+        assert monitor._calculate_monitor_summary([]) == {"total_columns": 0, "avg_drift_score": 0}
+
+    def test_dashboard_unpersists_metrics(self, monitor):
+        """Test that the cached metrics DataFrame is released even when the dashboard fails"""
+        metrics_df = Mock()
+        metrics = dict(self._metrics(0.2), metrics_df=metrics_df)
+
+        with patch.object(monitor, 'get_monitor_metrics', return_value=metrics) as get_metrics, \
+             patch.object(monitor, 'detect_data_drift', side_effect=RuntimeError('boom')):
+            dashboard = monitor.get_monitor_dashboard_data('claims_monitor')
+
+        assert get_metrics.call_args[1]['persist'] is True
+        assert dashboard['error'] == 'boom'
+        metrics_df.unpersist.assert_called_once()
+
+    def test_failed_metrics_query_unpersists(self, monitor):
+        """Test that a persisted metrics DataFrame is released when the metrics query fails"""
+        with patch('src.agents.quality.lakehouse_monitor.col'), \
+             patch.object(monitor, '_get_monitor_info'), \
+             patch.object(monitor, '_to_records', side_effect=RuntimeError('arrow failure')):
+            result = monitor.get_monitor_metrics('claims_monitor', persist=True)
+
+        metrics_df = monitor.spark.table.return_value.select.return_value.orderBy.return_value
+        assert result['error'] == 'arrow failure'
+        metrics_df.persist.assert_called_once()
+        metrics_df.unpersist.assert_called_once()
+
+    def test_store_drift_alerts_uses_explicit_schema(self, monitor):
+        """Test that alerts are written in one batch with the drift alert schema"""
+        alerts = [{'column_name': 'claim_amount', 'drift_score': 0.6}, {'column_name': 'member_id', 'drift_score': 0.2}]
+
+        monitor._store_drift_alerts('claims_monitor', alerts)
+
+        rows = monitor.spark.createDataFrame.call_args[0][0]
+        assert monitor.spark.createDataFrame.call_args[1]['schema'] is DRIFT_ALERT_SCHEMA
+        assert [row['monitor_name'] for row in rows] == ['claims_monitor'] * 2
+        assert isinstance(rows[0]['timestamp'], datetime) and rows[0]['timestamp'] == rows[1]['timestamp']
+        assert isinstance(DRIFT_ALERT_SCHEMA['timestamp'].dataType, TimestampType)
+        assert 'monitor_name' not in alerts[0]
+
+    def test_summary_via_spark(self, monitor, spark_functions):
+        """Test that the dashboard summary is one aggregate row collected from Spark"""
+        metrics_df = Mock()
+        metrics_df.agg.return_value.first.return_value.asDict.return_value = {
+            'total_columns': 3, 'avg_drift_score': 0.4, 'max_drift_score': 0.7, 'avg_null_percentage': None,
+            'columns_with_drift': 2, 'high_drift_columns': None
+        }
+
+        summary = monitor._summary_via_spark(metrics_df)
+
+        metrics_df.agg.return_value.first.return_value.asDict.return_value = {'total_columns': 0}
+        assert monitor._summary_via_spark(metrics_df) == {"total_columns": 0, "avg_drift_score": 0}
+
+        assert metrics_df.agg.call_count == 2
+        assert summary == {'total_columns': 3, 'avg_drift_score': 0.4, 'max_drift_score': 0.7,
+                           'avg_null_percentage': 0.0, 'columns_with_drift': 2, 'high_drift_columns': 0}
+
+    def test_maintain_tables(self, monitor):
+        """Test that new alert tables are partitioned by monitor and Z-ordered by timestamp"""
+        monitor.spark.catalog.tableExists.return_value = False
+        monitor._store_drift_alerts('claims_monitor', [{'column_name': 'claim_amount', 'drift_score': 0.6}])
+        writer = monitor.spark.createDataFrame.return_value.write.option.return_value.format.return_value
+        writer.mode.return_value.partitionBy.assert_called_once_with('monitor_name')
+
+        monitor.spark.sql.side_effect = [None, RuntimeError('locked')]
+        results = monitor.maintain_tables()
+
+        assert monitor.spark.sql.call_args_list[0][0][0] == 'OPTIMIZE monitoring.drift_alerts ZORDER BY (timestamp)'
+        assert results == {'monitoring.drift_alerts': 'optimized', 'monitoring.monitor_metadata': 'error: locked'}
+
+    def test_existing_tables_keep_their_partitioning(self, monitor):
+        """Test that appends to tables created before partitioning do not add partition columns"""
+        monitor.spark.catalog.tableExists.return_value = True
+        monitor.spark.createDataFrame.return_value.schema = DRIFT_ALERT_SCHEMA
+        monitor.spark.table.return_value.schema = DRIFT_ALERT_SCHEMA
+
+        monitor._store_drift_alerts('claims_monitor', [{'column_name': 'claim_amount', 'drift_score': 0.6}])
+        monitor._store_monitor_metadata(Mock(monitor_name='claims_monitor'), {})
+
+        alerts_writer = monitor.spark.createDataFrame.return_value.write.option.return_value.format.return_value
+        alerts_writer.mode.return_value.partitionBy.assert_not_called()
+        alerts_writer.mode.return_value.saveAsTable.assert_called_once_with('monitoring.drift_alerts')
+        metadata_writer = monitor.spark.createDataFrame.return_value.write.format.return_value
+        metadata_writer.mode.return_value.partitionBy.assert_not_called()
+        metadata_writer.mode.return_value.saveAsTable.assert_called_once_with('monitoring.monitor_metadata')
+
+    def test_appends_match_legacy_string_timestamps(self, monitor):
+        """Test that typed alert timestamps are rendered as ISO strings for tables that store strings"""
+        legacy_schema = StructType([StructField('timestamp', StringType()) if field.name == 'timestamp' else field
+                                    for field in DRIFT_ALERT_SCHEMA.fields])
+        monitor.spark.catalog.tableExists.return_value = True
+        monitor.spark.table.return_value.schema = legacy_schema
+        alerts_df = monitor.spark.createDataFrame.return_value = MagicMock()
+        alerts_df.schema = DRIFT_ALERT_SCHEMA
+
+        with patch('src.agents.quality.lakehouse_monitor.date_format') as date_format:
+            monitor._store_drift_alerts('claims_monitor', [{'column_name': 'claim_amount', 'drift_score': 0.6}])
+
+        date_format.assert_called_once_with(alerts_df.__getitem__.return_value, "yyyy-MM-dd'T'HH:mm:ss.SSSSSS")
+        alerts_df.withColumn.assert_called_once_with('timestamp', date_format.return_value)
+        aligned_writer = alerts_df.withColumn.return_value.write.option.return_value
+        aligned_writer.format.return_value.mode.return_value.saveAsTable.assert_called_once_with(
+            'monitoring.drift_alerts')
+
+    def test_dashboard_queries_run_concurrently(self, monitor):
+        """Test that the recent alerts query does not wait for the metrics query"""
+        alerts_started = threading.Event()
+
+        def fetch_metrics(*args, **kwargs):
+            assert alerts_started.wait(timeout=5)
+            return self._metrics(0.2)
+
+        def fetch_alerts(*args):
+            alerts_started.set()
+            return [{'column_name': 'col_0'}]
+
+        with patch.object(monitor, 'get_monitor_metrics', side_effect=fetch_metrics), \
+             patch.object(monitor, '_fetch_recent_alerts', side_effect=fetch_alerts), \
+             patch.object(monitor, '_store_drift_alerts'):
+            dashboard = monitor.get_monitor_dashboard_data('claims_monitor', days=7)
+
+        assert dashboard['recent_alerts'] == [{'column_name': 'col_0'}]
+        assert dashboard['summary']['total_columns'] == 1
+
+    def test_monitor_config_uses_shared_constants(self, monitor):
+        """Test that the healthcare monitor config reuses read-only constants"""
+        config = monitor._build_healthcare_monitor_config('claims', 'claims_baseline', ['1 day'], None)
+        other = monitor._build_healthcare_monitor_config('members', None, ['1 day'], None)
+
+        assert config['custom_metrics'] is other['custom_metrics']
+        assert config['data_classification_config'] is other['data_classification_config']
+        assert config['baseline_table_name'] == 'claims_baseline' and 'baseline_table_name' not in other
+        with pytest.raises(TypeError):
+            config['schedule']['timezone_id'] = 'EST'
+
+        stored = json.loads(json.dumps(config, default=dict))
+        assert stored['custom_metrics'][0]['name'] == 'member_id_completeness'
+
+    def test_validate_healthcare_codes(self):
+        """Test the batch validator against the RLIKE custom metric patterns"""
+        checks = validate_healthcare_codes.func(
+            pd.Series(['E11.9', 'U07.1', 'e11', None, 'Z99']),
+            pd.Series(['1234567893', '123456789', '12345678901', None, '1234567893\n'])
+        )
+
+        assert checks['dx_ok'].tolist() == [True, False, False, False, True]
+        assert checks['npi_ok'].tolist() == [True, False, False, False, True]
+
+    def test_to_records_renders_float32_columns(self, monitor):
+        """Test that FP32 metrics are returned at their own precision and nulls as None"""
+        df = Mock()
+        df.toPandas.return_value = pd.DataFrame({
+            'column_name': ['claim_amount', 'member_id'],
+            'mean': np.array([0.3, np.nan], dtype=np.float32),
+            'drift_score': [0.1, 0.25]
+        })
+
+        records = monitor._to_records(df)
+
+        assert records == [{'column_name': 'claim_amount', 'mean': 0.3, 'drift_score': 0.1},
+                           {'column_name': 'member_id', 'mean': None, 'drift_score': 0.25}]
+        assert json.dumps(records[0]) == '{"column_name": "claim_amount", "mean": 0.3, "drift_score": 0.1}'
+
+    def test_drift_severity_bands(self, monitor):
+        """Test severity boundaries for single scores and batched drift alerts"""
+        scores = [0.05, 0.3, 0.31, 0.5, 0.51, 1.0]
+        expected = ['low', 'low', 'medium', 'medium', 'high', 'high']
+
+        assert [monitor._calculate_drift_severity(score) for score in scores] == expected
+
+        with patch.object(monitor, '_store_drift_alerts'):
+            drift = monitor.detect_data_drift('claims_monitor', drift_threshold=0.0,
+                                              metrics=self._metrics(*scores))
+
+        assert [alert['severity'] for alert in drift['drift_alerts']] == expected
+
+    def test_drift_alert_writes_are_buffered(self):
+        """Test that small alert batches are held until min_batch_drift_write alerts accumulate"""
+        monitor = LakehouseMonitor(Mock(), Mock(), {'min_batch_drift_write': 3})
+        monitor.spark.catalog.tableExists.return_value = False
+
+        monitor.detect_data_drift('claims_monitor', metrics=self._metrics(0.05, 0.0))
+        monitor.detect_data_drift('claims_monitor', metrics=self._metrics(0.2, 0.4))
+        monitor.spark.createDataFrame.assert_not_called()
+
+        monitor.detect_data_drift('members_monitor', metrics=self._metrics(0.6))
+        assert monitor.spark.createDataFrame.call_count == 1
+        rows = monitor.spark.createDataFrame.call_args[0][0]
+        assert [row['monitor_name'] for row in rows] == ['claims_monitor', 'claims_monitor', 'members_monitor']
+
+        monitor.detect_data_drift('claims_monitor', metrics=self._metrics(0.2))
+        monitor.flush_alerts()
+        monitor.flush_alerts()
+        assert monitor.spark.createDataFrame.call_count == 2
+
+    def test_buffered_alerts_flushed_at_end_of_run(self):
+        """Test that alerts below min_batch_drift_write are written when the run ends"""
+        monitor = LakehouseMonitor(Mock(), Mock(), {'min_batch_drift_write': 10})
+        monitor.spark.catalog.tableExists.return_value = False
+
+        with patch.object(monitor, 'get_monitor_metrics', return_value=self._metrics(0.6, 0.05)), \
+             patch.object(monitor, '_fetch_recent_alerts', return_value=[]):
+            dashboard = monitor.get_monitor_dashboard_data('claims_monitor', days=7)
+
+        assert dashboard['status'] == 'success'
+        assert monitor.spark.createDataFrame.call_count == 1
+        assert monitor._drift_alert_buffer == []
+
+        # A failed write keeps the alerts for the next flush; leaving the context flushes them
+        monitor.spark.createDataFrame.side_effect = [RuntimeError('unavailable'), Mock()]
+        with monitor:
+            monitor.detect_data_drift('claims_monitor', metrics=self._metrics(0.6))
+            monitor.flush_alerts()
+            assert len(monitor._drift_alert_buffer) == 1
+        assert monitor._drift_alert_buffer == []
+        assert monitor.spark.createDataFrame.call_count == 3
+
+    def test_monitor_info_cached_until_refresh(self, monitor):
+        """Test that monitor lookups are reused within the TTL and dropped after a refresh"""
+        get_monitor = monitor.workspace_client.quality_monitors.get
+
+        with patch('src.agents.quality.lakehouse_monitor.time.monotonic', return_value=100.0):
+            monitor._get_monitor_info('claims_monitor')
+            monitor._get_monitor_info('claims_monitor')
+            assert get_monitor.call_count == 1
+
+            monitor.run_monitor_refresh('claims_monitor')
+            monitor._get_monitor_info('claims_monitor')
+            assert get_monitor.call_count == 2
+
+        with patch('src.agents.quality.lakehouse_monitor.time.monotonic', return_value=160.0):
+            monitor._get_monitor_info('claims_monitor')
+            assert get_monitor.call_count == 3
+
+    def test_dashboard_arrow_stream(self, monitor):
+        """Test that the Arrow dashboard carries the metrics as columns and the rest as metadata"""
+        metrics = self._metrics(0.2, 0.6)
+        dashboard = {'monitor_name': 'claims_monitor', 'metrics': metrics['metrics'],
+                     'summary': {'total_columns': 2}, 'recent_alerts': [{'timestamp': datetime(2024, 1, 15)}],
+                     'status': 'success'}
+
+        with patch.object(monitor, 'get_monitor_dashboard_data', return_value=dashboard):
+            payload = monitor.get_monitor_dashboard_arrow('claims_monitor', days=7)
+
+        table = pa.ipc.open_stream(payload).read_all()
+        assert table.column('drift_score').to_pylist() == [0.2, 0.6]
+        extra = json.loads(table.schema.metadata[b'dashboard'])
+        assert extra['summary'] == {'total_columns': 2} and 'metrics' not in extra
+        assert extra['recent_alerts'][0]['timestamp'] == '2024-01-15 00:00:00'
@@ -3,12 +3,15 @@ Unit tests for the Quality Engine core functionality
 """
 
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, patch, ANY
 import pandas as pd
 from datetime import datetime
+from pyspark.sql import Row
+from pyspark.sql.types import StructField, StringType
 
 from src.agents.quality.quality_engine import (
-    QualityEngine, ValidationRule, QualityDimension, RuleSeverity, QualityResult
+    QualityEngine, ValidationRule, QualityDimension, RuleSeverity, QualityResult, luhn_check_udf,
+    npi_check_udf, match_patterns, _broadcast_validation_udfs, _FORMAT_PATTERNS, RE2_AVAILABLE
 )
 
 
@@ -137,6 +140,39 @@ class TestQualityEngine:
             assert engine._rule_applies_to_field(rule, 'member_id', None) == True
             assert engine._rule_applies_to_field(rule, 'random_field', None) == False
             
+    def test_rule_index_matches_pattern_scan(self, mock_spark, basic_config):
+        """Test indexed rule lookup against per-rule pattern matching"""
+        with patch('builtins.open'), patch('yaml.safe_load', return_value=basic_config):
+            engine = QualityEngine(mock_spark, {})
+            
+            engine.register_rule(ValidationRule(
+                name='mixed_patterns', description='Mixed', dimension=QualityDimension.VALIDITY,
+                severity=RuleSeverity.INFO, condition='test', field_names=['Claim*', '*AMT', 'exact_Field']
+            ))
+            engine.register_rule(ValidationRule(
+                name='disabled_rule', description='Disabled', dimension=QualityDimension.VALIDITY,
+                severity=RuleSeverity.INFO, condition='test', field_names=['*'], enabled=False
+            ))
+            
+            fields = ['claim_amt', 'CLAIM_ID', 'paid_amt', 'exact_field', 'user_email', 'provider_npi',
+                      'service_date', 'phone', 'telephone_2', 'key', '']
+            for field_name in fields:
+                expected = [rule for rule in engine.rules_registry.values()
+                            if rule.enabled and engine._rule_applies_to_field(rule, field_name)]
+                assert engine.get_applicable_rules(field_name) == expected, field_name
+                
+            # Re-registering keeps the rule's position; unregistering drops it from the index
+            engine.register_rule(ValidationRule(
+                name='mixed_patterns', description='Mixed', dimension=QualityDimension.VALIDITY,
+                severity=RuleSeverity.INFO, condition='test', field_names=['paid*']
+            ))
+            assert [r.name for r in engine.get_applicable_rules('claim_amt')] == ['null_completeness',
+                                                                                  'blank_completeness']
+            assert engine.get_applicable_rules('paid_amt')[-1].name == 'mixed_patterns'
+            
+            engine.unregister_rule('mixed_patterns')
+            assert 'mixed_patterns' not in [r.name for r in engine.get_applicable_rules('paid_amt')]
+            
     def test_dimension_score_calculation(self, mock_spark, basic_config):
         """Test quality dimension score calculation"""
         with patch('builtins.open'), patch('yaml.safe_load', return_value=basic_config):
@@ -323,4 +359,259 @@ class TestQualityResult:
         
         # Verify timestamp was set and is recent
         timestamp_dt = datetime.fromisoformat(result.timestamp)
-        assert (datetime.now() - timestamp_dt).total_seconds() < 5
\ No newline at end of file
+        assert (datetime.now() - timestamp_dt).total_seconds() < 5
+
+class TestQualityEngineSpark:
+    """Unit tests for QualityEngine Spark job planning"""
+    
+    @pytest.fixture
+    def engine(self):
+        with patch('builtins.open'), patch('yaml.safe_load', return_value={}):
+            return QualityEngine(Mock(), {})
+            
+    @pytest.fixture
+    def cached_df(self):
+        df = Mock()
+        df.persist.return_value = df
+        df.schema.fields = [StructField('member_id', StringType()), StructField('email', StringType())]
+        df.count.return_value = 4
+        df.filter.return_value.count.return_value = 3
+        df.select.return_value.distinct.return_value.count.return_value = 4
+        return df
+        
+    @pytest.fixture
+    def spark_functions(self):
+        with patch('src.agents.quality.quality_engine.col') as spark_col, \
+             patch('src.agents.quality.quality_engine.when'), \
+             patch('src.agents.quality.quality_engine.expr') as expr, \
+             patch('src.agents.quality.quality_engine.spark_sum'), \
+             patch('src.agents.quality.quality_engine.countDistinct') as count_distinct, \
+             patch('src.agents.quality.quality_engine.approx_count_distinct') as approx_distinct, \
+             patch('src.agents.quality.quality_engine.spark_min'), \
+             patch('src.agents.quality.quality_engine.spark_max'), \
+             patch('src.agents.quality.quality_engine.avg'), \
+             patch('src.agents.quality.quality_engine.stddev'):
+            spark_col.return_value.__le__.return_value = Mock()
+            yield {'expr': expr, 'countDistinct': count_distinct, 'approx_count_distinct': approx_distinct}
+            
+    @staticmethod
+    def _aggregate_row(engine, null_count, passed_count, distinct_count, prefixes=('',)):
+        row = {}
+        for prefix in prefixes:
+            row[f'{prefix}null_count'] = null_count
+            for rule in engine.rules_registry.values():
+                uniqueness = rule.dimension == QualityDimension.UNIQUENESS
+                row[f'{prefix}rule__{rule.name}'] = distinct_count if uniqueness else passed_count
+        return Row(**row)
+        
+    def test_assessment_counts_cached_table_once(self, engine, cached_df, spark_functions):
+        """Test that the table is persisted and counted once for the whole assessment"""
+        cached_df.agg.return_value.collect.return_value = [
+            self._aggregate_row(engine, 0, 4, 4, prefixes=('f0__', 'f1__'))
+        ]
+        
+        results = engine.assess_table_quality(cached_df, 'claims')
+            
+        cached_df.persist.assert_called_once()
+        assert cached_df.count.call_count == 1
+        cached_df.unpersist.assert_called_once()
+        assert results['record_count'] == 4
+        assert results['field_results']['email']['rule_results']['email_format'].total_count == 4
+        
+    def test_field_rules_evaluated_in_one_aggregation(self, engine, cached_df, spark_functions):
+        """Test that a field's null count and rule pass counts come from a single job"""
+        cached_df.agg.return_value.collect.return_value = [self._aggregate_row(engine, 1, 3, 3)]
+        field = StructField('member_id', StringType())
+        
+        results = engine._assess_field_quality(cached_df, field, list(engine.rules_registry.values()), 4)
+        
+        assert cached_df.agg.call_count == 1
+        cached_df.filter.assert_not_called()
+        spark_functions['countDistinct'].assert_called_once()
+        assert results['null_count'] == 1 and results['null_percentage'] == 25.0
+        # Three distinct values plus null cover all four rows
+        assert results['rule_results']['primary_key_uniqueness'].passed
+        assert results['rule_results']['null_completeness'].score == 75.0
+        
+    def test_failed_aggregation_falls_back_to_single_rules(self, engine, cached_df, spark_functions):
+        """Test that one bad condition does not prevent the other rules from being scored"""
+        cached_df.agg.return_value.collect.side_effect = RuntimeError('cannot resolve luhn_check')
+        field = StructField('member_id', StringType())
+        
+        results = engine._assess_field_quality(cached_df, field, list(engine.rules_registry.values()), 4)
+        
+        assert results['null_count'] == 3
+        assert results['rule_results']['null_completeness'].score == 75.0
+        
+    def test_all_fields_evaluated_in_one_aggregation(self, engine, cached_df, spark_functions):
+        """Test that the assessment runs a single aggregation covering every field"""
+        cached_df.agg.return_value.collect.return_value = [
+            self._aggregate_row(engine, 2, 2, 2, prefixes=('f0__', 'f1__'))
+        ]
+        
+        results = engine.assess_table_quality(cached_df, 'claims')
+        
+        assert cached_df.agg.call_count == 1
+        cached_df.filter.assert_not_called()
+        email = results['field_results']['email']
+        assert email['null_count'] == 2
+        assert email['rule_results']['email_format'].score == 50.0
+        assert 'primary_key_uniqueness' in results['field_results']['member_id']['rule_results']
+        
+    def test_approximate_uniqueness_for_non_critical_rules(self, engine, cached_df, spark_functions):
+        """Test that only critical uniqueness rules without a threshold pay for an exact distinct count"""
+        def uniqueness_rule(severity, threshold=None):
+            return ValidationRule(name='unique_key', description='Unique', dimension=QualityDimension.UNIQUENESS,
+                                  severity=severity, condition='unique_count = total_count',
+                                  field_names=['key'], threshold=threshold)
+        
+        critical = uniqueness_rule(RuleSeverity.CRITICAL)
+        approximate = uniqueness_rule(RuleSeverity.WARNING)
+        assert engine._exact_uniqueness(critical)
+        assert not engine._exact_uniqueness(uniqueness_rule(RuleSeverity.CRITICAL, threshold=99.0))
+        
+        # The estimate only decides uniqueness; the score stays all-or-nothing as on the exact path
+        assert engine._passed_count(critical, 995, 0, 1000) == 0
+        assert engine._passed_count(approximate, 995, 0, 1000) is None
+        assert engine._passed_count(approximate, 900, 0, 1000) == 0
+        assert engine._passed_count(uniqueness_rule(RuleSeverity.WARNING, threshold=90.0), 900, 0, 1000) == 0
+        
+        engine._field_aggregates('key', [approximate])
+        spark_functions['approx_count_distinct'].assert_called_once_with(ANY, rsd=0.01)
+        spark_functions['countDistinct'].assert_not_called()
+        
+        cached_df.agg.return_value.collect.return_value = [Row(unique_count=900, null_count=0)]
+        result = engine._apply_rule(cached_df, 'key', approximate, total_count=1000)
+        assert not result.passed and result.score == 0.0
+        cached_df.select.assert_not_called()
+        
+        # An estimate close to the row count is settled with an exact distinct count
+        cached_df.agg.return_value.collect.return_value = [Row(unique_count=4, null_count=0)]
+        cached_df.select.return_value.distinct.return_value.count.return_value = 3
+        result = engine._apply_rule(cached_df, 'key', approximate, total_count=4)
+        assert not result.passed and result.score == 0.0
+        
+        cached_df.select.return_value.distinct.return_value.count.return_value = 4
+        result = engine._apply_rule(cached_df, 'key', approximate, total_count=4)
+        assert result.passed and result.score == 100.0
+        cached_df.select.assert_called_with('key')
+        
+    def test_luhn_udf_matches_python_check(self, engine):
+        """Test the vectorized Luhn UDF against the scalar function and its registration"""
+        values = ['79927398713', '79927398710', '0', '18', '', None, 'abc1234567', '4111111111111111', '\u0661\u0668']
+        
+        checks = luhn_check_udf.func(pd.Series(values, dtype=object))
+        
+        assert checks.tolist() == [engine.custom_functions['luhn_check'](v) for v in values]
+        assert 'luhn_check' in [call[0][0] for call in engine.spark.udf.register.call_args_list]
+        
+    def test_npi_rule_uses_prefixed_check_digit(self, engine):
+        """Test the NPI rule against real NPIs, whose check digit covers the 80840 prefix"""
+        values = pd.Series(['1234567893', '1679576722', '1234567890', '0000000000', '123456789', None, '12345678931'])
+        
+        assert npi_check_udf.func(values).tolist() == [True, True, False, False, False, False, False]
+        assert not luhn_check_udf.func(pd.Series(['1234567893'])).iloc[0]
+        
+        npi_rule = engine.rules_registry['npi_format']
+        assert engine._rule_condition('provider_npi', npi_rule).endswith('npi_check(provider_npi)')
+        assert 'npi_check' in [call[0][0] for call in engine.spark.udf.register.call_args_list]
+        
+        
+    def test_match_patterns_udf(self, engine):
+        """Test the batch format matcher offered to custom rules when re2 is installed"""
+        values = pd.Series(['user@example.com', 'not-an-email', '+15551234567', '555-123-4567',
+                            'E11.9', 'U07.1', '99213', None, '99213'])
+        pattern_ids = pd.Series(['email', 'email', 'phone', 'phone', 'icd10', 'icd10', 'cpt', 'cpt', 'unknown'])
+        
+        matches = match_patterns.func(values, pattern_ids)
+        
+        assert matches.tolist() == [True, False, True, False, True, False, True, False, False]
+        registered = [call[0][0] for call in engine.spark.udf.register.call_args_list]
+        assert ('match_patterns' in registered) == RE2_AVAILABLE
+        
+    def test_builtin_format_rules_use_rlike(self, engine):
+        """Test that the built-in format rules stay native RLIKE with SQL-escaped backslashes"""
+        email_rule = engine.rules_registry['email_format']
+        assert engine._rule_condition('contact_email', email_rule) == (
+            "contact_email RLIKE '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\\\.[a-zA-Z]{2,}$'"
+        )
+        # Spark SQL unescapes a doubled backslash in a literal to one, leaving the regex escape
+        # Spark SQL unescapes '\\\\' in a literal to one backslash, leaving the regex escape
+        icd10_literal = engine.rules_registry['icd10_format'].condition.split("'")[1]
+        assert icd10_literal.replace('\\\\', '\\') == '^' + _FORMAT_PATTERNS['icd10'] + '$'
+        assert 'match_patterns' not in ''.join(rule.condition for rule in engine.rules_registry.values())
+        
+    def test_profile_stats_in_one_aggregation(self, engine, cached_df, spark_functions):
+        """Test that profiling computes every field's stats in a single approximate aggregation"""
+        cached_df.dtypes = [('member_id', 'string'), ('claim_amount', 'double')]
+        cached_df.agg.return_value.collect.return_value = [Row(**{
+            'f0__null_count': 1, 'f0__unique_count': 3,
+            'f1__null_count': 0, 'f1__unique_count': 2, 'f1__min_val': 10.0, 'f1__max_val': 30.0,
+            'f1__mean_val': 20.0, 'f1__stddev_val': 5.0
+        })]
+        
+        with patch.object(engine, '_analyze_patterns', return_value={}):
+            profiles = engine.profile_data(cached_df, ['member_id', 'claim_amount', 'missing'], top_values=False)
+            
+        cached_df.agg.assert_called_once()
+        cached_df.groupBy.assert_not_called()
+        cached_df.select.assert_not_called()
+        spark_functions['approx_count_distinct'].assert_called_with(ANY, rsd=0.02)
+        
+        assert profiles['member_id'].null_count == 1
+        assert profiles['member_id'].unique_count == 4
+        assert profiles['claim_amount'].max_value == 30.0 and profiles['claim_amount'].mean_value == 20.0
+        assert profiles['missing'].data_type == 'unknown'
+        cached_df.unpersist.assert_called_once()
+        
+    def test_top_values_in_one_job(self, engine, cached_df, spark_functions):
+        """Test that the top values of all fields come from one stacked aggregation"""
+        cached_df.dtypes = [('member_id', 'string'), ('plan', 'string')]
+        cached_df.agg.return_value.collect.return_value = [Row(**{
+            'f0__null_count': 0, 'f0__unique_count': 4, 'f1__null_count': 0, 'f1__unique_count': 2
+        })]
+        ranked = (cached_df.select.return_value.groupBy.return_value.count.return_value
+                  .withColumn.return_value.filter.return_value.orderBy.return_value)
+        ranked.collect.return_value = [
+            Row(field_index=0, value='M1', count=1),
+            Row(field_index=1, value='gold', count=3),
+            Row(field_index=1, value='silver', count=1)
+        ]
+        
+        with patch('src.agents.quality.quality_engine.Window'), \
+             patch('src.agents.quality.quality_engine.row_number'), \
+             patch.object(engine, '_analyze_patterns', return_value={}):
+            profiles = engine.profile_data(cached_df, ['member_id', 'plan'])
+            
+        cached_df.groupBy.assert_not_called()
+        stack = spark_functions['expr'].call_args[0][0]
+        assert stack == "stack(2, 0, CAST(`member_id` AS STRING), 1, CAST(`plan` AS STRING)) AS (field_index, value)"
+        assert profiles['member_id'].top_values == [{'value': 'M1', 'count': 1}]
+        assert profiles['plan'].top_values == [{'value': 'gold', 'count': 3}, {'value': 'silver', 'count': 1}]
+        
+    def test_validation_udfs_read_broadcast_tables(self, engine):
+        """Test that the registered UDFs only close over the broadcast of their tables"""
+        broadcast = engine.spark.sparkContext.broadcast
+        broadcast.return_value.value = broadcast.call_args[0][0]
+        registered = {call[0][0]: call[0][1] for call in engine.spark.udf.register.call_args_list}
+        
+        for udf in registered.values():
+            assert [cell.cell_contents for cell in udf.func.__closure__] == [broadcast.return_value]
+            
+        values = pd.Series(['79927398713', '79927398710', None])
+        assert registered['luhn_check'].func(values).tolist() == luhn_check_udf.func(values).tolist()
+        assert registered['npi_check'].func(pd.Series(['1234567893'])).tolist() == [True]
+        assert ('match_patterns' in registered) == RE2_AVAILABLE
+        
+        # Without a SparkContext to broadcast from, the module-level UDFs are registered
+        spark = Mock()
+        spark.sparkContext.broadcast.side_effect = RuntimeError('no SparkContext')
+        with patch('builtins.open'), patch('yaml.safe_load', return_value={}):
+            QualityEngine(spark, {})
+        spark.udf.register.assert_any_call('luhn_check', luhn_check_udf)
+        spark.udf.register.assert_any_call('npi_check', npi_check_udf)
+        
+        # With re2 installed, match_patterns is registered and reads the broadcast patterns
+        with patch('src.agents.quality.quality_engine.RE2_AVAILABLE', True):
+            _, udfs = _broadcast_validation_udfs(engine.spark)
+        assert udfs['match_patterns'].func(pd.Series(['99213']), pd.Series(['cpt'])).tolist() == [True]
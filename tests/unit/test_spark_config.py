@@ -0,0 +1,59 @@
+"""
+Unit tests for the shared Spark session configuration helpers
+"""
+
+import threading
+from unittest.mock import Mock
+
+from src.agents.quality.spark_config import ARROW_ENABLED_CONF, arrow_enabled
+
+
+class TestArrowEnabled:
+    """Unit tests for the arrow_enabled context manager"""
+
+    @staticmethod
+    def _spark(value=None):
+        conf = {} if value is None else {ARROW_ENABLED_CONF: value}
+        spark = Mock()
+        spark.conf.get.side_effect = lambda key, default=None: conf.get(key, default)
+        spark.conf.set.side_effect = conf.__setitem__
+        spark.conf.unset.side_effect = conf.pop
+        return spark, conf
+
+    def test_restores_previous_setting(self):
+        """Test that the session's own value is restored after the block"""
+        spark, conf = self._spark('false')
+
+        with arrow_enabled(spark):
+            assert conf[ARROW_ENABLED_CONF] == 'true'
+        assert conf[ARROW_ENABLED_CONF] == 'false'
+
+        spark, conf = self._spark()
+        try:
+            with arrow_enabled(spark):
+                raise RuntimeError('query failed')
+        except RuntimeError:
+            pass
+        assert ARROW_ENABLED_CONF not in conf
+
+    def test_overlapping_blocks_restore_once(self):
+        """Test that concurrent blocks keep Arrow enabled until the last one exits"""
+        spark, conf = self._spark('false')
+        entered, release = threading.Event(), threading.Event()
+
+        def worker():
+            with arrow_enabled(spark):
+                entered.set()
+                release.wait()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        entered.wait()
+
+        with arrow_enabled(spark):
+            pass
+        assert conf[ARROW_ENABLED_CONF] == 'true'
+
+        release.set()
+        thread.join()
+        assert conf[ARROW_ENABLED_CONF] == 'false'